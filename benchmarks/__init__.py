@@ -0,0 +1 @@
+"""Benchmark suite for python_magnetgeo (see benchmarks/run.py)."""
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+#-*- coding:utf-8 -*-
+
+"""
+Benchmarks for the gmsh builders and the xao BC tagging
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+from contextlib import contextmanager
+
+from python_magnetgeo import SupraStructure
+from python_magnetgeo import batch
+from python_magnetgeo import cli
+from python_magnetgeo import repository
+from python_magnetgeo import synthetic
+
+from .bench_parts import INSERTS, _insert, _parts
+
+@contextmanager
+def _gmsh(name: str):
+    import gmsh
+    gmsh.initialize()
+    gmsh.option.setNumber("General.Terminal", 0)
+    gmsh.model.add(name)
+    try:
+        yield gmsh
+    finally:
+        gmsh.finalize()
+
+@contextmanager
+def _quiet():
+    """
+    silence stdout, including messages printed by the gmsh library
+    """
+    sys.stdout.flush()
+    fd = os.dup(1)
+    with open(os.devnull, "w") as devnull:
+        os.dup2(devnull.fileno(), 1)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(fd, 1)
+        os.close(fd)
+
+class InsertGmsh:
+    """
+    Insert.gmsh + gmsh_bcs with and without air
+    (with air, helices, rings and air are merged by a single fragment)
+    """
+    requires = ["gmsh"]
+    params = [(name, air) for name in INSERTS[:2] for air in [False, True]]
+
+    def setup(self, param):
+        (name, air) = param
+        self.cad = _insert(name)
+        _parts(self.cad)
+
+    def run(self, param):
+        (name, air) = param
+        with _gmsh(name) as gmsh:
+            ids = self.cad.gmsh(air, batch=air)
+            gmsh.model.occ.synchronize()
+            self.cad.gmsh_bcs(ids)
+
+class InsertGmshScaling:
+    """
+    Insert.gmsh + gmsh_bcs for synthetic inserts of increasing helix count
+    """
+    requires = ["gmsh"]
+    params = [5, 10, 20, 40]
+
+    def setup(self, nhelices):
+        self.cad = _insert("S%dx20" % nhelices)
+        _parts(self.cad)
+
+    def run(self, nhelices):
+        with _gmsh("S%dx20" % nhelices) as gmsh:
+            ids = self.cad.gmsh(False)
+            gmsh.model.occ.synchronize()
+            self.cad.gmsh_bcs(ids)
+
+class HTSGmsh:
+    """
+    HTSinsert.loadCfg + gmsh + gmsh_bcs for every detail level
+    (10 double pancakes of 40 tapes, with air)
+    """
+    requires = ["gmsh"]
+    params = ["None", "dblepancake", "pancake", "tape"]
+
+    def setup(self, detail):
+        synthetic.write({"hts-10x40.json": synthetic.hts(10, 40)})
+
+    def run(self, detail):
+        insert = SupraStructure.HTSinsert()
+        insert.loadCfg("hts-10x40.json")
+        with _gmsh("hts") as gmsh:
+            ids = insert.gmsh(detail, True)
+            gmsh.model.occ.synchronize()
+            insert.gmsh_bcs(detail, ids)
+
+class HTSTapeScaling:
+    """
+    HTSinsert gmsh + gmsh_bcs at tape detail for increasing tape count
+    """
+    requires = ["gmsh"]
+    params = [10, 40, 160]
+
+    def setup(self, ntapes):
+        synthetic.write({"hts-10x%d.json" % ntapes: synthetic.hts(10, ntapes)})
+
+    def run(self, ntapes):
+        insert = SupraStructure.HTSinsert()
+        insert.loadCfg("hts-10x%d.json" % ntapes)
+        with _gmsh("hts") as gmsh:
+            ids = insert.gmsh("tape", True)
+            gmsh.model.occ.synchronize()
+            insert.gmsh_bcs("tape", ids)
+
+class MSiteGmsh:
+    """
+    MSite.gmsh + gmsh_bcs for a synthetic site (one insert, one supra)
+    with an increasing number of bitters
+    """
+    requires = ["gmsh"]
+    params = [1, 4, 16]
+
+    def setup(self, nbitters):
+        self.name = "site%d" % nbitters
+        (site, parts) = synthetic.msite(self.name, nbitters=nbitters, seed=nbitters)
+        synthetic.write(parts)
+        self.site = repository.load(self.name)
+
+    def run(self, nbitters):
+        with _gmsh(self.name) as gmsh:
+            ids = self.site.gmsh(False)
+            gmsh.model.occ.synchronize()
+            self.site.gmsh_bcs(ids)
+
+class MSiteGmshParallel:
+    """
+    MSite.gmsh + gmsh_bcs for a synthetic site made of inserts,
+    magnets built in a pool of processes (one per core)
+    """
+    requires = ["gmsh"]
+    params = [(4, None), (4, 0), (16, None), (16, 0)]
+
+    def setup(self, param):
+        (ninserts, processes) = param
+        self.name = "psite%d" % ninserts
+        (site, parts) = synthetic.msite(self.name, ninserts=ninserts, nbitters=0, nsupras=0, seed=ninserts)
+        synthetic.write(parts)
+        self.site = repository.load(self.name)
+
+    def run(self, param):
+        (ninserts, processes) = param
+        with _gmsh(self.name) as gmsh:
+            ids = self.site.gmsh(False, processes=processes)
+            gmsh.model.occ.synchronize()
+            self.site.gmsh_bcs(ids)
+
+class CliBatch:
+    """
+    cli gmsh api + mesh on 8 small synthetic inserts: one process per
+    file against the batch mode (one worker, one worker per core)
+    """
+    requires = ["gmsh"]
+    params = ["process", 1, 0]
+
+    def setup(self, workers):
+        self.files = []
+        for i in range(8):
+            (cad, parts) = synthetic.insert("B%d" % i, 3, 4, seed=i)
+            synthetic.write(parts)
+            self.files.append("B%d.yaml" % i)
+
+        self.argv = ["--wd", ".", "--gmsh_api", "--mesh"]
+        parser = argparse.ArgumentParser()
+        cli.add_arguments(parser)
+        parser.add_argument("--verbose", action='store_true')
+        parser.add_argument("--debug", action='store_true')
+        self.args = parser.parse_args(self.argv)
+
+    def run(self, workers):
+        if workers == "process":
+            env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+            for filename in self.files:
+                subprocess.run([sys.executable, "-m", "python_magnetgeo.cli", filename] + self.argv,
+                               env=env, check=True, capture_output=True)
+        else:
+            with _quiet():
+                batch.process(self.files, self.args, workers)
+
+XAO = """<?xml version="1.0" encoding="UTF-8"?>
+<XAO version="1.0" author="benchmarks">
+  <geometry name="%(name)s">
+    <shape format="BREP" file="%(name)s.brep"/>
+    <topology>
+      <solids count="%(nsolids)d">
+%(solids)s
+      </solids>
+    </topology>
+  </geometry>
+  <groups count="%(ngroups)d">
+%(groups)s
+  </groups>
+</XAO>
+"""
+
+class XaoTagging:
+    """
+    xao mesh --dry-run (solids and BC groups tagging) for a synthetic insert
+    without rings: each helix is made of 3 stacked boxes (Cu, Glue0, Glue1)
+    """
+    requires = ["gmsh", "lxml"]
+    params = [5, 20, 50]
+
+    def setup(self, nhelices):
+        self.name = "X%d" % nhelices
+        (cad, parts) = synthetic.insert(self.name, nhelices, 2, with_rings=False)
+        synthetic.write(parts)
+        with _gmsh(self.name) as gmsh:
+            boxes = [(3, gmsh.model.occ.addBox(2*i, 0, j, 1, 1, 1)) for i in range(nhelices) for j in range(3)]
+            gmsh.model.occ.fragment(boxes[:1], boxes[1:])
+            gmsh.model.occ.synchronize()
+            gmsh.write(self.name + ".brep")
+
+            gmsh.model.remove()
+            gmsh.model.occ.importShapes(self.name + ".brep")
+            gmsh.model.occ.synchronize()
+            volumes = gmsh.model.getEntities(3)
+            groups = {}
+            for (dim, tag) in volumes:
+                helix = (tag-1) // 3 + 1
+                faces = [face for (fdim, face) in gmsh.model.getBoundary([(dim, tag)], oriented=False)]
+                for k, face in enumerate(faces):
+                    bc = "%s_H%d_%s" % (self.name, helix, ["rInt", "rExt", "V0", "V1"][k % 4])
+                    groups.setdefault(bc, []).append(face)
+
+        solids = ['        <solid index="%d" name=""/>' % (tag-1) for (dim, tag) in volumes]
+        groups = ['    <group name="%s" dimension="face" count="%d">%s</group>' %
+                  (bc, len(faces), "".join('<element index="%d"/>' % (face-1) for face in faces))
+                  for bc, faces in groups.items()]
+        with open(self.name + ".xao", "w") as f:
+            f.write(XAO % {'name': self.name, 'nsolids': len(solids), 'solids': "\n".join(solids),
+                           'ngroups': len(groups), 'groups': "\n".join(groups)})
+
+    def run(self, nhelices):
+        from python_magnetgeo import xao
+
+        argv = sys.argv
+        sys.argv = ["xao", self.name + ".xao", "mesh", "--dry-run", "--geo", "Auto"]
+        try:
+            with _quiet():
+                xao.main()
+        finally:
+            sys.argv = argv
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+#-*- coding:utf-8 -*-
+
+"""
+Benchmarks for loading, serializing and exporting magnet parts
+(no gmsh required)
+"""
+
+import io
+import os
+
+from python_magnetgeo import repository
+from python_magnetgeo import deserialize
+from python_magnetgeo import python_magnetgeo
+from python_magnetgeo import synthetic
+
+INSERTS = ["HL-31", "S14x20", "S50x500"]
+
+def _insert(name: str):
+    """
+    returns Insert name, create it first for synthetic inserts (eg. S50x500)
+    """
+    if name.startswith("S"):
+        (nhelices, nsections) = [int(n) for n in name[1:].split("x")]
+        (cad, parts) = synthetic.insert(name, nhelices, nsections)
+        synthetic.write(parts)
+
+    # rings missing in data (eg. for HL-31) are generated from the helices they connect
+    cad = repository.load(name)
+    for i, rname in enumerate(cad.Rings):
+        if not os.path.isfile(rname + ".yaml"):
+            ring = synthetic.ring(rname, repository.load(cad.Helices[i]), repository.load(cad.Helices[i+1]))
+            synthetic.write({rname: ring})
+    return cad
+
+def _parts(cad) -> list:
+    return [repository.load(name) for name in cad.Helices + cad.Rings + (cad.CurrentLeads or [])]
+
+class LoadInsert:
+    """
+    load an Insert and all its parts from yaml (cold cache)
+    """
+    params = INSERTS
+
+    def setup(self, name):
+        _insert(name)
+
+    def run(self, name):
+        repository.invalidate()
+        _parts(repository.load(name))
+
+class JsonRoundTrip:
+    """
+    to_json/from_json of an Insert and all its parts
+    """
+    params = INSERTS
+
+    def setup(self, name):
+        cad = _insert(name)
+        self.parts = [cad] + _parts(cad)
+
+    def run(self, name):
+        for part in self.parts:
+            deserialize.loads(part.to_json())
+
+class MainCharacteristics:
+    """
+    get_main_characteristics of an Insert (cached parts)
+    """
+    params = INSERTS
+
+    def setup(self, name):
+        self.cad = _insert(name)
+        _parts(self.cad)
+
+    def run(self, name):
+        python_magnetgeo.get_main_characteristics(self.cad)
+
+class AxiGeo:
+    """
+    Create_AxiGeo of an Insert with and without air (cached parts)
+    """
+    params = [(name, air) for name in INSERTS for air in [False, True]]
+
+    def setup(self, param):
+        (name, air) = param
+        self.cad = _insert(name)
+        _parts(self.cad)
+
+    def run(self, param):
+        (name, air) = param
+        self.cad.Create_AxiGeo(air, stream=io.StringIO())
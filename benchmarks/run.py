@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+#-*- coding:utf-8 -*-
+
+"""
+Run the benchmark suite and store the results as json
+
+From the top directory of the repository:
+
+    python -m benchmarks.run -o results.json
+    python -m benchmarks.run -k HTS --repeat 3
+    python -m benchmarks.run -o new.json --compare results.json
+
+Benchmarks are classes defined in benchmarks/bench_*.py with a run()
+method and optionally:
+
+* params: list of parameters, run(), setup() and teardown() get each of them
+* setup(param)/teardown(param): not timed
+* requires: list of modules needed (the benchmark is skipped if one is missing)
+
+They run in a temporary copy of data/, synthetic magnets are created
+there by setup().
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+import shutil
+import inspect
+import argparse
+import platform
+import datetime
+import importlib
+import statistics
+import subprocess
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["bench_parts", "bench_gmsh"]
+
+def available(module: str) -> bool:
+    try:
+        importlib.import_module(module)
+    except (ImportError, OSError):
+        return False
+    return True
+
+def discover(pattern: str = None) -> list:
+    """
+    returns the list of (name, class) of benchmarks matching pattern
+    """
+    benchmarks = []
+    for mname in MODULES:
+        module = importlib.import_module("benchmarks." + mname)
+        for cname, cls in inspect.getmembers(module, inspect.isclass):
+            if cls.__module__ != module.__name__ or not hasattr(cls, "run"):
+                continue
+            name = "%s.%s" % (mname, cname)
+            if pattern and pattern not in name:
+                continue
+            benchmarks.append((name, cls))
+    return benchmarks
+
+def param_key(param) -> str:
+    if param is None:
+        return ""
+    if isinstance(param, tuple):
+        return "-".join(str(p) for p in param)
+    return str(param)
+
+def measure(cls, param, repeat: int) -> dict:
+    """
+    time repeat runs of benchmark cls for param
+    """
+    bench = cls()
+    args = () if param is None else (param,)
+    if hasattr(bench, "setup"):
+        bench.setup(*args)
+    try:
+        # warmup
+        bench.run(*args)
+        times = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            bench.run(*args)
+            times.append(time.perf_counter() - start)
+    finally:
+        if hasattr(bench, "teardown"):
+            bench.teardown(*args)
+
+    return {
+        'times': times,
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.mean(times),
+        'stdev': statistics.stdev(times) if len(times) > 1 else 0.
+    }
+
+def environment() -> dict:
+    """
+    returns versions of python, dependencies and of the sources
+    """
+    import numpy
+    import python_magnetgeo
+
+    env = {
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'numpy': numpy.__version__,
+        'python_magnetgeo': python_magnetgeo.__version__,
+        'gmsh': None,
+        'commit': None
+    }
+    if available("gmsh"):
+        import gmsh
+        env['gmsh'] = gmsh.__version__
+    try:
+        env['commit'] = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                                       text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    return env
+
+def run(pattern: str = None, repeat: int = 5, verbose: bool = True) -> dict:
+    """
+    run benchmarks matching pattern in a temporary copy of data
+
+    returns the results
+    """
+    results = {}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="magnetgeo-bench-") as workdir:
+        for filename in glob.glob(os.path.join(ROOT, "data", "*")):
+            if os.path.isfile(filename):
+                shutil.copy(filename, workdir)
+        os.chdir(workdir)
+        try:
+            for (name, cls) in discover(pattern):
+                missing = [module for module in getattr(cls, "requires", []) if not available(module)]
+                if missing:
+                    results[name] = {'skipped': "%s not available" % ", ".join(missing)}
+                    if verbose:
+                        print("%-40s skipped (%s)" % (name, results[name]['skipped']))
+                    continue
+
+                results[name] = {}
+                for param in getattr(cls, "params", [None]):
+                    key = param_key(param)
+                    result = measure(cls, param, repeat)
+                    results[name][key] = result
+                    if verbose:
+                        print("%-40s %-20s %10.4f s" % (name, key, result['median']))
+        finally:
+            os.chdir(cwd)
+    return results
+
+def compare(new: dict, base: dict):
+    """
+    print median times of new results relative to base
+    """
+    print("%-40s %-20s %10s %10s %8s" % ("benchmark", "param", "base", "new", "ratio"))
+    for name, params in new['results'].items():
+        for key, result in params.items():
+            if key == 'skipped':
+                continue
+            ref = base['results'].get(name, {}).get(key)
+            if not isinstance(ref, dict):
+                print("%-40s %-20s %10s %10.4f" % (name, key, "-", result['median']))
+                continue
+            print("%-40s %-20s %10.4f %10.4f %8.2f" % (name, key, ref['median'], result['median'],
+                                                       result['median'] / ref['median']))
+
+def main():
+    parser = argparse.ArgumentParser(description="run python_magnetgeo benchmarks")
+    parser.add_argument("-o", "--output", help="save results as json", type=str)
+    parser.add_argument("-k", help="only run benchmarks containing this string", type=str, dest="pattern")
+    parser.add_argument("--repeat", help="number of timed runs", type=int, default=5)
+    parser.add_argument("--compare", help="compare with results stored in json", type=str)
+    parser.add_argument("--list", help="list benchmarks", action="store_true")
+    args = parser.parse_args()
+
+    if args.list:
+        for (name, cls) in discover(args.pattern):
+            print(name, [param_key(param) for param in getattr(cls, "params", [None])])
+        return 0
+
+    data = {'environment': environment(), 'repeat': args.repeat, 'results': run(args.pattern, args.repeat)}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(data, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            compare(data, json.load(f))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
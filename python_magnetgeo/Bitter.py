@@ -9,11 +9,18 @@ Provides definition for Bitter:
 * Model 3D: actual 3D CAD
 """
 
-import json
+import logging
 import yaml
 from . import deserialize
+from . import loader
+from . import repository
 
 from . import ModelAxi
+from . import profiling
+from . import bcindex
+from . import brepcache
+
+logger = logging.getLogger(__name__)
 
 class Bitter(yaml.YAMLObject):
     """
@@ -52,8 +59,8 @@ class Bitter(yaml.YAMLObject):
         dump object to file
         """
         try:
-            ostream = open(self.name + '.yaml', 'w')
-            yaml.dump(self, stream=ostream)
+            ostream = open(repository.output(self.name + '.yaml'), 'w')
+            loader.dump(self, stream=ostream)
             ostream.close()
         except:
             raise Exception("Failed to Bitter dump")
@@ -64,8 +71,8 @@ class Bitter(yaml.YAMLObject):
         """
         data = None
         try:
-            istream = open(self.name + '.yaml', 'r')
-            data = yaml.load(stream=istream)
+            istream = open(repository.resolve(self.name + '.yaml'), 'r')
+            data = loader.load(istream)
             istream.close()
         except:
             raise Exception("Failed to load Bitter data %s.yaml"%self.name)
@@ -75,24 +82,24 @@ class Bitter(yaml.YAMLObject):
         self.z = data.z
         self.axi = data.axi
 
-    def to_json(self):
+    def to_json(self, compact: bool = False):
         """
         convert from yaml to json
         """
-        return json.dumps(self, default=deserialize.serialize_instance, sort_keys=True, indent=4)
+        return deserialize.dumps(self, compact)
 
 
     def from_json(self, string):
         """
         convert from json to yaml
         """
-        return json.loads(string, object_hook=deserialize.unserialize_object)
+        return deserialize.loads(string)
 
     def write_to_json(self):
         """
         write from json file
         """
-        ostream = open(self.name + '.json', 'w')
+        ostream = open(repository.output(self.name + '.json'), 'w')
         jsondata = self.to_json()
         ostream.write(str(jsondata))
         ostream.close()
@@ -101,9 +108,9 @@ class Bitter(yaml.YAMLObject):
         """
         read from json file
         """
-        istream = open(self.name + '.json', 'r')
+        istream = open(repository.resolve(self.name + '.json'), 'r')
         jsondata = self.from_json(istream.read())
-        print (type(jsondata))
+        logger.debug("%s", type(jsondata))
         istream.close()
 
     def get_Nturns(self):
@@ -112,6 +119,8 @@ class Bitter(yaml.YAMLObject):
         """
         return self.axi.get_Nturns()
 
+    @profiling.timed()
+    @brepcache.cached()
     def gmsh(self, Air=False, debug=False):
         """
         create gmsh geometry
@@ -121,13 +130,11 @@ class Bitter(yaml.YAMLObject):
         gmsh_ids = []
         x = self.r[0]
         dr = self.r[1] - self.r[0]
-        y = -self.axi.h
-        for i, (n, pitch) in enumerate(zip(self.axi.turns, self.axi.pitch)):
-            dz = n * pitch
-            _id = gmsh.model.occ.addRectangle(x, y, 0, dr, dz)
+        sections = self.axi.get_sections()
+        for (z, dz) in zip(sections.z[:-1].tolist(), sections.dz.tolist()):
+            _id = gmsh.model.occ.addRectangle(x, z, 0, dr, dz)
             gmsh_ids.append(_id)
-                
-            y += dz
+        y = float(sections.z[-1])
         # Now create air
         if Air:
             r0_air = 0
@@ -141,6 +148,8 @@ class Bitter(yaml.YAMLObject):
 
         return (gmsh_ids, None)
 
+    @profiling.timed()
+    @bcindex.indexed()
     def gmsh_bcs(self, ids: tuple, debug=False):
         """
         retreive ids for bcs in gmsh geometry
@@ -151,69 +160,41 @@ class Bitter(yaml.YAMLObject):
 
         # set physical name
         for i,id in enumerate(B_ids):
-            ps = gmsh.model.addPhysicalGroup(2, [id])
+            ps = bcindex.addPhysicalGroup(2, [id])
             gmsh.model.setPhysicalName(2, ps, "%s_Cu%d" % (self.name, i))
         
         # get BC ids
-        gmsh.option.setNumber("Geometry.OCCBoundsUseStl", 1)
-
-        # TODO: if z[xx] < 0 multiply by 1+eps to get a min by 1-eps to get a max
-        eps = 1.e-3
-        ov = gmsh.model.getEntitiesInBoundingBox(self.r[0]* (1-eps), (self.z[0])* (1+eps), 0,
-                                                 self.r[-1]* (1+eps), (self.z[0])* (1-eps), 0, 1)
-        ps = gmsh.model.addPhysicalGroup(1, [tag for (dim,tag) in ov])
+        ps = bcindex.addPhysicalGroup(1, bcindex.getSideCurves(B_ids, 'z0'))
         gmsh.model.setPhysicalName(1, ps, "%s_HP" % self.name)
         
-        ov = gmsh.model.getEntitiesInBoundingBox(self.r[0]* (1-eps), (self.z[-1])* (1-eps), 0,
-                                                 self.r[-1]* (1+eps), (self.z[-1])* (1+eps), 0, 1)
-        ps = gmsh.model.addPhysicalGroup(1, [tag for (dim,tag) in ov])
+        ps = bcindex.addPhysicalGroup(1, bcindex.getSideCurves(B_ids, 'z1'))
         gmsh.model.setPhysicalName(1, ps, "%s_BP" % self.name)
         
-        ov = gmsh.model.getEntitiesInBoundingBox(self.r[0]* (1-eps), self.z[0]* (1+eps), 0,
-                                                 self.r[0]* (1+eps), self.z[1]* (1+eps), 0, 1)
-        r0_bc_ids = [tag for (dim,tag) in ov]
+        r0_bc_ids = bcindex.getSideCurves(B_ids, 'r0')
         if debug:
-            print("r0_bc_ids:", len(r0_bc_ids), 
-                     self.r[0]* (1-eps), self.z[0]* (1+eps),
-                     self.r[0]* (1+eps), self.z[1]* (1+eps))
-        ps = gmsh.model.addPhysicalGroup(1, [tag for (dim,tag) in ov])
+            logger.debug("r0_bc_ids: %s", len(r0_bc_ids))
+        ps = bcindex.addPhysicalGroup(1, r0_bc_ids)
         gmsh.model.setPhysicalName(1, ps, "%s_Rint" % self.name)
 
-        ov = gmsh.model.getEntitiesInBoundingBox(self.r[1]* (1-eps), self.z[0]* (1+eps), 0,
-                                                 self.r[1]* (1+eps), self.z[1]* (1+eps), 0, 1)
-        r1_bc_ids = [tag for (dim,tag) in ov]
+        r1_bc_ids = bcindex.getSideCurves(B_ids, 'r1')
         if debug:
-            print("r1_bc_ids:", len(r1_bc_ids))
-        ps = gmsh.model.addPhysicalGroup(1, [tag for (dim,tag) in ov])
+            logger.debug("r1_bc_ids: %s", len(r1_bc_ids))
+        ps = bcindex.addPhysicalGroup(1, r1_bc_ids)
         gmsh.model.setPhysicalName(1, ps, "%s_Rext" % self.name)
 
         # TODO: Air
         if Air_data:
             (Air_id, dr_air, z0_air, dz_air) = Air_data
 
-            ps = gmsh.model.addPhysicalGroup(2, [Air_id])
+            ps = bcindex.addPhysicalGroup(2, [Air_id])
             gmsh.model.setPhysicalName(2, ps, "Air")
 
-            # TODO: Axis, Inf
-            gmsh.option.setNumber("Geometry.OCCBoundsUseStl", 1)
-            
-            eps = 1.e-6
-            
-            ov = gmsh.model.getEntitiesInBoundingBox(-eps, z0_air-eps, 0, +eps, z0_air+dz_air+eps, 0, 1)
-            print("ov:", len(ov))
-            ps = gmsh.model.addPhysicalGroup(1, [tag for (dim,tag) in ov])
+            (Axis_ids, Inf_ids) = bcindex.getAirCurves([Air_id])
+            logger.debug("Axis: %s, Inf: %s", len(Axis_ids), len(Inf_ids))
+            ps = bcindex.addPhysicalGroup(1, Axis_ids)
             gmsh.model.setPhysicalName(1, ps, "Axis")
             
-            ov = gmsh.model.getEntitiesInBoundingBox(-eps, z0_air-eps, 0, dr_air+eps, z0_air+eps, 0, 1)
-            print("ov:", len(ov))
-            
-            ov += gmsh.model.getEntitiesInBoundingBox(dr_air-eps, z0_air-eps, 0, dr_air+eps, z0_air+dz_air+eps, 0, 1)
-            print("ov:", len(ov))
-            
-            ov += gmsh.model.getEntitiesInBoundingBox(-eps, z0_air+dz_air-eps, 0, dr_air+eps, z0_air+dz_air+eps, 0, 1)
-            print("ov:", len(ov))
-            
-            ps = gmsh.model.addPhysicalGroup(1, [tag for (dim,tag) in ov])
+            ps = bcindex.addPhysicalGroup(1, Inf_ids)
             gmsh.model.setPhysicalName(1, ps, "Inf")            
 
         pass
@@ -231,4 +212,5 @@ def Bitter_constructor(loader, node):
     return Bitter(name, r, z, axi)
 
 yaml.add_constructor(u'!Bitter', Bitter_constructor)
+loader.register(Bitter, Bitter_constructor)
 
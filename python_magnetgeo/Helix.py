@@ -10,13 +10,20 @@ Provides definition for Helix:
 * Shape: definition of Shape eventually added to the helical cut
 """
 
-import json
+import logging
 import yaml
 from . import deserialize
+from . import loader
+from . import repository
 
 from . import Shape
 from . import ModelAxi
 from . import Model3D
+from . import profiling
+from . import bcindex
+from . import brepcache
+
+logger = logging.getLogger(__name__)
 
 class Helix(yaml.YAMLObject):
     """
@@ -70,8 +77,8 @@ class Helix(yaml.YAMLObject):
         dump object to file
         """
         try:
-            ostream = open(self.name + '.yaml', 'w')
-            yaml.dump(self, stream=ostream)
+            ostream = open(repository.output(self.name + '.yaml'), 'w')
+            loader.dump(self, stream=ostream)
             ostream.close()
         except:
             raise Exception("Failed to Helix dump")
@@ -82,8 +89,8 @@ class Helix(yaml.YAMLObject):
         """
         data = None
         try:
-            istream = open(self.name + '.yaml', 'r')
-            data = yaml.load(stream=istream)
+            istream = open(repository.resolve(self.name + '.yaml'), 'r')
+            data = loader.load(istream)
             istream.close()
         except:
             raise Exception("Failed to load Helix data %s.yaml"%self.name)
@@ -98,24 +105,24 @@ class Helix(yaml.YAMLObject):
         self.m3d = data.m3d
         self.shape = data.shape
 
-    def to_json(self):
+    def to_json(self, compact: bool = False):
         """
         convert from yaml to json
         """
-        return json.dumps(self, default=deserialize.serialize_instance, sort_keys=True, indent=4)
+        return deserialize.dumps(self, compact)
 
 
     def from_json(self, string):
         """
         convert from json to yaml
         """
-        return json.loads(string, object_hook=deserialize.unserialize_object)
+        return deserialize.loads(string)
 
     def write_to_json(self):
         """
         write from json file
         """
-        ostream = open(self.name + '.json', 'w')
+        ostream = open(repository.output(self.name + '.json'), 'w')
         jsondata = self.to_json()
         ostream.write(str(jsondata))
         ostream.close()
@@ -124,9 +131,9 @@ class Helix(yaml.YAMLObject):
         """
         read from json file
         """
-        istream = open(self.name + '.json', 'r')
+        istream = open(repository.resolve(self.name + '.json'), 'r')
         jsondata = self.from_json(istream.read())
-        print (type(jsondata))
+        logger.debug("%s", type(jsondata))
         istream.close()
 
     def get_Nturns(self):
@@ -135,6 +142,8 @@ class Helix(yaml.YAMLObject):
         """
         return self.axi.get_Nturns()
 
+    @profiling.timed()
+    @brepcache.cached()
     def gmsh(self, debug=False):
         """
         create gmsh geometry
@@ -151,23 +160,24 @@ class Helix(yaml.YAMLObject):
         _id = gmsh.model.occ.addRectangle(self.r[0], self.z[0], 0, dr, y-self.z[0])
         gmsh_ids.append(_id)
 
-        for i, (n, pitch) in enumerate(zip(self.axi.turns, self.axi.pitch)):
-            dz = n * pitch
-            _id = gmsh.model.occ.addRectangle(x, y, 0, dr, dz)
+        sections = self.axi.get_sections()
+        for (z, dz) in zip(sections.z[:-1].tolist(), sections.dz.tolist()):
+            _id = gmsh.model.occ.addRectangle(x, z, 0, dr, dz)
             gmsh_ids.append(_id)
-                
-            y += dz
+        y = float(sections.z[-1])
 
         _id = gmsh.model.occ.addRectangle(self.r[0], y, 0, dr, self.z[1]-y)
         gmsh_ids.append(_id)
 
         if debug:
-            print("gmsh_ids:", len(gmsh_ids))
+            logger.debug("gmsh_ids: %s", len(gmsh_ids))
             for i in gmsh_ids:
-                print(i)
+                logger.debug("%s", i)
 
         return gmsh_ids
 
+    @profiling.timed()
+    @bcindex.indexed()
     def gmsh_bcs(self, name, ids, debug=False):
         """
         retreive ids for bcs in gmsh geometry
@@ -177,24 +187,12 @@ class Helix(yaml.YAMLObject):
         
         # set physical name
         for i,id in enumerate(ids):
-            ps = gmsh.model.addPhysicalGroup(2, [id])
+            ps = bcindex.addPhysicalGroup(2, [id])
             gmsh.model.setPhysicalName(2, ps, "%s_Cu%d" % (name, i))
         
         # get BC ids
-        gmsh.option.setNumber("Geometry.OCCBoundsUseStl", 1)
-
-        eps = 1.e-3
-        # TODO: if z[xx] < 0 multiply by 1+eps to get a min by 1-eps to get a max
-        zmin = self.z[0]* (1+eps)
-        zmax = self.z[1]* (1+eps)
-        
-        ov = gmsh.model.getEntitiesInBoundingBox(self.r[0]* (1-eps), zmin, 0,
-                                                 self.r[0]* (1+eps), zmax, 0, 1)
-        r0_bc_ids = [tag for (dim,tag) in ov]
-
-        ov = gmsh.model.getEntitiesInBoundingBox(self.r[1]* (1-eps), zmin, 0,
-                                                 self.r[1]* (1+eps), zmax, 0, 1)
-        r1_bc_ids = [tag for (dim,tag) in ov]
+        r0_bc_ids = bcindex.getSideCurves(ids, 'r0')
+        r1_bc_ids = bcindex.getSideCurves(ids, 'r1')
 
         return (r0_bc_ids, r1_bc_ids)
 
@@ -217,4 +215,5 @@ def Helix_constructor(loader, node):
     return Helix(name, r, z, cutwidth, odd, dble, axi, m3d, shape)
 
 yaml.add_constructor(u'!Helix', Helix_constructor)
+loader.register(Helix, Helix_constructor)
 
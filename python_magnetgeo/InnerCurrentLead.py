@@ -5,9 +5,10 @@
 Provides Inner and OuterCurrentLead class
 """
 
-import json
 import yaml
 from . import deserialize
+from . import loader
+from . import repository
 
 class InnerCurrentLead(yaml.YAMLObject):
     """
@@ -50,7 +51,7 @@ class InnerCurrentLead(yaml.YAMLObject):
         dump object to file
         """
         try:
-            yaml.dump(self, open(self._name + '.yaml', 'w'))
+            loader.dump(self, open(repository.output(self._name + '.yaml'), 'w'))
         except:
             raise Exception("Failed to dump InnerCurrentLead data")
 
@@ -60,8 +61,8 @@ class InnerCurrentLead(yaml.YAMLObject):
         """
         data = None
         try:
-            istream = open(self._name + '.yaml', 'r')
-            data = yaml.load(istream)
+            istream = open(repository.resolve(self._name + '.yaml'), 'r')
+            data = loader.load(istream)
             istream.close()
         except:
             raise Exception("Failed to load InnerCurrentLead data %s.yaml"%self._name)
@@ -73,19 +74,18 @@ class InnerCurrentLead(yaml.YAMLObject):
         self.support = data.support
         self.fillet = data.fillet
 
-    def to_json(self):
+    def to_json(self, compact: bool = False):
         """
         convert from yaml to json
         """
-        return json.dumps(self, default=deserialize.serialize_instance, \
-                          sort_keys=True, indent=4)
+        return deserialize.dumps(self, compact)
 
     def from_json(self, string):
         """
         convert from json to yaml
         """
         print ("from_json(%s)" % string)
-        return json.loads(string, object_hook=deserialize.unserialize_object)
+        return deserialize.loads(string)
 
     def write_to_json(self):
         """
@@ -93,7 +93,7 @@ class InnerCurrentLead(yaml.YAMLObject):
         """
         jsondata = self.to_json()
         try:
-            ofile = open(self.name + '.json', 'w')
+            ofile = open(repository.output(self.name + '.json'), 'w')
             ofile.write(str(jsondata))
             ofile.close()
         except:
@@ -103,7 +103,7 @@ class InnerCurrentLead(yaml.YAMLObject):
         """
         read from json file
         """
-        istream = open(self.name + '.json', 'r')
+        istream = open(repository.resolve(self.name + '.json'), 'r')
         jsondata = self.from_json(istream.read())
         istream.close()
         print (type(jsondata))
@@ -132,6 +132,7 @@ def InnerCurrentLead_constructor(loader, node):
 
 
 yaml.add_constructor(u'!InnerCurrentLead', InnerCurrentLead_constructor)
+loader.register(InnerCurrentLead, InnerCurrentLead_constructor)
 
 #
 # To operate from command line
@@ -153,7 +154,7 @@ if __name__ == "__main__":
     else:    
         lead = None
         with open(args.name, 'r') as f:
-            lead = yaml.load(f)
+            lead = loader.load(f)
         print ("lead=", lead)
 
     if args.tojson:
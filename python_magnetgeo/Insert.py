@@ -3,10 +3,18 @@
 
 """defines Insert structure"""
 
+import logging
 import datetime
-import json
+import numpy as np
 import yaml
 from . import deserialize
+from . import loader
+from . import repository
+from . import profiling
+from . import bcindex
+from . import brepcache
+
+logger = logging.getLogger(__name__)
 
 class Insert(yaml.YAMLObject):
     """
@@ -30,12 +38,12 @@ class Insert(yaml.YAMLObject):
         self.Helices = Helices
         self.HAngles = HAngles
         for Angle in self.HAngles:
-            print ("Angle: ", Angle)
+            logger.debug("Angle: %s", Angle)
         self.Rings = Rings
         self.RAngles = RAngles
         self.CurrentLeads = CurrentLeads
-        self.innerBore = innerbore
-        self.outerBore = outerbore
+        self.innerbore = innerbore
+        self.outerbore = outerbore
 
     def __repr__(self):
         """representation"""
@@ -53,17 +61,17 @@ class Insert(yaml.YAMLObject):
     def dump(self):
         """dump to a yaml file name.yaml"""
         try:
-            ostream = open(self.name + '.yaml', 'w')
-            yaml.dump(self, stream=ostream)
+            ostream = open(repository.output(self.name + '.yaml'), 'w')
+            loader.dump(self, stream=ostream)
         except:
-            print ("Failed to Insert dump")
+            logger.warning("Failed to Insert dump")
 
     def load(self):
         """load from a yaml file"""
         data = None
         try:
-            istream = open(self.name + '.yaml', 'r')
-            data = yaml.load(stream=istream)
+            istream = open(repository.resolve(self.name + '.yaml'), 'r')
+            data = loader.load(istream)
         except:
             raise Exception("Failed to load Insert data %s" % (self.name+".yaml"))
 
@@ -77,27 +85,26 @@ class Insert(yaml.YAMLObject):
         self.innerbore = data.innerbore
         self.outerbore = data.outerbore
 
-    def to_json(self):
+    def to_json(self, compact: bool = False):
         """convert from yaml to json"""
-        return json.dumps(self, default=deserialize.serialize_instance, \
-            sort_keys=True, indent=4)
+        return deserialize.dumps(self, compact)
 
     def from_json(self, string):
         """get from json"""
-        return json.loads(string, object_hook=deserialize.unserialize_object)
+        return deserialize.loads(string)
 
     def write_to_json(self):
         """write to a json file"""
-        ostream = open(self.name + '.json', 'w')
+        ostream = open(repository.output(self.name + '.json'), 'w')
         jsondata = self.to_json()
         ostream.write(str(jsondata))
         ostream.close()
 
     def read_from_json(self):
         """read from a json file"""
-        istream = open(self.name + '.json', 'r')
+        istream = open(repository.resolve(self.name + '.json'), 'r')
         jsondata = self.from_json(istream.read())
-        print (type(jsondata))
+        logger.debug("%s", type(jsondata))
         istream.close()
 
     ###################################################################
@@ -105,9 +112,15 @@ class Insert(yaml.YAMLObject):
     #
     ###################################################################
 
-    def gmsh(self, Air=False, debug=False):
+    @profiling.timed()
+    @brepcache.cached()
+    def gmsh(self, Air=False, debug=False, batch=False):
         """
         create gmsh geometry
+
+        batch: when True, helices, rings and air are created first and
+        merged with a single fragment (instead of one fragment per ring
+        and one for air); returned ids are updated accordingly
         """
         import gmsh
 
@@ -118,9 +131,7 @@ class Insert(yaml.YAMLObject):
         r = []
         H_ids = []
         for i, name in enumerate(self.Helices):
-            Helix = None
-            with open(name+".yaml", 'r') as f:
-                Helix = yaml.load(f, Loader=yaml.FullLoader)
+            Helix = repository.load(name)
 
             H_ids.append(Helix.gmsh())
             if i%2 == 0:
@@ -135,9 +146,7 @@ class Insert(yaml.YAMLObject):
         # loop over Rings
         R_ids = []
         for i, name in enumerate(self.Rings):
-            Ring = None
-            with open(name+".yaml", 'r') as f:
-                Ring = yaml.load(f, Loader = yaml.FullLoader)
+            Ring = repository.load(name)
 
             x = 0
             y = z[i]
@@ -149,6 +158,9 @@ class Insert(yaml.YAMLObject):
 
             R_id = Ring.gmsh(x, y)
             R_ids.append(R_id)
+            if batch:
+                continue
+
             # fragment
             if i%2 != 0:
                 ov, ovv = gmsh.model.occ.fragment([(2, R_id)], [(2, H_ids[i][0]), (2, H_ids[i+1][0])] )    
@@ -156,30 +168,80 @@ class Insert(yaml.YAMLObject):
                 ov, ovv = gmsh.model.occ.fragment([(2, R_id)], [(2, H_ids[i][-1]), (2, H_ids[i+1][-1])] )
 
             if debug:
-                print("Insert/Ring[%d]:" % i, "R_id=%d" % R_id, " fragment produced volumes:", len(ov), len(ovv))
+                logger.debug("Insert/Ring[%d]: R_id=%d  fragment produced volumes: %s %s", i, R_id, len(ov), len(ovv))
                 for e in ov:
-                    print(e)
+                    logger.debug("%s", e)
         
         # Now create air
+        Air_data = None
         if Air:
             r0_air = 0
             dr_air = max(r) * 2
             z0_air = min(z0) * 1.2
             dz_air = max(z1) * 1.2 - z0_air
             _id = gmsh.model.occ.addRectangle(r0_air, z0_air, 0, dr_air, dz_air)
+            Air_data = (_id, dr_air, z0_air, dz_air)
+
+        if batch:
+            return self._gmsh_fragment(H_ids, R_ids, Air_data, debug)
         
+        if Air:
             flat_list = []
             for sublist in H_ids:
                 for item in sublist:
                     flat_list.append(item)
             flat_list += R_ids
-            print("flat_list:", flat_list)
+            logger.debug("flat_list: %s", flat_list)
             ov, ovv = gmsh.model.occ.fragment([(2, _id)], [(2, i) for i in flat_list] )
-            return (H_ids, R_ids, (_id, dr_air, z0_air, dz_air))
 
         # TODO return ids
-        return (H_ids, R_ids, None)
+        return (H_ids, R_ids, Air_data)
+
+    @profiling.timed()
+    def _gmsh_fragment(self, H_ids: list, R_ids: list, Air_data: tuple, debug: bool = False):
+        """
+        fragment helices, rings and air all at once
+
+        returns H_ids, R_ids and Air_data with tags remapped from ovv
+        (in Air_data, air tag is replaced by the list of air surfaces)
+        """
+        import gmsh
+
+        objects = [(2, id) for ids in H_ids for id in ids]
+        tools = [(2, id) for id in R_ids]
+        if Air_data:
+            tools.append((2, Air_data[0]))
+        if not tools:
+            return (H_ids, R_ids, Air_data)
+
+        ov, ovv = gmsh.model.occ.fragment(objects, tools)
+        if debug:
+            logger.debug("Insert/fragment: %s surfaces, fragment produced surfaces: %s", len(objects)+len(tools), len(ov))
+
+        # ovv[n] holds the surfaces coming from the n-th input surface
+        def remap(n: int, id: int) -> int:
+            tags = [tag for (dim, tag) in ovv[n]]
+            if len(tags) != 1:
+                raise Exception("Insert/gmsh: surface %d split into %s by fragment" % (id, tags))
+            return tags[0]
+
+        n = 0
+        new_H_ids = []
+        for ids in H_ids:
+            new_H_ids.append([remap(n+j, id) for j, id in enumerate(ids)])
+            n += len(ids)
+        new_R_ids = [remap(n+j, id) for j, id in enumerate(R_ids)]
+        n += len(R_ids)
 
+        if Air_data:
+            conductors = set(tag for ids in new_H_ids for tag in ids) | set(new_R_ids)
+            Air_ids = [tag for (dim, tag) in ovv[n] if tag not in conductors]
+            Air_data = (Air_ids,) + Air_data[1:]
+
+        return (new_H_ids, new_R_ids, Air_data)
+
+    @profiling.timed()
+    @bcindex.indexed()
     def gmsh_bcs(self, ids: tuple, debug: bool =False):
         """
         retreive ids for bcs in gmsh geometry
@@ -188,16 +250,12 @@ class Insert(yaml.YAMLObject):
 
         (H_ids, R_ids, Air_data) = ids
 
-        eps =1.e-3
-
         # loop over Helices
         z = []
         H_Bc_ids = []
         NHelices = len(self.Helices)
         for i, name in enumerate(self.Helices):
-            Helix = None
-            with open(name+".yaml", 'r') as f:
-                Helix = yaml.load(f, Loader=yaml.FullLoader)
+            Helix = repository.load(name)
 
             hname = "H%d" % (i+1)
             (r0_ids, r1_ids) = Helix.gmsh_bcs(hname, H_ids[i], debug)
@@ -208,18 +266,16 @@ class Insert(yaml.YAMLObject):
             H_Bc_ids.append((r0_ids, r1_ids))
 
             if i == 0:
-                ov = gmsh.model.getEntitiesInBoundingBox(Helix.r[0]-eps, Helix.z[0]-eps, 0, Helix.r[1]+eps, Helix.z[0]+eps, 0, 1)
-                print("ov:", len(ov))
-                ps = gmsh.model.addPhysicalGroup(1, [tag for (dim,tag) in ov])
+                HP_ids = bcindex.getSideCurves(H_ids[i], 'z0')
+                logger.debug("H1_HP: %s", len(HP_ids))
+                ps = bcindex.addPhysicalGroup(1, HP_ids)
                 gmsh.model.setPhysicalName(1, ps, "H1_HP")
 
         # loop over Rings
         R_Bc_ids = []
         NRings = len(self.Rings)
         for i, name in enumerate(self.Rings):
-            Ring = None
-            with open(name+".yaml", 'r') as f:
-                Ring = yaml.load(f, Loader = yaml.FullLoader)
+            Ring = repository.load(name)
 
             y = z[i]
             if i%2 != 0:
@@ -228,13 +284,13 @@ class Insert(yaml.YAMLObject):
             rname = "R%d" % (i+1)
             (r0_ids, r1_ids, slit_ids) = Ring.gmsh_bcs(rname, (i%2 != 0), y, R_ids[i], debug)
             R_Bc_ids.append((r0_ids, r1_ids, slit_ids))
-        print("R_bcs %d " % len(R_Bc_ids), ":" , R_Bc_ids)
+        logger.debug("R_bcs %d  : %s", len(R_Bc_ids), R_Bc_ids)
 
         # TODO group bcs by Channels
         num = 0
         NChannels = NHelices+1
         for i in range(NChannels):
-            print("Channel%d" % i)
+            logger.debug("Channel%d", i)
             Channel_id = []
             if i == 0:
                 # names.append("R%d_R0n" % (i+1)) # check Ring nummerotation
@@ -251,75 +307,83 @@ class Insert(yaml.YAMLObject):
                     Channel_id += H_Bc_ids[i][0]
                 if i != 0 and i+1 < NChannels:
                     # names.append("R%d_CoolingSlits" % (i))
-                    print("R_Bc_ids[%d]" % i, R_Bc_ids[i-1])
+                    logger.debug("R_Bc_ids[%d] %s", i, R_Bc_ids[i-1])
                     Channel_id += R_Bc_ids[i-1][2]
                     #names.append("R%d_R0n" % (i+1))
                     if i < NRings:
                         Channel_id += R_Bc_ids[i][0]
             
-            ps = gmsh.model.addPhysicalGroup(1, Channel_id)
+            ps = bcindex.addPhysicalGroup(1, Channel_id)
             gmsh.model.setPhysicalName(1, ps, "Channel%d" % i)
         
         # TODO: Air
         if Air_data:
             (Air_id, dr_air, z0_air, dz_air) = Air_data
 
-            ps = gmsh.model.addPhysicalGroup(2, [Air_id])
+            if not isinstance(Air_id, list):
+                Air_id = [Air_id]
+            ps = bcindex.addPhysicalGroup(2, Air_id)
             gmsh.model.setPhysicalName(2, ps, "Air")
 
-            # TODO: Axis, Inf
-            gmsh.option.setNumber("Geometry.OCCBoundsUseStl", 1)
-            
-            eps = 1.e-6
-            
-            ov = gmsh.model.getEntitiesInBoundingBox(-eps, z0_air-eps, 0, +eps, z0_air+dz_air+eps, 0, 1)
-            print("ov:", len(ov))
-            ps = gmsh.model.addPhysicalGroup(1, [tag for (dim,tag) in ov])
+            (Axis_ids, Inf_ids) = bcindex.getAirCurves(Air_id)
+            logger.debug("Axis: %s, Inf: %s", len(Axis_ids), len(Inf_ids))
+            ps = bcindex.addPhysicalGroup(1, Axis_ids)
             gmsh.model.setPhysicalName(1, ps, "Axis")
             
-            ov = gmsh.model.getEntitiesInBoundingBox(-eps, z0_air-eps, 0, dr_air+eps, z0_air+eps, 0, 1)
-            print("ov:", len(ov))
-            
-            ov += gmsh.model.getEntitiesInBoundingBox(dr_air-eps, z0_air-eps, 0, dr_air+eps, z0_air+dz_air+eps, 0, 1)
-            print("ov:", len(ov))
-            
-            ov += gmsh.model.getEntitiesInBoundingBox(-eps, z0_air+dz_air-eps, 0, dr_air+eps, z0_air+dz_air+eps, 0, 1)
-            print("ov:", len(ov))
-            
-            ps = gmsh.model.addPhysicalGroup(1, [tag for (dim,tag) in ov])
+            ps = bcindex.addPhysicalGroup(1, Inf_ids)
             gmsh.model.setPhysicalName(1, ps, "Inf")            
 
         pass
 
-    def Create_AxiGeo(self, Air=False):
+    @profiling.timed()
+    def Create_AxiGeo(self, Air=False, stream=None):
         """
         create Axisymetrical Geo Model for gmsh
 
+        stream: file-like object where geo is written
+        (default: name_axi.geo)
+
         return
         H_ids, R_ids, BC_ids, Air_ids, BC_Air_ids
         """
+        ids = []
+        geo = "".join(self.gen_AxiGeo(Air, ids))
+
+        if stream is None:
+            with open(repository.output(self.name + "_axi.geo"), "w") as geofile:
+                geofile.write(geo)
+        else:
+            stream.write(geo)
+
+        return tuple(ids)
+
+    def gen_AxiGeo(self, Air=False, ids=None):
+        """
+        generate Axisymetrical Geo Model for gmsh as text fragments
+
+        ids: optional list, filled with
+        H_ids, R_ids, BC_ids, Air_ids, BC_Air_ids
+        once the generator is exhausted
+        """
         import getpass
         UserName = getpass.getuser()
 
-        geofilename = self.name + "_axi.geo"
-        geofile = open(geofilename, "w")
-
         # Preambule
-        geofile.write("//%s\n" % self.name)
-        geofile.write("// AxiSymetrical Geometry Model\n")
-        geofile.write("//%s\n" % UserName)
-        geofile.write("//%s\n" % (datetime.datetime.now().strftime("%y-%m-%d %Hh%M")))
-        geofile.write("\n")
+        yield "//%s\n" % self.name
+        yield "// AxiSymetrical Geometry Model\n"
+        yield "//%s\n" % UserName
+        yield "//%s\n" % (datetime.datetime.now().strftime("%y-%m-%d %Hh%M"))
+        yield "\n"
 
         # Mesh Preambule
-        geofile.write("// Mesh Preambule\n")
-        geofile.write("Mesh.Algorithm=3;\n")
-        geofile.write("Mesh.RecombinationAlgorithm=0; // Deactivate Blossom support\n")
-        geofile.write("Mesh.RemeshAlgorithm=1; //(0=no split, 1=automatic, 2=automatic only with metis)\n")
-        geofile.write("Mesh.RemeshParametrization=0; //\n\n")
+        yield "// Mesh Preambule\n"
+        yield "Mesh.Algorithm=3;\n"
+        yield "Mesh.RecombinationAlgorithm=0; // Deactivate Blossom support\n"
+        yield "Mesh.RemeshAlgorithm=1; //(0=no split, 1=automatic, 2=automatic only with metis)\n"
+        yield "Mesh.RemeshParametrization=0; //\n\n"
 
         # Define Parameters
-        geofile.write("//Geometric Parameters\n")
+        yield "//Geometric Parameters\n"
         onelab_r0 = "DefineConstant[ r0_H%d = {%g, Name \"Geom/H%d/Rint\"} ];\n" # should add a min and a max
         onelab_r1 = "DefineConstant[ r1_H%d = {%g, Name \"Geom/H%d/Rext\"} ];\n"
         onelab_z0 = "DefineConstant[ z0_H%d = {%g, Name \"Geom/H%d/Zinf\"} ];\n" #  should add a min and a max
@@ -359,35 +423,33 @@ class Insert(yaml.YAMLObject):
             HP = []
             dH = []
 
-            Helix = None
-            with open(name+".yaml", 'r') as f:
-                Helix = yaml.load(f)
-            geofile.write("// H%d : %s\n" % (i+1, Helix.name))
-            geofile.write(onelab_r0 % (i+1, Helix.r[0], i+1))
-            geofile.write(onelab_r1 % (i+1, Helix.r[1], i+1))
-            geofile.write(onelab_z0 % (i+1, Helix.z[0], i+1))
-            geofile.write(onelab_z1 % (i+1, Helix.z[1], i+1))
-            geofile.write(onelab_lc % (i+1, (Helix.r[1]-Helix.r[0])/5., i+1))
+            Helix = repository.load(name)
+            yield "// H%d : %s\n" % (i+1, Helix.name)
+            yield onelab_r0 % (i+1, Helix.r[0], i+1)
+            yield onelab_r1 % (i+1, Helix.r[1], i+1)
+            yield onelab_z0 % (i+1, Helix.z[0], i+1)
+            yield onelab_z1 % (i+1, Helix.z[1], i+1)
+            yield onelab_lc % (i+1, (Helix.r[1]-Helix.r[0])/5., i+1)
 
             axi = Helix.axi # h, turns, pitch
 
-            geofile.write(onelab_pointx % (point, "r0_H%d"%(i+1), "z0_H%d"%(i+1), i+1))
-            geofile.write(onelab_pointx % (point+1, "r1_H%d"%(i+1), "z0_H%d"%(i+1), i+1))
-            geofile.write(onelab_point % (point+2, "r1_H%d"%(i+1), -axi.h, i+1))
-            geofile.write(onelab_point % (point+3, "r0_H%d"%(i+1), -axi.h, i+1))
+            yield onelab_pointx % (point, "r0_H%d"%(i+1), "z0_H%d"%(i+1), i+1)
+            yield onelab_pointx % (point+1, "r1_H%d"%(i+1), "z0_H%d"%(i+1), i+1)
+            yield onelab_point % (point+2, "r1_H%d"%(i+1), -axi.h, i+1)
+            yield onelab_point % (point+3, "r0_H%d"%(i+1), -axi.h, i+1)
 
-            geofile.write(onelab_line % (line, point, point+1))
-            geofile.write(onelab_line % (line+1, point+1, point+2))
-            geofile.write(onelab_line % (line+2, point+2, point+3))
-            geofile.write(onelab_line % (line+3, point+3, point))
+            yield onelab_line % (line, point, point+1)
+            yield onelab_line % (line+1, point+1, point+2)
+            yield onelab_line % (line+2, point+2, point+3)
+            yield onelab_line % (line+3, point+3, point)
             BP_ids.append(line)
             Rint.append(line+3)
             Rext.append(line+1)
             dH.append([line+3, line, line+1])
 
-            geofile.write(onelab_lineloop % (lineloop, line, line+1, line+2, line+3))
-            geofile.write(onelab_planesurf % (planesurf, lineloop))
-            geofile.write(onelab_phys_surf % (planesurf, planesurf))
+            yield onelab_lineloop % (lineloop, line, line+1, line+2, line+3)
+            yield onelab_planesurf % (planesurf, lineloop)
+            yield onelab_phys_surf % (planesurf, planesurf)
             H.append(planesurf)
             dH.append(lineloop)
 
@@ -396,48 +458,50 @@ class Insert(yaml.YAMLObject):
             lineloop += 1
             planesurf += 1
 
-            z = Helix.z[0]
-            dz = 2* axi.h / float(len(axi.pitch))
-            z = -axi.h
-            for n, p in enumerate(axi.pitch):
-                geofile.write(onelab_point % (point, "r0_H%d"%(i+1), z, i+1))
-                geofile.write(onelab_point % (point+1, "r1_H%d"%(i+1), z, i+1))
-                geofile.write(onelab_point % (point+2, "r1_H%d"%(i+1), z+dz, i+1))
-                geofile.write(onelab_point % (point+3, "r0_H%d"%(i+1), z+dz, i+1))
-
-                geofile.write(onelab_line % (line, point, point+1))
-                geofile.write(onelab_line % (line+1, point+1, point+2))
-                geofile.write(onelab_line % (line+2, point+2, point+3))
-                geofile.write(onelab_line % (line+3, point+3, point))
-                Rint.append(line+3)
-                Rext.append(line+1)
-
-                geofile.write(onelab_lineloop % (lineloop, line, line+1, line+2, line+3))
-                geofile.write(onelab_planesurf % (planesurf, lineloop))
-                geofile.write(onelab_phys_surf % (planesurf, planesurf))
-                H.append(planesurf)
-                dH.append(lineloop)
-
-                point += 4
-                line += 4
-                lineloop += 1
-                planesurf += 1
-
-                z += dz
-
-            geofile.write(onelab_point % (point, "r0_H%d"%(i+1), axi.h, i+1))
-            geofile.write(onelab_point % (point+1, "r1_H%d"%(i+1), axi.h, i+1))
-            geofile.write(onelab_pointx % (point+2, "r1_H%d"%(i+1), "z1_H%d"%(i+1), i+1))
-            geofile.write(onelab_pointx % (point+3, "r0_H%d"%(i+1), "z1_H%d"%(i+1), i+1))
-
-            geofile.write(onelab_line % (line, point, point+1))
-            geofile.write(onelab_line % (line+1, point+1, point+2))
-            geofile.write(onelab_line % (line+2, point+2, point+3))
-            geofile.write(onelab_line % (line+3, point+3, point))
-
-            geofile.write(onelab_lineloop % (lineloop, line, line+1, line+2, line+3))
-            geofile.write(onelab_planesurf % (planesurf, lineloop))
-            geofile.write(onelab_phys_surf % (planesurf, planesurf))
+            # sections: a single fragment filled from the section table
+            sections = axi.get_sections()
+            n = len(sections.dz)
+            onelab_point_H = "Point(%%d)= {%s,%%g, 0.0, lc_H%d};\n"
+            onelab_section = onelab_point_H % ("r0_H%d"%(i+1), i+1) \
+                           + onelab_point_H % ("r1_H%d"%(i+1), i+1) \
+                           + onelab_point_H % ("r1_H%d"%(i+1), i+1) \
+                           + onelab_point_H % ("r0_H%d"%(i+1), i+1) \
+                           + onelab_line * 4 + onelab_lineloop + onelab_planesurf + onelab_phys_surf
+
+            p = point + 4 * np.arange(n)
+            l = line + 4 * np.arange(n)
+            ll = lineloop + np.arange(n)
+            ps = planesurf + np.arange(n)
+            z0 = sections.z[:-1]
+            z1 = z0 + sections.dz
+            table = np.column_stack((p, z0, p+1, z0, p+2, z1, p+3, z1,
+                                     l, p, p+1, l+1, p+1, p+2, l+2, p+2, p+3, l+3, p+3, p,
+                                     ll, l, l+1, l+2, l+3, ps, ll, ps, ps))
+            yield (onelab_section * n) % tuple(table.ravel().tolist())
+
+            Rint += (l+3).tolist()
+            Rext += (l+1).tolist()
+            H += ps.tolist()
+            dH += ll.tolist()
+
+            point += 4 * n
+            line += 4 * n
+            lineloop += n
+            planesurf += n
+
+            yield onelab_point % (point, "r0_H%d"%(i+1), axi.h, i+1)
+            yield onelab_point % (point+1, "r1_H%d"%(i+1), axi.h, i+1)
+            yield onelab_pointx % (point+2, "r1_H%d"%(i+1), "z1_H%d"%(i+1), i+1)
+            yield onelab_pointx % (point+3, "r0_H%d"%(i+1), "z1_H%d"%(i+1), i+1)
+
+            yield onelab_line % (line, point, point+1)
+            yield onelab_line % (line+1, point+1, point+2)
+            yield onelab_line % (line+2, point+2, point+3)
+            yield onelab_line % (line+3, point+3, point)
+
+            yield onelab_lineloop % (lineloop, line, line+1, line+2, line+3)
+            yield onelab_planesurf % (planesurf, lineloop)
+            yield onelab_phys_surf % (planesurf, planesurf)
             H.append(planesurf)
             Rint.append(line+3)
             Rext.append(line+1)
@@ -454,7 +518,7 @@ class Insert(yaml.YAMLObject):
             Rext_ids.append(Rext)
 
             dH_ids.append(dH) #### append(reduce(operator.add, dH)) #other way to flatten dH : list(itertools.chain(*dH))
-            geofile.write("\n")
+            yield "\n"
 
             point += 4
             line += 4
@@ -476,51 +540,49 @@ class Insert(yaml.YAMLObject):
             BP = []
             HP = []
 
-            Ring = None
-            with open(name+".yaml", 'r') as f:
-                Ring = yaml.load(f)
-            geofile.write("// R%d [%d, H%d] : %s\n"%(i+1, H0+1, H1+1, Ring.name))
-            geofile.write(onelab_z_R%(i+1, (Ring.z[1]-Ring.z[0]), i+1))
-            geofile.write(onelab_lc_R%(i+1, (Ring.r[3]-Ring.r[0])/5., i+1))
+            Ring = repository.load(name)
+            yield "// R%d [%d, H%d] : %s\n"%(i+1, H0+1, H1+1, Ring.name)
+            yield onelab_z_R%(i+1, (Ring.z[1]-Ring.z[0]), i+1)
+            yield onelab_lc_R%(i+1, (Ring.r[3]-Ring.r[0])/5., i+1)
 
             if Ring.BPside:
-                geofile.write(onelab_pointx % (point, "r0_H%d"%(H0+1), "z1_H%d"%(H0+1), i+1))
-                geofile.write(onelab_pointx % (point+1, "r1_H%d"%(H0+1), "z1_H%d"%(H0+1), i+1))
-                geofile.write(onelab_pointx % (point+2, "r0_H%d"%(H1+1), "z1_H%d"%(H1+1), i+1))
-                geofile.write(onelab_pointx % (point+3, "r1_H%d"%(H1+1), "z1_H%d"%(H1+1), i+1))
-
-                geofile.write(onelab_pointx % (point+4, "r1_H%d"%(H1+1), "z1_H%d+dz_R%d"%(H1+1, i+1), i+1))
-                geofile.write(onelab_pointx % (point+5, "r0_H%d"%(H1+1), "z1_H%d+dz_R%d"%(H1+1, i+1), i+1))
-                geofile.write(onelab_pointx % (point+6, "r1_H%d"%(H0+1), "z1_H%d+dz_R%d"%(H0+1, i+1), i+1))
-                geofile.write(onelab_pointx % (point+7, "r0_H%d"%(H0+1), "z1_H%d+dz_R%d"%(H0+1, i+1), i+1))
+                yield onelab_pointx % (point, "r0_H%d"%(H0+1), "z1_H%d"%(H0+1), i+1)
+                yield onelab_pointx % (point+1, "r1_H%d"%(H0+1), "z1_H%d"%(H0+1), i+1)
+                yield onelab_pointx % (point+2, "r0_H%d"%(H1+1), "z1_H%d"%(H1+1), i+1)
+                yield onelab_pointx % (point+3, "r1_H%d"%(H1+1), "z1_H%d"%(H1+1), i+1)
+
+                yield onelab_pointx % (point+4, "r1_H%d"%(H1+1), "z1_H%d+dz_R%d"%(H1+1, i+1), i+1)
+                yield onelab_pointx % (point+5, "r0_H%d"%(H1+1), "z1_H%d+dz_R%d"%(H1+1, i+1), i+1)
+                yield onelab_pointx % (point+6, "r1_H%d"%(H0+1), "z1_H%d+dz_R%d"%(H0+1, i+1), i+1)
+                yield onelab_pointx % (point+7, "r0_H%d"%(H0+1), "z1_H%d+dz_R%d"%(H0+1, i+1), i+1)
             else:
-                geofile.write(onelab_pointx % (point, "r0_H%d"%(H0+1), "z0_H%d-dz_R%d"%(H0+1, i+1), i+1))
-                geofile.write(onelab_pointx % (point+1, "r1_H%d"%(H0+1), "z0_H%d-dz_R%d"%(H0+1, i+1), i+1))
-                geofile.write(onelab_pointx % (point+2, "r0_H%d"%(H1+1), "z0_H%d-dz_R%d"%(H1+1, i+1), i+1))
-                geofile.write(onelab_pointx % (point+3, "r1_H%d"%(H1+1), "z0_H%d-dz_R%d"%(H1+1, i+1), i+1))
-
-                geofile.write(onelab_pointx % (point+4, "r1_H%d"%(H1+1), "z0_H%d"%(H1+1), i+1))
-                geofile.write(onelab_pointx % (point+5, "r0_H%d"%(H1+1), "z0_H%d"%(H1+1), i+1))
-                geofile.write(onelab_pointx % (point+6, "r1_H%d"%(H0+1), "z0_H%d"%(H0+1), i+1))
-                geofile.write(onelab_pointx % (point+7, "r0_H%d"%(H0+1), "z0_H%d"%(H0+1), i+1))
-
-            geofile.write(onelab_line % (line, point, point+1))
-            geofile.write(onelab_line % (line+1, point+1, point+2))
-            geofile.write(onelab_line % (line+2, point+2, point+3))
-            geofile.write(onelab_line % (line+3, point+3, point+4))
-            geofile.write(onelab_line % (line+4, point+4, point+5))
-            geofile.write(onelab_line % (line+5, point+5, point+6))
-            geofile.write(onelab_line % (line+6, point+6, point+7))
-            geofile.write(onelab_line % (line+7, point+7, point))
+                yield onelab_pointx % (point, "r0_H%d"%(H0+1), "z0_H%d-dz_R%d"%(H0+1, i+1), i+1)
+                yield onelab_pointx % (point+1, "r1_H%d"%(H0+1), "z0_H%d-dz_R%d"%(H0+1, i+1), i+1)
+                yield onelab_pointx % (point+2, "r0_H%d"%(H1+1), "z0_H%d-dz_R%d"%(H1+1, i+1), i+1)
+                yield onelab_pointx % (point+3, "r1_H%d"%(H1+1), "z0_H%d-dz_R%d"%(H1+1, i+1), i+1)
+
+                yield onelab_pointx % (point+4, "r1_H%d"%(H1+1), "z0_H%d"%(H1+1), i+1)
+                yield onelab_pointx % (point+5, "r0_H%d"%(H1+1), "z0_H%d"%(H1+1), i+1)
+                yield onelab_pointx % (point+6, "r1_H%d"%(H0+1), "z0_H%d"%(H0+1), i+1)
+                yield onelab_pointx % (point+7, "r0_H%d"%(H0+1), "z0_H%d"%(H0+1), i+1)
+
+            yield onelab_line % (line, point, point+1)
+            yield onelab_line % (line+1, point+1, point+2)
+            yield onelab_line % (line+2, point+2, point+3)
+            yield onelab_line % (line+3, point+3, point+4)
+            yield onelab_line % (line+4, point+4, point+5)
+            yield onelab_line % (line+5, point+5, point+6)
+            yield onelab_line % (line+6, point+6, point+7)
+            yield onelab_line % (line+7, point+7, point)
 
             if Ring.BPside:
                 HP_Ring_ids.append([line+4, line+5, line+6])
             else:
                 BP_Ring_ids.append([line+4, line+5, line+6])
 
-            geofile.write(onelab_lineloop_R % (lineloop, line, line+1, line+2, line+3, line+4, line+5, line+6, line+7))
-            geofile.write(onelab_planesurf % (planesurf, lineloop))
-            geofile.write(onelab_phys_surf % (planesurf, planesurf))
+            yield onelab_lineloop_R % (lineloop, line, line+1, line+2, line+3, line+4, line+5, line+6, line+7)
+            yield onelab_planesurf % (planesurf, lineloop)
+            yield onelab_phys_surf % (planesurf, planesurf)
             Ring_ids.append(planesurf)
 
             Rint_ids[H0].append(line+7)
@@ -537,46 +599,26 @@ class Insert(yaml.YAMLObject):
 
         # create physical lines
         for i, r_ids in enumerate(Rint_ids):
-            geofile.write("Physical Line(\"H%dChannel0\") = {" % (i+1))
-            for id in r_ids:
-                geofile.write("%d"%id)
-                if id != r_ids[-1]:
-                    geofile.write(",")
-            geofile.write("};\n")
+            yield "Physical Line(\"H%dChannel0\") = {%s};\n" % (i+1, ",".join(map(str, r_ids)))
 
         for i, r_ids in enumerate(Rext_ids):
-            geofile.write("Physical Line(\"H%dChannel1\") = {" % (i+1))
-            for id in r_ids:
-                geofile.write("%d"%id)
-                if id != r_ids[-1]:
-                    geofile.write(",")
-            geofile.write("};\n")
+            yield "Physical Line(\"H%dChannel1\") = {%s};\n" % (i+1, ",".join(map(str, r_ids)))
 
-        geofile.write("Physical Line(\"HP_H%d\") = " % (0))
-        geofile.write("{%d};\n"%HP_ids[0])
+        yield "Physical Line(\"HP_H%d\") = " % (0)
+        yield "{%d};\n"%HP_ids[0]
 
         if len(self.Helices)%2 == 0:
-            geofile.write("Physical Line(\"HP_H%d\") = " % (len(self.Helices)))
-            geofile.write("{%d};\n" % HP_ids[-1])
+            yield "Physical Line(\"HP_H%d\") = " % (len(self.Helices))
+            yield "{%d};\n" % HP_ids[-1]
         else:
-            geofile.write("Physical Line(\"BP_H%d\") = " % (len(self.Helices)))
-            geofile.write("{%d};\n" % BP_ids[-1])
+            yield "Physical Line(\"BP_H%d\") = " % (len(self.Helices))
+            yield "{%d};\n" % BP_ids[-1]
 
         for i, _ids in enumerate(HP_Ring_ids):
-            geofile.write("Physical Line(\"HP_R%d\") =  {" % (i+1))
-            for id in _ids:
-                geofile.write("%d" % id)
-                if id != _ids[-1]:
-                    geofile.write(",")
-            geofile.write("};\n")
+            yield "Physical Line(\"HP_R%d\") =  {%s};\n" % (i+1, ",".join(map(str, _ids)))
 
         for i, _ids in enumerate(BP_Ring_ids):
-            geofile.write("Physical Line(\"BP_R%d\") =  {" % (i+1))
-            for id in _ids:
-                geofile.write("%d" % id)
-                if id != _ids[-1]:
-                    geofile.write(",")
-            geofile.write("};\n")
+            yield "Physical Line(\"BP_R%d\") =  {%s};\n" % (i+1, ",".join(map(str, _ids)))
 
         # BC_ids should contains "H%dChannel%d", "HP_R%d" and "BP_R%d"
         BC_ids = []
@@ -588,42 +630,37 @@ class Insert(yaml.YAMLObject):
             Axis_ids = []
             Infty_ids = []
 
-            geofile.write("// Define Air\n")
+            yield "// Define Air\n"
             onelab_r_air = "DefineConstant[ r_Air = {%g, Name \"Geom/Air/factor_R\"} ];\n"
             onelab_z_air = "DefineConstant[ z_Air = {%g, Name \"Geom/Air/factor_Z\"} ];\n" #  should add a min and a max
             onelab_lc_air = "DefineConstant[ lc_Air = {%g, Name \"Geom/Air/lc\"} ];\n"
-            geofile.write(onelab_r_air % (1.2))
-            geofile.write(onelab_z_air % (1.2))
-            geofile.write(onelab_lc_air % (2))
+            yield onelab_r_air % (1.2)
+            yield onelab_z_air % (1.2)
+            yield onelab_lc_air % (2)
 
             H0 = 0
             Hn = len(self.Helices)-1
 
-            geofile.write(onelab_pointx % (point, "0", "z_Air * z0_H%d"%(H0+1), i+1))
-            geofile.write(onelab_pointx % (point+1, "r_Air * r1_H%d"%(Hn+1), "z_Air * z0_H%d"%(H0+1), i+1))
-            geofile.write(onelab_pointx % (point+2, "r_Air * r1_H%d"%(Hn+1), "z_Air * z1_H%d"%(Hn+1), i+1))
-            geofile.write(onelab_pointx % (point+3, "0", "z_Air * z1_H%d"%(Hn+1), i+1))
+            yield onelab_pointx % (point, "0", "z_Air * z0_H%d"%(H0+1), i+1)
+            yield onelab_pointx % (point+1, "r_Air * r1_H%d"%(Hn+1), "z_Air * z0_H%d"%(H0+1), i+1)
+            yield onelab_pointx % (point+2, "r_Air * r1_H%d"%(Hn+1), "z_Air * z1_H%d"%(Hn+1), i+1)
+            yield onelab_pointx % (point+3, "0", "z_Air * z1_H%d"%(Hn+1), i+1)
 
-            geofile.write(onelab_line % (line, point, point+1))
-            geofile.write(onelab_line % (line+1, point+1, point+2))
-            geofile.write(onelab_line % (line+2, point+2, point+3))
-            geofile.write(onelab_line % (line+3, point+3, point))
+            yield onelab_line % (line, point, point+1)
+            yield onelab_line % (line+1, point+1, point+2)
+            yield onelab_line % (line+2, point+2, point+3)
+            yield onelab_line % (line+3, point+3, point)
             Axis_ids.append(line+3)
 
-            geofile.write(onelab_lineloop % (lineloop, line, line+1, line+2, line+3))
-            geofile.write("Plane Surface(%d)= {%d, " % (planesurf, lineloop))
-            for _ids in H_ids:
-                for _id in _ids:
-                    geofile.write("%d," % (-_id))
-            for _id in dR_ids:
-                geofile.write("%d" % (-_id))
-                if _id != dR_ids[-1]:
-                    geofile.write(",")
+            yield onelab_lineloop % (lineloop, line, line+1, line+2, line+3)
+            yield "Plane Surface(%d)= {%d, " % (planesurf, lineloop)
+            yield "".join("%d," % (-_id) for _ids in H_ids for _id in _ids)
+            yield ",".join("%d" % (-_id) for _id in dR_ids)
             Air_ids.append(planesurf)
 
-            geofile.write("};\n")
-            #geofile.write(onelab_planesurf%(planesurf, lineloop))
-            geofile.write(onelab_phys_surf % (planesurf, planesurf))
+            yield "};\n"
+            #yield (onelab_planesurf%(planesurf, lineloop))
+            yield onelab_phys_surf % (planesurf, planesurf)
 
             dAir = lineloop
             axis_HP = point
@@ -636,43 +673,43 @@ class Insert(yaml.YAMLObject):
             planesurf += 1
 
             # Define Infty
-            geofile.write("// Define Infty\n")
+            yield "// Define Infty\n"
             onelab_rint_infty = "DefineConstant[ Val_Rint = {%g, Name \"Geom/Infty/Val_Rint\"} ];\n"
             onelab_rext_infty = "DefineConstant[ Val_Rext = {%g, Name \"Geom/Infty/Val_Rext\"} ];\n"
             onelab_lc_infty = "DefineConstant[ lc_infty = {%g, Name \"Geom/Infty/lc_inft\"} ];\n"
             onelab_point_infty = "Point(%d)= {%s,%s, 0.0, %s};\n"
-            geofile.write(onelab_rint_infty % (4))
-            geofile.write(onelab_rext_infty % (5))
-            geofile.write(onelab_lc_infty % (100))
+            yield onelab_rint_infty % (4)
+            yield onelab_rext_infty % (5)
+            yield onelab_lc_infty % (100)
 
             center = point
-            geofile.write(onelab_point_gen % (center, "0", "0", "lc_Air"))
+            yield onelab_point_gen % (center, "0", "0", "lc_Air")
             point += 1
 
             Hn = len(self.Helices)
 
-            geofile.write(onelab_point_gen % (point, "0", "-Val_Rint * r1_H%d" % Hn, "lc_infty"))
-            geofile.write(onelab_point_gen % (point+1, "Val_Rint * r1_H%d" % Hn, "0", "lc_infty"))
-            geofile.write(onelab_point_gen % (point+2, "0", "Val_Rint * r1_H%d" % Hn, "lc_infty"))
+            yield onelab_point_gen % (point, "0", "-Val_Rint * r1_H%d" % Hn, "lc_infty")
+            yield onelab_point_gen % (point+1, "Val_Rint * r1_H%d" % Hn, "0", "lc_infty")
+            yield onelab_point_gen % (point+2, "0", "Val_Rint * r1_H%d" % Hn, "lc_infty")
 
-            geofile.write(onelab_circle % (line, point, center, point+1))
-            geofile.write(onelab_circle % (line+1, point+1, center, point+2))
-            geofile.write(onelab_line % (line+2, point+2, axis_BP))
-            geofile.write(onelab_line % (line+3, axis_HP, point))
+            yield onelab_circle % (line, point, center, point+1)
+            yield onelab_circle % (line+1, point+1, center, point+2)
+            yield onelab_line % (line+2, point+2, axis_BP)
+            yield onelab_line % (line+3, axis_HP, point)
             Axis_ids.append(line+2)
             Axis_ids.append(line+3)
 
-            geofile.write("Line Loop(%d) = {" % lineloop)
-            geofile.write("%d, " % line)
-            geofile.write("%d, " % (line+1))
-            geofile.write("%d, " % (line+2))
-            geofile.write("%d, " % (-(Air_line+2)))
-            geofile.write("%d, " % (-(Air_line+1)))
-            geofile.write("%d, " % (-(Air_line)))
-            geofile.write("%d};\n " % (line+3))
-
-            geofile.write(onelab_planesurf % (planesurf, lineloop))
-            geofile.write(onelab_phys_surf % (planesurf, planesurf))
+            yield "Line Loop(%d) = {" % lineloop
+            yield "%d, " % line
+            yield "%d, " % (line+1)
+            yield "%d, " % (line+2)
+            yield "%d, " % (-(Air_line+2))
+            yield "%d, " % (-(Air_line+1))
+            yield "%d, " % (-(Air_line))
+            yield "%d};\n " % (line+3)
+
+            yield onelab_planesurf % (planesurf, lineloop)
+            yield onelab_phys_surf % (planesurf, planesurf)
             Air_ids.append(planesurf)
 
             axis_HP = point
@@ -684,55 +721,44 @@ class Insert(yaml.YAMLObject):
             lineloop += 1
             planesurf += 1
 
-            geofile.write(onelab_point_gen % (point, "0", "-Val_Rext * r1_H%d" % Hn, "lc_infty"))
-            geofile.write(onelab_point_gen % (point+1, "Val_Rext * r1_H%d" % Hn, "0", "lc_infty"))
-            geofile.write(onelab_point_gen % (point+2, "0", "Val_Rext * r1_H%d" % Hn, "lc_infty"))
+            yield onelab_point_gen % (point, "0", "-Val_Rext * r1_H%d" % Hn, "lc_infty")
+            yield onelab_point_gen % (point+1, "Val_Rext * r1_H%d" % Hn, "0", "lc_infty")
+            yield onelab_point_gen % (point+2, "0", "Val_Rext * r1_H%d" % Hn, "lc_infty")
 
-            geofile.write(onelab_circle % (line, point, center, point+1))
-            geofile.write(onelab_circle % (line+1, point+1, center, point+2))
-            geofile.write(onelab_line % (line+2, point+2, axis_BP))
-            geofile.write(onelab_line%(line+3, axis_HP, point))
+            yield onelab_circle % (line, point, center, point+1)
+            yield onelab_circle % (line+1, point+1, center, point+2)
+            yield onelab_line % (line+2, point+2, axis_BP)
+            yield onelab_line%(line+3, axis_HP, point)
             Axis_ids.append(line+2)
             Axis_ids.append(line+3)
             Infty_ids.append(line)
             Infty_ids.append(line+1)
 
-            geofile.write("Line Loop(%d) = {" % lineloop)
-            geofile.write("%d, " % line)
-            geofile.write("%d, " % (line+1))
-            geofile.write("%d, " % (line+2))
-            geofile.write("%d, " % (-(Air_line+1)))
-            geofile.write("%d, " % (-(Air_line)))
-            geofile.write("%d};\n " % (line+3))
-            geofile.write(onelab_planesurf % (planesurf, lineloop))
-            geofile.write(onelab_phys_surf % (planesurf, planesurf))
+            yield "Line Loop(%d) = {" % lineloop
+            yield "%d, " % line
+            yield "%d, " % (line+1)
+            yield "%d, " % (line+2)
+            yield "%d, " % (-(Air_line+1))
+            yield "%d, " % (-(Air_line))
+            yield "%d};\n " % (line+3)
+            yield onelab_planesurf % (planesurf, lineloop)
+            yield onelab_phys_surf % (planesurf, planesurf)
             Air_ids.append(planesurf)
 
             # Add Physical Lines
-            geofile.write("Physical Line(\"Axis\") =  {")
-            for id in Axis_ids:
-                geofile.write("%d" % id)
-                if id != Axis_ids[-1]:
-                    geofile.write(",")
-            geofile.write("};\n")
-
-            geofile.write("Physical Line(\"Infty\") =  {")
-            for id in Infty_ids:
-                geofile.write("%d" % id)
-                if id != Infty_ids[-1]:
-                    geofile.write(",")
-            geofile.write("};\n")
+            yield "Physical Line(\"Axis\") =  {%s};\n" % ",".join(map(str, Axis_ids))
+            yield "Physical Line(\"Infty\") =  {%s};\n" % ",".join(map(str, Infty_ids))
 
             # BC_Airs_ids should contains "Axis" and "Infty"
 
         # coherence
-        geofile.write("\nCoherence;\n")
-        geofile.close()
+        yield "\nCoherence;\n"
 
-        return (H_ids, Ring_ids, BC_ids, Air_ids, BC_Air_ids)
+        if ids is not None:
+            ids += [H_ids, Ring_ids, BC_ids, Air_ids, BC_Air_ids]
 
 def Insert_constructor(loader, node):
-    print ("Insert_constructor")
+    logger.debug("Insert_constructor")
     values = loader.construct_mapping(node)
     name = values["name"]
     Helices = values["Helices"]
@@ -745,4 +771,5 @@ def Insert_constructor(loader, node):
     return Insert(name, Helices, Rings, CurrentLeads, HAngles, RAngles, innerbore, outerbore)
 
 yaml.add_constructor(u'!Insert', Insert_constructor)
+loader.register(Insert, Insert_constructor)
 
@@ -6,12 +6,19 @@ Provides definition for Site:
 
 """
 
+import logging
 import os
 import sys
 
-import json
 import yaml
 from . import deserialize
+from . import loader
+from . import repository
+from . import profiling
+from . import bcindex
+from . import brepcache
+
+logger = logging.getLogger(__name__)
 
 class MSite(yaml.YAMLObject):
     """
@@ -41,8 +48,8 @@ class MSite(yaml.YAMLObject):
         dump object to file
         """
         try:
-            ostream = open(self.name + '.yaml', 'w')
-            yaml.dump(self, stream=ostream)
+            ostream = open(repository.output(self.name + '.yaml'), 'w')
+            loader.dump(self, stream=ostream)
         except:
             raise Exception("Failed to dump MSite data")
 
@@ -52,8 +59,8 @@ class MSite(yaml.YAMLObject):
         """
         data = None
         try:
-            istream = open(self.name + '.yaml', 'r')
-            data = yaml.load(stream=istream)
+            istream = open(repository.resolve(self.name + '.yaml'), 'r')
+            data = loader.load(istream)
             istream.close()
         except:
             raise Exception("Failed to load MSite data %s.yaml"%self.name)
@@ -61,24 +68,23 @@ class MSite(yaml.YAMLObject):
         self.name = data.name
         self.magnets = data.magnets
 
-    def to_json(self):
+    def to_json(self, compact: bool = False):
         """
         convert from yaml to json
         """
-        return json.dumps(self, default=deserialize.serialize_instance, \
-            sort_keys=True, indent=4)
+        return deserialize.dumps(self, compact)
 
     def from_json(self, string):
         """
         convert from json to yaml
         """
-        return json.loads(string, object_hook=deserialize.unserialize_object)
+        return deserialize.loads(string)
 
     def write_to_json(self):
         """
         write from json file
         """
-        ostream = open(self.name + '.json', 'w')
+        ostream = open(repository.output(self.name + '.json'), 'w')
         jsondata = self.to_json()
         ostream.write(str(jsondata))
         ostream.close()
@@ -87,52 +93,54 @@ class MSite(yaml.YAMLObject):
         """
         read from json file
         """
-        istream = open(self.name + '.json', 'r')
+        istream = open(repository.resolve(self.name + '.json'), 'r')
         jsondata = self.from_json(istream.read())
-        print (type(jsondata))
+        logger.debug("%s", type(jsondata))
         istream.close()
 
-    def gmsh(self, Air: bool =False, debug: bool =False):
+    def get_magnets(self) -> list:
         """
-        create gmsh geometry
+        returns the names of the magnets (in gmsh ids order)
         """
-        import gmsh
-
-        isAir = False
-        gmsh_ids = []
-
         if isinstance(self.magnets, str):
-            print("msite/gmsh/%s (str)" % self.magnets)
-            with open(self.magnets + '.yaml', 'r') as f:
-                Magnet = yaml.load(f, Loader = yaml.FullLoader)
-            gmsh_ids.append( Magnet.gmsh(isAir, debug) )
-
+            return [self.magnets]
         elif isinstance(self.magnets, list):
-            for mname in self.magnets:
-                print("msite/gmsh/%s (list)" % mname)
-                with open(mname + '.yaml', 'r') as f:
-                    Magnet = yaml.load(f, Loader = yaml.FullLoader)
-                gmsh_ids.append( Magnet.gmsh(isAir, debug) )
-
+            return list(self.magnets)
         elif isinstance(self.magnets, dict):
+            names = []
             for key in self.magnets:
-                print("msite/gmsh/%s (dict)" % key)
+                logger.debug("msite/magnets/%s (dict)", key)
                 if isinstance(self.magnets[key], str):
-                    print("msite/gmsh/%s (dict/str)" % self.magnets[key])
-                    with open(self.magnets[key] + '.yaml', 'r') as f:
-                        Magnet = yaml.load(f, Loader = yaml.FullLoader)
-                    gmsh_ids.append( Magnet.gmsh(isAir, debug) )
-
+                    names.append(self.magnets[key])
                 if isinstance(self.magnets[key], list):
-                    for mname in self.magnets[key]:
-                        print("msite/gmsh/%s (dict/list)" % mname)
-                        with open(mname + '.yaml', 'r') as f:
-                            Magnet = yaml.load(f, Loader = yaml.FullLoader)
-                        gmsh_ids.append( Magnet.gmsh(isAir, debug) )
+                    names += self.magnets[key]
+            return names
+
+        logger.warning("magnets: unsupported type (%s", type(self.magnets))
+        sys.exit(1)
+
+    @profiling.timed()
+    @brepcache.cached(exclude=('debug', 'processes'))
+    def gmsh(self, Air: bool =False, debug: bool =False, processes: int = None):
+        """
+        create gmsh geometry
+
+        processes: when set, magnets are built in a pool of processes
+        (each one in its own gmsh model saved as BREP) and imported in
+        the current model (0 for one process per core)
+        """
+        import gmsh
 
+        isAir = False
+        names = self.get_magnets()
+        if processes is not None and len(names) > 1:
+            gmsh_ids = self._gmsh_parallel(names, processes, debug)
         else:
-            print("magnets: unsupported type (%s" % type(self.magnets) )
-            sys.exit(1)
+            gmsh_ids = []
+            for mname in names:
+                logger.debug("msite/gmsh/%s", mname)
+                Magnet = repository.load(mname)
+                gmsh_ids.append( Magnet.gmsh(isAir, debug) )
         
         # Now create air
         if Air:
@@ -143,99 +151,140 @@ class MSite(yaml.YAMLObject):
             A_id = gmsh.model.occ.addRectangle(r0_air, z0_air, 0, dr_air, dz_air)
         
             flat_list = []
-            print("flat_list:", len(gmsh_ids))
+            logger.debug("flat_list: %s", len(gmsh_ids))
             for sublist in gmsh_ids:
                 if not isinstance(sublist, tuple):
-                    print("flat_list: expect a tuple got a %s" % type(sublist))
+                    logger.warning("flat_list: expect a tuple got a %s", type(sublist))
                     sys.exit(1)
                 for elem in sublist:
-                    print("elem:", elem, type(elem))
+                    logger.debug("elem: %s %s", elem, type(elem))
                     if isinstance(elem, list):
                         for item in elem:
-                            print("item:", elem, type(item))
+                            logger.debug("item: %s %s", elem, type(item))
                             if isinstance(item, list):
                                 flat_list += item
                             elif isinstance(item, int):
                                 flat_list.append(item)
 
-            print("flat_list:", flat_list)
+            logger.debug("flat_list: %s", flat_list)
             ov, ovv = gmsh.model.occ.fragment([(2, A_id)], [(2, i) for i in flat_list] )
             return (gmsh_ids, (A_id, dr_air, z0_air, dz_air))
 
         return (gmsh_ids, None)
 
+    @profiling.timed()
+    def _gmsh_parallel(self, names: list, processes: int, debug: bool = False) -> list:
+        """
+        build magnets in a pool of processes and import them
+
+        returns the gmsh ids of the magnets remapped to the imported surfaces
+        """
+        import multiprocessing
+        import tempfile
+
+        if not processes:
+            processes = os.cpu_count()
+        processes = min(processes, len(names))
+
+        gmsh_ids = []
+        with tempfile.TemporaryDirectory(prefix="magnetgeo-") as tmpdir:
+            # workers do not share the roots of this thread: pass them the directories to search
+            dirs = [os.path.abspath(d) for d in repository.get_repository().searchdirs()]
+            jobs = [(name, os.path.join(tmpdir, "%d.brep" % i), dirs, brepcache.enabled(), debug) for i, name in enumerate(names)]
+            # spawn: workers shall not inherit the gmsh state of this process
+            with multiprocessing.get_context("spawn").Pool(processes) as pool:
+                data = pool.map(_gmsh_magnet, jobs)
+            logger.debug("msite/gmsh: %d magnets built by %d processes", len(jobs), processes)
+
+            for (name, filename, _dirs, _cache, _debug), (ids, surfaces, boxes) in zip(jobs, data):
+                gmsh_ids.append(brepcache.import_shapes(filename, ids, surfaces, boxes, name))
+        return gmsh_ids
+
+    @profiling.timed()
+    @bcindex.indexed()
     def gmsh_bcs(self, ids: tuple, debug: bool =False):
         """
         retreive ids for bcs in gmsh geometry
         """
         import gmsh
-        print("MSite/gmsh_bcs:", type(ids))
+        logger.debug("MSite/gmsh_bcs: %s", type(ids))
         (gmsh_ids, Air_data) = ids
 
         if isinstance(self.magnets, str):
-            with open(self.magnets + '.yaml', 'r') as f:
-                Magnet = yaml.load(f, Loader = yaml.FullLoader)
+            Magnet = repository.load(self.magnets)
             Magnet.gmsh_bcs(gmsh_ids[0], debug)
 
         elif isinstance(self.magnets, list):
             for i,mname in enumerate(self.magnets):
-                with open(mname + '.yaml', 'r') as f:
-                    Magnet = yaml.load(f, Loader = yaml.FullLoader)
+                Magnet = repository.load(mname)
                 Magnet.gmsh_bcs(gmsh_ids[i], debug)
 
         elif isinstance(self.magnets, dict):
             num = 0
             for i,key in enumerate(self.magnets):
                 if isinstance(self.magnets[key], str):
-                    with open(self.magnets[key] + '.yaml', 'r') as f:
-                        Magnet = yaml.load(f, Loader = yaml.FullLoader)
-                    print("ids:", type(gmsh_ids[num]), type(Magnet))
+                    Magnet = repository.load(self.magnets[key])
+                    logger.debug("ids: %s %s", type(gmsh_ids[num]), type(Magnet))
                     Magnet.gmsh_bcs(gmsh_ids[num], debug)
                     num += 1
 
                 if isinstance(self.magnets[key], list):
                     for mname in self.magnets[key]:
-                        with open(mname + '.yaml', 'r') as f:
-                            Magnet = yaml.load(f, Loader = yaml.FullLoader)
-                        print("ids:", type(gmsh_ids[num]), type(Magnet))
+                        Magnet = repository.load(mname)
+                        logger.debug("ids: %s %s", type(gmsh_ids[num]), type(Magnet))
                         Magnet.gmsh_bcs(gmsh_ids[num], True) #debug)
                         num += 1
 
         else:
-            print("magnets: unsupported type (%s" % type(self.magnets) )
+            logger.warning("magnets: unsupported type (%s", type(self.magnets))
             sys.exit(1)
         
         # TODO: Air
         if Air_data:
             (Air_id, dr_air, z0_air, dz_air) = Air_data
 
-            ps = gmsh.model.addPhysicalGroup(2, [Air_id])
+            ps = bcindex.addPhysicalGroup(2, [Air_id])
             gmsh.model.setPhysicalName(2, ps, "Air")
 
-            # TODO: Axis, Inf
-            gmsh.option.setNumber("Geometry.OCCBoundsUseStl", 1)
-            
-            eps = 1.e-6
-            
-            ov = gmsh.model.getEntitiesInBoundingBox(-eps, z0_air-eps, 0, +eps, z0_air+dz_air+eps, 0, 1)
-            print("ov:", len(ov))
-            ps = gmsh.model.addPhysicalGroup(1, [tag for (dim,tag) in ov])
+            (Axis_ids, Inf_ids) = bcindex.getAirCurves([Air_id])
+            logger.debug("Axis: %s, Inf: %s", len(Axis_ids), len(Inf_ids))
+            ps = bcindex.addPhysicalGroup(1, Axis_ids)
             gmsh.model.setPhysicalName(1, ps, "Axis")
             
-            ov = gmsh.model.getEntitiesInBoundingBox(-eps, z0_air-eps, 0, dr_air+eps, z0_air+eps, 0, 1)
-            print("ov:", len(ov))
-            
-            ov += gmsh.model.getEntitiesInBoundingBox(dr_air-eps, z0_air-eps, 0, dr_air+eps, z0_air+dz_air+eps, 0, 1)
-            print("ov:", len(ov))
-            
-            ov += gmsh.model.getEntitiesInBoundingBox(-eps, z0_air+dz_air-eps, 0, dr_air+eps, z0_air+dz_air+eps, 0, 1)
-            print("ov:", len(ov))
-            
-            ps = gmsh.model.addPhysicalGroup(1, [tag for (dim,tag) in ov])
+            ps = bcindex.addPhysicalGroup(1, Inf_ids)
             gmsh.model.setPhysicalName(1, ps, "Inf")            
         pass
 
 
+def _gmsh_magnet(job: tuple) -> tuple:
+    """
+    build magnet in a new gmsh model and save it to filename
+    (run in a worker process)
+
+    returns the gmsh ids of the magnet, the tags and the bounding boxes of its surfaces
+    """
+    import gmsh
+
+    (name, filename, dirs, cache, debug) = job
+    if cache:
+        # magnets already in the cache are imported by the worker
+        brepcache.enable(cache)
+    gmsh.initialize()
+    gmsh.option.setNumber("General.Terminal", 0)
+    try:
+        gmsh.model.add(name)
+        with repository.roots(*dirs):
+            Magnet = repository.load(name)
+            ids = Magnet.gmsh(False, debug)
+        gmsh.model.occ.synchronize()
+
+        surfaces = [tag for (dim, tag) in gmsh.model.getEntities(2)]
+        boxes = [gmsh.model.occ.getBoundingBox(2, tag) for tag in surfaces]
+        gmsh.write(filename)
+    finally:
+        gmsh.finalize()
+    return (ids, surfaces, boxes)
+
 def MSite_constructor(loader, node):
     """
     build an site object
@@ -246,4 +295,5 @@ def MSite_constructor(loader, node):
     return MSite(name, magnets)
 
 yaml.add_constructor(u'!MSite', MSite_constructor)
+loader.register(MSite, MSite_constructor)
 
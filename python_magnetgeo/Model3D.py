@@ -10,9 +10,9 @@ Provides definiton for Helix:
 * Shape: definition of Shape eventually added to the helical cut
 """
 
-import json
 import yaml
 from . import deserialize
+from . import loader
 
 # from Shape import *
 # from ModelAxi import *
@@ -49,17 +49,17 @@ class Model3D(yaml.YAMLObject):
                 self.with_channels
                )
 
-    def to_json(self):
+    def to_json(self, compact: bool = False):
         """
         convert from yaml to json
         """
-        return json.dumps(self, default=deserialize.serialize_instance, sort_keys=True, indent=4)
+        return deserialize.dumps(self, compact)
 
     def from_json(string):
         """
         convert from json to yaml
         """
-        return json.loads(string, object_hook=deserialize.unserialize_object)
+        return deserialize.loads(string)
 
 
 def Model3D_constructor(loader, node):
@@ -74,3 +74,4 @@ def Model3D_constructor(loader, node):
 
 
 yaml.add_constructor(u'!Model3D', Model3D_constructor)
+loader.register(Model3D, Model3D_constructor)
@@ -10,10 +10,37 @@ Provides definiton for Helix:
 * Shape: definition of Shape eventually added to the helical cut
 """
 
-import json
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
 import yaml
 from . import deserialize
+from . import loader
+
+# Sections of the helical cut:
+# z : section bounds (len(turns)+1 values starting at -h)
+# dz : section heights (turns * pitch)
+# turns : cumulative number of turns at the top of each section
+# weights : current density in each section relative to the mean current density
+Sections = namedtuple('Sections', ['z', 'dz', 'turns', 'weights'])
+
+@lru_cache(maxsize=1024)
+def _sections(h: float, turns: tuple, pitch: tuple) -> Sections:
+    """
+    compute sections for an helical cut (cached for identical cuts)
+    """
+    n = np.array(turns, dtype=float)
+    dz = n * np.array(pitch, dtype=float)
+    z = np.cumsum(np.concatenate(([-h], dz)))
+    cumturns = np.cumsum(n)
+    weights = np.divide(n, dz, out=np.zeros_like(n), where=(dz != 0))
+    if n.sum() != 0 and dz.sum() != 0:
+        weights *= dz.sum() / n.sum()
 
+    for array in (z, dz, cumturns, weights):
+        array.flags.writeable = False
+    return Sections(z, dz, cumturns, weights)
 
 class ModelAxi(yaml.YAMLObject):
     """
@@ -46,17 +73,17 @@ class ModelAxi(yaml.YAMLObject):
                 self.pitch
                )
 
-    def to_json(self):
+    def to_json(self, compact: bool = False):
         """
         convert from yaml to json
         """
-        return json.dumps(self, default=deserialize.serialize_instance, sort_keys=True, indent=4)
+        return deserialize.dumps(self, compact)
 
     def from_json(string):
         """
         convert from json to yaml
         """
-        return json.loads(string, object_hook=deserialize.unserialize_object)
+        return deserialize.loads(string)
 
     def get_Nturns(self):
         """
@@ -64,6 +91,13 @@ class ModelAxi(yaml.YAMLObject):
         """
         return sum(self.turns)
 
+    def get_sections(self) -> Sections:
+        """
+        returns sections of the helical cut as read-only numpy arrays
+        (see Sections)
+        """
+        return _sections(float(self.h), tuple(self.turns), tuple(self.pitch))
+
 def ModelAxi_constructor(loader, node):
     """
     build an ModelAxi object
@@ -77,3 +111,4 @@ def ModelAxi_constructor(loader, node):
 
 
 yaml.add_constructor(u'!ModelAxi', ModelAxi_constructor)
+loader.register(ModelAxi, ModelAxi_constructor)
@@ -6,9 +6,10 @@ Provides Inner and OuterCurrentLead class
 """
 
 import os
-import json
 import yaml
 from . import deserialize
+from . import loader
+from . import repository
 
 class OuterCurrentLead(yaml.YAMLObject):
     """
@@ -49,7 +50,7 @@ class OuterCurrentLead(yaml.YAMLObject):
         dump object to file
         """
         try:
-            yaml.dump(self, open(self.name + '.yaml', 'w'))
+            loader.dump(self, open(repository.output(self.name + '.yaml'), 'w'))
         except:
             raise Exception("Failed to dump OuterCurrentLead data")
 
@@ -59,8 +60,8 @@ class OuterCurrentLead(yaml.YAMLObject):
         """
         data = None
         try:
-            istream = open(self.name + '.yaml', 'r')
-            data = yaml.load(stream=istream)
+            istream = open(repository.resolve(self.name + '.yaml'), 'r')
+            data = loader.load(istream)
             istream.close()
         except:
             raise Exception("Failed to load OuterCurrentLead data %s.yaml"%self.name)
@@ -71,18 +72,17 @@ class OuterCurrentLead(yaml.YAMLObject):
         self.bar = data.bar
         self.support = data.support
 
-    def to_json(self):
+    def to_json(self, compact: bool = False):
         """
         convert from yaml to json
         """
-        return json.dumps(self, default=deserialize.serialize_instance, \
-                          sort_keys=True, indent=4)
+        return deserialize.dumps(self, compact)
 
     def from_json(self, string):
         """
         convert from json to yaml
         """
-        return json.loads(string, object_hook=deserialize.unserialize_object)
+        return deserialize.loads(string)
 
     def write_to_json(self):
         """
@@ -90,7 +90,7 @@ class OuterCurrentLead(yaml.YAMLObject):
         """
         jsondata = self.to_json()
         try:
-            ofile = open(self.name + '.json', 'w')
+            ofile = open(repository.output(self.name + '.json'), 'w')
             ofile.write(str(jsondata))
             ofile.close()
         except:
@@ -100,7 +100,7 @@ class OuterCurrentLead(yaml.YAMLObject):
         """
         read from json file
         """
-        istream = open(self.name + '.json', 'r')
+        istream = open(repository.resolve(self.name + '.json'), 'r')
         jsondata = self.from_json(istream.read())
         istream.close()
         print (type(jsondata))
@@ -119,6 +119,7 @@ def OuterCurrentLead_constructor(loader, node):
     return OuterCurrentLead(name, r, h, bar, support)
 
 yaml.add_constructor(u'!OuterCurrentLead', OuterCurrentLead_constructor)
+loader.register(OuterCurrentLead, OuterCurrentLead_constructor)
 
 
 #
@@ -141,7 +142,7 @@ if __name__ == "__main__":
     else:
         try:
             file = open(args.name, 'r')
-            lead = yaml.load(file)
+            lead = loader.load(file)
             print ("lead=", lead)
         except:
             print ("Failed to load yaml Outer CurrentLead definition, try json format")
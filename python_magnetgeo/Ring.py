@@ -6,9 +6,15 @@ Provides definition for Ring:
 
 """
 
-import json
+import logging
 import yaml
 from . import deserialize
+from . import loader
+from . import repository
+from . import profiling
+from . import bcindex
+
+logger = logging.getLogger(__name__)
 
 class Ring(yaml.YAMLObject):
     """
@@ -57,8 +63,8 @@ class Ring(yaml.YAMLObject):
         dump object to file
         """
         try:
-            ostream = open(self.name + '.yaml', 'w')
-            yaml.dump(self, stream=ostream)
+            ostream = open(repository.output(self.name + '.yaml'), 'w')
+            loader.dump(self, stream=ostream)
         except:
             raise Exception("Failed to dump Ring data")
 
@@ -68,8 +74,8 @@ class Ring(yaml.YAMLObject):
         """
         data = None
         try:
-            istream = open(self.name + '.yaml', 'r')
-            data = yaml.load(stream=istream)
+            istream = open(repository.resolve(self.name + '.yaml'), 'r')
+            data = loader.load(istream)
             istream.close()
         except:
             raise Exception("Failed to load Ring data %s.yaml"%self.name)
@@ -83,24 +89,23 @@ class Ring(yaml.YAMLObject):
         self.fillets = data.fillets
         self.orientation = data.orientation
 
-    def to_json(self):
+    def to_json(self, compact: bool = False):
         """
         convert from yaml to json
         """
-        return json.dumps(self, default=deserialize.serialize_instance, \
-            sort_keys=True, indent=4)
+        return deserialize.dumps(self, compact)
 
     def from_json(self, string):
         """
         convert from json to yaml
         """
-        return json.loads(string, object_hook=deserialize.unserialize_object)
+        return deserialize.loads(string)
 
     def write_to_json(self):
         """
         write from json file
         """
-        ostream = open(self.name + '.json', 'w')
+        ostream = open(repository.output(self.name + '.json'), 'w')
         jsondata = self.to_json()
         ostream.write(str(jsondata))
         ostream.close()
@@ -109,11 +114,12 @@ class Ring(yaml.YAMLObject):
         """
         read from json file
         """
-        istream = open(self.name + '.json', 'r')
+        istream = open(repository.resolve(self.name + '.json'), 'r')
         jsondata = self.from_json(istream.read())
-        print (type(jsondata))
+        logger.debug("%s", type(jsondata))
         istream.close()
 
+    @profiling.timed()
     def gmsh(self, x, y, debug=False):
         """
         create gmsh geometry
@@ -124,43 +130,32 @@ class Ring(yaml.YAMLObject):
         
         return _id
 
+    @profiling.timed()
+    @bcindex.indexed()
     def gmsh_bcs(self, name: str, hp: bool, y: float, id: int, debug: bool = False):
         """
         create gmsh geometry
         """
         import gmsh
         
-        ps = gmsh.model.addPhysicalGroup(2, [id])
+        ps = bcindex.addPhysicalGroup(2, [id])
         gmsh.model.setPhysicalName(2, ps, name)
         
         # get BC (TODO review to keep on BP or HP)
-        gmsh.option.setNumber("Geometry.OCCBoundsUseStl", 1)
-
-        eps = 1.e-3
         if hp:
-            ov = gmsh.model.getEntitiesInBoundingBox(self.r[0]* (1-eps), (y+self.z[0])* (1-eps), 0,
-                                                 self.r[-1]* (1+eps), (y+self.z[0])* (1+eps), 0, 1)
-            ps = gmsh.model.addPhysicalGroup(1, [tag for (dim,tag) in ov])
+            ps = bcindex.addPhysicalGroup(1, bcindex.getSideCurves([id], 'z0'))
             gmsh.model.setPhysicalName(1, ps, "%s_HP" % name)
         else:
-            ov = gmsh.model.getEntitiesInBoundingBox(self.r[0]* (1-eps), (y+self.z[-1])* (1-eps), 0,
-                                                 self.r[-1]* (1+eps), (y+self.z[-1])* (1+eps), 0, 1)
-            ps = gmsh.model.addPhysicalGroup(1, [tag for (dim,tag) in ov])
+            ps = bcindex.addPhysicalGroup(1, bcindex.getSideCurves([id], 'z1'))
             gmsh.model.setPhysicalName(1, ps, "%s_BP" % name)
         
-        
-        ov = gmsh.model.getEntitiesInBoundingBox(self.r[0]* (1-eps), (y+self.z[0])* (1-eps), 0,
-                                                 self.r[0]* (1+eps), (y+self.z[-1])* (1+eps), 0, 1)
-        r0_ids = [tag for (dim,tag) in ov]
-        
-        ov = gmsh.model.getEntitiesInBoundingBox(self.r[-1]* (1-eps), (y+self.z[0])* (1-eps), 0,
-                                                 self.r[-1]* (1+eps), (y+self.z[-1])* (1+eps), 0, 1)
-        r1_ids = [tag for (dim,tag) in ov]
+        r0_ids = bcindex.getSideCurves([id], 'r0')
+        r1_ids = bcindex.getSideCurves([id], 'r1')
         
         # TODO cooling
-        ov = gmsh.model.getEntitiesInBoundingBox(self.r[1]* (1-eps), (y+self.z[0])* (1-eps), 0,
-                                                 self.r[2]* (1+eps), (y+self.z[-1])* (1+eps), 0, 1)
-        slit_ids = [tag for (dim,tag) in ov]
+        # slits: between r[1] and r[2] on the side in contact with helices
+        slit_ids = bcindex.getSideCurves([id], 'z0', self.r[1], self.r[2]) \
+                 + bcindex.getSideCurves([id], 'z1', self.r[1], self.r[2])
         
         return (r0_ids, r1_ids, slit_ids)        
 
@@ -180,4 +175,5 @@ def Ring_constructor(loader, node):
     return Ring(name, r, z, n, angle, BPside, fillets, orientation)
 
 yaml.add_constructor(u'!Ring', Ring_constructor)
+loader.register(Ring, Ring_constructor)
 
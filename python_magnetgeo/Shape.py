@@ -10,9 +10,9 @@ Provides definiton for Helix:
 * Shape: definition of Shape eventually added to the helical cut
 """
 
-import json
 import yaml
 from . import deserialize
+from . import loader
 
 # from Shape import *
 # from ModelAxi import *
@@ -57,17 +57,17 @@ class Shape(yaml.YAMLObject):
                 self.position
                )
 
-    def to_json(self):
+    def to_json(self, compact: bool = False):
         """
         convert from yaml to json
         """
-        return json.dumps(self, default=deserialize.serialize_instance, sort_keys=True, indent=4)
+        return deserialize.dumps(self, compact)
 
     def from_json(string):
         """
         convert from json to yaml
         """
-        return json.loads(string, object_hook=deserialize.unserialize_object)
+        return deserialize.loads(string)
 
 
 def Shape_constructor(loader, node):
@@ -84,3 +84,4 @@ def Shape_constructor(loader, node):
     return Shape(name, profile, length, angle, onturns, position)
 
 yaml.add_constructor(u'!Shape', Shape_constructor)
+loader.register(Shape, Shape_constructor)
@@ -9,14 +9,21 @@ Provides definition for Supra:
 * Model 3D: actual 3D CAD
 """
 
+import logging
 import os
 import sys
 
-import json
 import yaml
 from . import deserialize
+from . import loader
+from . import repository
 
 from . import SupraStructure
+from . import profiling
+from . import bcindex
+from . import brepcache
+
+logger = logging.getLogger(__name__)
 
 class Supra(yaml.YAMLObject):
     """
@@ -47,7 +54,7 @@ class Supra(yaml.YAMLObject):
             magnet = SupraStructure.HTSinsert()
             magnet.loadCfg(self.struct)
 
-            print("Supra/init: override dimensions from %s" % self.struct)
+            logger.debug("Supra/init: override dimensions from %s", self.struct)
             self.r[0] = magnet.getR0()
             self.r[1] = magnet.getR1()
             self.z[0] = magnet.getZ0()-magnet.getH()/2.
@@ -74,8 +81,8 @@ class Supra(yaml.YAMLObject):
         dump object to file
         """
         try:
-            ostream = open(self.name + '.yaml', 'w')
-            yaml.dump(self, stream=ostream)
+            ostream = open(repository.output(self.name + '.yaml'), 'w')
+            loader.dump(self, stream=ostream)
             ostream.close()
         except:
             raise Exception("Failed to Supra dump")
@@ -86,8 +93,8 @@ class Supra(yaml.YAMLObject):
         """
         data = None
         try:
-            istream = open(self.name + '.yaml', 'r')
-            data = yaml.load(stream=istream)
+            istream = open(repository.resolve(self.name + '.yaml'), 'r')
+            data = loader.load(istream)
             istream.close()
         except:
             raise Exception("Failed to load Supra data %s.yaml"%self.name)
@@ -102,24 +109,24 @@ class Supra(yaml.YAMLObject):
         # TODO: if struct load r,z and n from struct data
         # or at least check that values are valid
 
-    def to_json(self):
+    def to_json(self, compact: bool = False):
         """
         convert from yaml to json
         """
-        return json.dumps(self, default=deserialize.serialize_instance, sort_keys=True, indent=4)
+        return deserialize.dumps(self, compact)
 
 
     def from_json(self, string):
         """
         convert from json to yaml
         """
-        return json.loads(string, object_hook=deserialize.unserialize_object)
+        return deserialize.loads(string)
 
     def write_to_json(self):
         """
         write from json file
         """
-        ostream = open(self.name + '.json', 'w')
+        ostream = open(repository.output(self.name + '.json'), 'w')
         jsondata = self.to_json()
         ostream.write(str(jsondata))
         ostream.close()
@@ -128,9 +135,9 @@ class Supra(yaml.YAMLObject):
         """
         read from json file
         """
-        istream = open(self.name + '.json', 'r')
+        istream = open(repository.resolve(self.name + '.json'), 'r')
         jsondata = self.from_json(istream.read())
-        print (type(jsondata))
+        logger.debug("%s", type(jsondata))
         istream.close()
 
     def get_Nturns(self):
@@ -140,7 +147,7 @@ class Supra(yaml.YAMLObject):
         if not self.struct:
             return self.n
         else:
-            print("shall get nturns from %s" % self.struct)
+            logger.debug("shall get nturns from %s", self.struct)
             return -1
 
     def set_Detail(self, detail):
@@ -150,10 +157,12 @@ class Supra(yaml.YAMLObject):
         if detail in ['None', 'dblepancake', 'pancake', 'tape']:
             self.detail = detail
         else:
-            print("Supra/set_Detail: unexpected detail value (detail=%s)" % detail)
-            print("valid values are:" , ['None', 'dblepancake', 'pancake', 'tape'])
+            logger.warning("Supra/set_Detail: unexpected detail value (detail=%s)", detail)
+            logger.warning("valid values are: %s", ['None', 'dblepancake', 'pancake', 'tape'])
             sys.exit(1)
     
+    @profiling.timed()
+    @brepcache.cached()
     def gmsh(self, Air=False, debug=False):
         """
         create gmsh geometry
@@ -187,6 +196,8 @@ class Supra(yaml.YAMLObject):
             gmsh_ids = nougat.gmsh(self.detail, Air, debug)
             return gmsh_ids
 
+    @profiling.timed()
+    @bcindex.indexed()
     def gmsh_bcs(self, ids: tuple, debug=False):
         """
         retreive ids for bcs in gmsh geometry
@@ -198,71 +209,41 @@ class Supra(yaml.YAMLObject):
             (id, Air_data) = ids
 
             # set physical name
-            ps = gmsh.model.addPhysicalGroup(2, [id])
+            ps = bcindex.addPhysicalGroup(2, [id])
             gmsh.model.setPhysicalName(2, ps, "%s_S" % self.name)
         
             # get BC ids
-            gmsh.option.setNumber("Geometry.OCCBoundsUseStl", 1)
-
-            eps = 1.e-3
-
-            # TODO: if z[xx] < 0 multiply by 1+eps to get a min by 1-eps to get a max
-        
-            ov = gmsh.model.getEntitiesInBoundingBox(self.r[0]* (1-eps), (self.z[0])* (1+eps), 0,
-                                                     self.r[-1]* (1+eps), (self.z[0])* (1-eps), 0, 1)
-            ps = gmsh.model.addPhysicalGroup(1, [tag for (dim,tag) in ov])
+            ps = bcindex.addPhysicalGroup(1, bcindex.getSideCurves([id], 'z0'))
             gmsh.model.setPhysicalName(1, ps, "%s_HP" % self.name)
         
-            ov = gmsh.model.getEntitiesInBoundingBox(self.r[0]* (1-eps), (self.z[-1])* (1-eps), 0,
-                                                     self.r[-1]* (1+eps), (self.z[-1])* (1+eps), 0, 1)
-            ps = gmsh.model.addPhysicalGroup(1, [tag for (dim,tag) in ov])
+            ps = bcindex.addPhysicalGroup(1, bcindex.getSideCurves([id], 'z1'))
             gmsh.model.setPhysicalName(1, ps, "%s_BP" % self.name)
 
-            ov = gmsh.model.getEntitiesInBoundingBox(self.r[0]* (1-eps), self.z[0]* (1+eps), 0,
-                                                     self.r[0]* (1+eps), self.z[1]* (1+eps), 0, 1)
-            r0_bc_ids = [tag for (dim,tag) in ov]
+            r0_bc_ids = bcindex.getSideCurves([id], 'r0')
             if debug:
-                print("r0_bc_ids:", len(r0_bc_ids), 
-                         self.r[0]* (1-eps), self.z[0]* (1-eps),
-                         self.r[0]* (1+eps), self.z[1]* (1+eps))
-            ps = gmsh.model.addPhysicalGroup(1, [tag for (dim,tag) in ov])
+                logger.debug("r0_bc_ids: %s", len(r0_bc_ids))
+            ps = bcindex.addPhysicalGroup(1, r0_bc_ids)
             gmsh.model.setPhysicalName(1, ps, "%s_Rint" % self.name)
 
-            ov = gmsh.model.getEntitiesInBoundingBox(self.r[1]* (1-eps), self.z[0]* (1+eps), 0,
-                                                     self.r[1]* (1+eps), self.z[1]* (1+eps), 0, 1)
-            r1_bc_ids = [tag for (dim,tag) in ov]
+            r1_bc_ids = bcindex.getSideCurves([id], 'r1')
             if debug:
-                print("r1_bc_ids:", len(r1_bc_ids))
-            ps = gmsh.model.addPhysicalGroup(1, [tag for (dim,tag) in ov])
+                logger.debug("r1_bc_ids: %s", len(r1_bc_ids))
+            ps = bcindex.addPhysicalGroup(1, r1_bc_ids)
             gmsh.model.setPhysicalName(1, ps, "%s_Rext" % self.name)
         
             # TODO: Air
             if Air_data:
                 (Air_id, dr_air, z0_air, dz_air) = Air_data
 
-                ps = gmsh.model.addPhysicalGroup(2, [Air_id])
+                ps = bcindex.addPhysicalGroup(2, [Air_id])
                 gmsh.model.setPhysicalName(2, ps, "Air")
 
-                # TODO: Axis, Inf
-                gmsh.option.setNumber("Geometry.OCCBoundsUseStl", 1)
-            
-                eps = 1.e-6
-            
-                ov = gmsh.model.getEntitiesInBoundingBox(-eps, z0_air-eps, 0, +eps, z0_air+dz_air+eps, 0, 1)
-                print("ov:", len(ov))
-                ps = gmsh.model.addPhysicalGroup(1, [tag for (dim,tag) in ov])
+                (Axis_ids, Inf_ids) = bcindex.getAirCurves([Air_id])
+                logger.debug("Axis: %s, Inf: %s", len(Axis_ids), len(Inf_ids))
+                ps = bcindex.addPhysicalGroup(1, Axis_ids)
                 gmsh.model.setPhysicalName(1, ps, "Axis")
-            
-                ov = gmsh.model.getEntitiesInBoundingBox(-eps, z0_air-eps, 0, dr_air+eps, z0_air+eps, 0, 1)
-                print("ov:", len(ov))
-            
-                ov += gmsh.model.getEntitiesInBoundingBox(dr_air-eps, z0_air-eps, 0, dr_air+eps, z0_air+dz_air+eps, 0, 1)
-                print("ov:", len(ov))
-            
-                ov += gmsh.model.getEntitiesInBoundingBox(-eps, z0_air+dz_air-eps, 0, dr_air+eps, z0_air+dz_air+eps, 0, 1)
-                print("ov:", len(ov))
-            
-                ps = gmsh.model.addPhysicalGroup(1, [tag for (dim,tag) in ov])
+                
+                ps = bcindex.addPhysicalGroup(1, Inf_ids)
                 gmsh.model.setPhysicalName(1, ps, "Inf")            
 
             pass
@@ -272,7 +253,7 @@ class Supra(yaml.YAMLObject):
             nougat.loadCfg(self.struct)
 
             # call gmsh for struct
-            nougat.gmsh_bcs(ids, self.detail, debug)
+            nougat.gmsh_bcs(self.detail, ids, debug)
             pass
 
 def Supra_constructor(loader, node):
@@ -289,4 +270,5 @@ def Supra_constructor(loader, node):
     return Supra(name, r, z, struct)
 
 yaml.add_constructor(u'!Supra', Supra_constructor)
+loader.register(Supra, Supra_constructor)
 
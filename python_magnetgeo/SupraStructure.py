@@ -4,9 +4,40 @@ Define HTS insert geometry
 
 # from typing import SupportsFloat
 
+import logging
 import os
 import sys
-import gmsh
+from collections import namedtuple
+
+import numpy as np
+from . import profiling
+from . import bcindex
+from . import brepcache
+from . import repository
+
+logger = logging.getLogger(__name__)
+
+# Layout of an HTSinsert: read-only arrays with one value
+# per double pancake (ntapes ... z0dblepancake) or
+# per isolation between double pancakes (r0_isolation ... h_isolation)
+Layout = namedtuple('Layout', ['ntapes', 'htapes', 'wtapes_sc', 'wtapes_isolation',
+                               'mandrin', 'r0pancake', 'wpancake',
+                               'r0pancake_isolation', 'wpancake_isolation', 'hpancake_isolation',
+                               'wdblepancake', 'hdblepancake', 'z0dblepancake',
+                               'r0_isolation', 'w_isolation', 'h_isolation'])
+
+# Coordinates of tapes: r0, r1, z0, z1 arrays
+# with [..., 0] for SC and [..., 1] for co-wound isolation (duromag)
+Coords = namedtuple('Coords', ['r0', 'r1', 'z0', 'z1'])
+
+def _tapes_coords(r0: np.ndarray, w: np.ndarray, e: np.ndarray, y0: np.ndarray, h: np.ndarray) -> Coords:
+    """
+    returns Coords of tapes with inner radius r0, SC width w,
+    isolation width e, lower altitude y0 and height h
+    """
+    r = np.column_stack((r0, r0 + w))
+    return Coords(r, np.column_stack((r0 + w, r0 + w + e)),
+                  np.column_stack((y0, y0)), np.column_stack((y0 + h, y0 + h)))
 
 class tape:
     """
@@ -75,6 +106,7 @@ class tape:
         """
         return  (self.w * self.h) / self.getArea()
 
+    @profiling.timed()
     def gmsh(self, x0: float, y0: float, detail: str):
         """
         create tape for gmsh
@@ -86,6 +118,8 @@ class tape:
         ie. [tape,isolation]
         """
 
+        import gmsh
+
         # print("gmsh/tape", x0, y0, self.w, self.e, self.h)
 
         # TODO return either whole tape or details
@@ -172,15 +206,17 @@ class pancake:
         """
         get list of tapes inner radius
         """
-        r = []
-        ri = self.getR0()
-        dr = self.tape.w + self.tape.e
-        for i in range(self.n):
-            # print("r[%d]=%g,%g" % (i, ri, ri+self.tape.w + self.tape.e/2.))
-            r.append(ri)
-            ri += dr
-        # print("r[-1]:", r[0], r[-1], r[-1]+self.tape.w + self.tape.e/2., self.n, self.getR1())
-        return r
+        return (self.getR0() + (self.tape.w + self.tape.e) * np.arange(self.n)).tolist()
+
+    def getTapeCoords(self, y0: float = 0) -> Coords:
+        """
+        get coordinates of tapes for a pancake
+        with lower left point at altitude y0
+
+        returns Coords of shape (n, 2)
+        """
+        r0 = self.getR0() + (self.tape.w + self.tape.e) * np.arange(self.n)
+        return _tapes_coords(r0, self.tape.w, self.tape.e, np.full(self.n, float(y0)), self.tape.h)
 
     def getFillingFactor(self) -> float:
         """
@@ -198,6 +234,7 @@ class pancake:
     def getArea(self) -> float:
         return (self.getR1() - self.getR0()) * self.getH()
 
+    @profiling.timed()
     def gmsh(self, x0: float, y0: float, detail: str):
         """
         create pancake for gmsh
@@ -210,6 +247,8 @@ class pancake:
         returns gmsh ids
         ie. [_mandrin, [tape_id]]
         """
+
+        import gmsh
         #print("gmsh/pancake")
 
         # TODO return either pancake as a whole or detailed
@@ -223,12 +262,11 @@ class pancake:
             return _id
         else:
             _mandrin = gmsh.model.occ.addRectangle(self.r0-self.mandrin, y0, 0, self.mandrin, self.getH())
-            print("pancake/gmsh: create mandrin %d" % _mandrin)
-            x0 = self.r0
+            logger.debug("pancake/gmsh: create mandrin %d", _mandrin)
+            coords = self.getTapeCoords(y0)
             tape_ids = []
-            for i in range(self.n):
+            for x0 in coords.r0[:,0].tolist():
                 tape_id = self.tape.gmsh(x0, y0, detail)
-                x0 = x0 + self.tape.getW()
                 tape_ids.append(tape_id)
 
             #gmsh.model.occ.synchronize()
@@ -301,6 +339,7 @@ class isolation:
         """
         return len(self.w)
 
+    @profiling.timed()
     def gmsh(self, x0: float, y0: float, detail: str):
         """
         create isolation for gmsh
@@ -311,6 +350,8 @@ class isolation:
         returns gmsh id
         """
 
+        import gmsh
+
         # print("gmsh/isolation")
         # TODO: return either isolation as a whole or detail
         _id = gmsh.model.occ.addRectangle(self.r0, y0, 0, self.getW(), self.getH())
@@ -346,7 +387,7 @@ class dblpancake:
             self.pancake = pancake(data["pancake"])
         if "isolation" in data:
             self.isolation = data["isolation"]
-            print(self.isolation)
+            logger.debug("%s", self.isolation)
 
     def __str__(self) -> str:
         msg = str(self.pancake.getR0()) + ", "
@@ -399,6 +440,18 @@ class dblpancake:
     def getArea(self) -> float:
         return (self.pancake.getR1() - self.pancake.getR0()) * self.getH()
 
+    def getTapeCoords(self, y0: float = 0) -> Coords:
+        """
+        get coordinates of tapes for a dble pancake
+        with lower left point at altitude y0
+
+        returns Coords of shape (2, n, 2), one row per pancake
+        """
+        p0 = self.pancake.getTapeCoords(y0)
+        p1 = self.pancake.getTapeCoords(y0 + self.pancake.getH() + self.isolation.getH())
+        return Coords(*[np.stack((a, b)) for (a, b) in zip(p0, p1)])
+
+    @profiling.timed()
     def gmsh(self, x0: float, y0: float, detail: str):
         """
         create dble pancake for gmsh
@@ -409,6 +462,8 @@ class dblpancake:
         returns tuple of gmsh ids
         ie. (m_id, t_id, e_id, i_id)
         """
+
+        import gmsh
         # print("gmsh/dblepancake")
 
         #TODO if detail="pancake" return the pancake as a whole
@@ -436,6 +491,137 @@ class dblpancake:
             #gmsh.model.occ.synchronize()
             return [p_ids, _isolation_id]
 
+def _snap(values: list, tol: float) -> tuple:
+    """
+    merge values closer than tol
+
+    returns sorted merged values and the index of each value in it
+    """
+    order = sorted(range(len(values)), key=lambda i: values[i])
+    merged = []
+    index = [0] * len(values)
+    for i in order:
+        if not merged or values[i] - merged[-1] > tol:
+            merged.append(values[i])
+        index[i] = len(merged)-1
+    return (merged, index)
+
+def _flatten(item):
+    """
+    yield the gmsh ids stored in nested lists
+    """
+    if isinstance(item, list):
+        for i in item:
+            yield from _flatten(i)
+    else:
+        yield item
+
+@profiling.timed()
+def gmsh_rectangles(rects: list, air: tuple = None, debug: bool = False):
+    """
+    create a conforming set of surfaces for gmsh from
+    non overlapping aligned rectangles (no boolean operation required)
+
+    inputs:
+    rects: list of (x0, y0, dx, dy)
+    air: optional (x0, y0, dx, dy) of a box enclosing all rectangles
+
+    returns gmsh ids of the surfaces (same order as rects) and of air
+    """
+
+    import gmsh
+
+    xs = [x for (x0, y0, dx, dy) in rects for x in (x0, x0+dx)]
+    ys = [y for (x0, y0, dx, dy) in rects for y in (y0, y0+dy)]
+    tol = 1.e-9 * max(max(xs)-min(xs), max(ys)-min(ys), 1)
+    (X, xi) = _snap(xs, tol)
+    (Y, yi) = _snap(ys, tol)
+    grid = [(xi[2*n], yi[2*n], xi[2*n+1], yi[2*n+1]) for n in range(len(rects))]
+
+    # corners on each horizontal/vertical line give the points where edges shall be split
+    hbreaks = {}
+    vbreaks = {}
+    for (i0, j0, i1, j1) in grid:
+        for j in (j0, j1):
+            hbreaks.setdefault(j, set()).update((i0, i1))
+        for i in (i0, i1):
+            vbreaks.setdefault(i, set()).update((j0, j1))
+    hbreaks = {j: sorted(v) for j, v in hbreaks.items()}
+    vbreaks = {i: sorted(v) for i, v in vbreaks.items()}
+
+    points = {}
+    def point(i: int, j: int) -> int:
+        if (i, j) not in points:
+            points[(i, j)] = gmsh.model.occ.addPoint(X[i], Y[j], 0)
+        return points[(i, j)]
+
+    lines = {}
+    count = {}
+    def segments(p0: tuple, p1: tuple) -> list:
+        # split edge p0-p1 at breaks, returns line ids from p0 to p1
+        if p0[1] == p1[1]:
+            (a, b, fixed, breaks) = (p0[0], p1[0], p0[1], hbreaks[p0[1]])
+            key = lambda u, v: ('h', fixed, u, v)
+            pt = lambda u: point(u, fixed)
+        else:
+            (a, b, fixed, breaks) = (p0[1], p1[1], p0[0], vbreaks[p0[0]])
+            key = lambda u, v: ('v', fixed, u, v)
+            pt = lambda u: point(fixed, u)
+        nodes = [u for u in breaks if min(a, b) <= u <= max(a, b)]
+        if a > b:
+            nodes.reverse()
+        ids = []
+        for (u, v) in zip(nodes[:-1], nodes[1:]):
+            k = key(min(u, v), max(u, v))
+            if k not in lines:
+                lines[k] = gmsh.model.occ.addLine(pt(min(u, v)), pt(max(u, v)))
+            count[k] = count.get(k, 0) + 1
+            ids.append(lines[k])
+        return ids
+
+    surfaces = []
+    for (i0, j0, i1, j1) in grid:
+        loop = segments((i0, j0), (i1, j0)) + segments((i1, j0), (i1, j1)) \
+             + segments((i1, j1), (i0, j1)) + segments((i0, j1), (i0, j0))
+        _loop = gmsh.model.occ.addCurveLoop(loop)
+        surfaces.append(gmsh.model.occ.addPlaneSurface([_loop]))
+
+    if air is None:
+        return (surfaces, None)
+
+    # holes in air: edges that belong to only one rectangle
+    neighbours = {}
+    for k, n in count.items():
+        if n == 1:
+            ends = ((k[2], k[1]), (k[3], k[1])) if k[0] == 'h' else ((k[1], k[2]), (k[1], k[3]))
+            for (e, f) in (ends, ends[::-1]):
+                neighbours.setdefault(e, []).append((f, lines[k]))
+
+    holes = []
+    used = set()
+    for start in sorted(neighbours):
+        for (f, line) in neighbours[start]:
+            if line in used:
+                continue
+            loop = []
+            e = start
+            while line not in used:
+                used.add(line)
+                loop.append(line)
+                e = f
+                for (f, line) in neighbours[e]:
+                    if line not in used:
+                        break
+            holes.append(gmsh.model.occ.addCurveLoop(loop))
+    if debug:
+        logger.debug("gmsh_rectangles: %s rectangles, %s holes in air", len(rects), len(holes))
+
+    (x0, y0, dx, dy) = air
+    corners = [gmsh.model.occ.addPoint(x, y, 0) for (x, y) in [(x0, y0), (x0+dx, y0), (x0+dx, y0+dy), (x0, y0+dy)]]
+    box = [gmsh.model.occ.addLine(corners[n], corners[(n+1)%4]) for n in range(4)]
+    _id = gmsh.model.occ.addPlaneSurface([gmsh.model.occ.addCurveLoop(box)] + holes)
+    return (surfaces, _id)
+
 class HTSinsert:
     """
     HTS insert
@@ -455,16 +641,58 @@ class HTSinsert:
         self.n = 0
         self.dblepancakes = []
         self.isolations = []
+        self._layout = None
+        self._values = None
         pass
 
     def setDblepancake(self, dblepancake):
         self.dblepancakes.append(dblepancake)
+        self._layout = None
 
     def setIsolation(self, isolation):
         self.isolations.append(isolation)
+        self._layout = None
 
     def setZ0(self, z0):
-        self.z0 = 0
+        self.z0 = z0
+        self._layout = None
+
+    def getLayout(self) -> Layout:
+        """
+        returns the layout table of the insert
+
+        the table is computed once and kept until
+        setDblepancake, setIsolation, setZ0 or loadCfg is called
+        (NB: dblepancakes and isolations shall not be modified in place);
+        getters return the values as given (python ints or floats)
+        """
+        if self._layout is None:
+            dps = self.dblepancakes
+            columns = {
+                'ntapes': [dp.getPancake().getN() for dp in dps],
+                'htapes': [dp.pancake.getTape().getH() for dp in dps],
+                'wtapes_sc': [dp.pancake.getTape().getW_Sc() for dp in dps],
+                'wtapes_isolation': [dp.pancake.getTape().getW_Isolation() for dp in dps],
+                'mandrin': [dp.getPancake().getMandrin() for dp in dps],
+                'r0pancake': [dp.getPancake().getR0() for dp in dps],
+                'wpancake': [dp.getPancake().getW() for dp in dps],
+                'r0pancake_isolation': [dp.getIsolation().getR0() for dp in dps],
+                'wpancake_isolation': [dp.isolation.getW() for dp in dps],
+                'hpancake_isolation': [dp.getIsolation().getH() for dp in dps],
+                'wdblepancake': [dp.getW() for dp in dps],
+                'hdblepancake': [dp.getH() for dp in dps],
+                'z0dblepancake': [dp.getZ0() for dp in dps],
+                'r0_isolation': [isolant.getR0() for isolant in self.isolations],
+                'w_isolation': [isolant.getW() for isolant in self.isolations],
+                'h_isolation': [isolant.getH() for isolant in self.isolations],
+            }
+            self._values = {key: tuple(values) for key, values in columns.items()}
+            for key in columns:
+                columns[key] = np.array(columns[key], dtype=int if key == 'ntapes' else float)
+                columns[key].flags.writeable = False
+            self._layout = Layout(**columns)
+
+        return self._layout
 
     def getZ0(self) -> float:
         """
@@ -503,197 +731,241 @@ class HTSinsert:
         """
         return self.n
 
+    def getZDblePancakes(self) -> tuple:
+        """
+        returns the lower altitude of dble pancakes
+        and of isolations between dble pancakes as arrays
+        """
+        layout = self.getLayout()
+        n_dp = len(self.dblepancakes)
+        if not n_dp:
+            return (np.zeros(0), np.zeros(0))
+
+        # same sequence of additions as gmsh
+        steps = np.empty(2*n_dp-1)
+        steps[0] = self.z0-self.getH()/2.
+        steps[1::2] = layout.hdblepancake[:-1]
+        steps[2::2] = layout.h_isolation[:n_dp-1]
+        z = np.cumsum(steps)
+        return (z[0::2], z[1::2])
+
+    def getTapeCoords(self) -> tuple:
+        """
+        returns the coordinates of all tapes in the insert
+
+        index: array of shape (N, 3) giving dble pancake, pancake and tape number
+        coords: Coords of shape (N, 2)
+        """
+        layout = self.getLayout()
+        n_dp = len(self.dblepancakes)
+        (z_dp, z_isolation) = self.getZDblePancakes()
+
+        counts = np.repeat(layout.ntapes, 2)
+        dp = np.repeat(np.repeat(np.arange(n_dp), 2), counts)
+        p = np.repeat(np.tile([0, 1], n_dp), counts)
+        tape = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        w = layout.wtapes_sc[dp]
+        e = layout.wtapes_isolation[dp]
+        h = layout.htapes[dp]
+        r0 = layout.r0pancake[dp] + (w + e) * tape
+        y0 = z_dp[dp] + p * h + p * layout.hpancake_isolation[dp]
+
+        return (np.column_stack((dp, p, tape)), _tapes_coords(r0, w, e, y0, h))
+
+    def _column(self, key: str) -> list:
+        """
+        returns the values of column key of the layout as a list
+        """
+        self.getLayout()
+        return list(self._values[key])
+
     def getNtapes(self) -> list:
         """
         returns the number of tapes as a list
         """
-        n_ = []
-        for dp in self.dblepancakes:
-            n_.append( dp.getPancake().getN() )
-        return n_
+        return self._column('ntapes')
 
     def getHtapes(self) -> list:
         """
         returns the width of SC tapes
         either as an float or a list
         """
-        w_tapes = []
-        for dp in self.dblepancakes:
-            w_tapes.append( dp.pancake.getTape().getH() )
-        return w_tapes
+        return self._column('htapes')
 
     def getWtapes_SC(self) -> list:
         """
         returns the width of SC tapes as a list
         """
-        w_ = []
-        for dp in self.dblepancakes:
-            w_.append( dp.pancake.getTape().getW_Sc() )
-        return w_
+        return self._column('wtapes_sc')
 
     def getWtapes_Isolation(self) -> list:
         """
         returns the width of isolation between tapes as a list
         """
-        w_ = []
-        for dp in self.dblepancakes:
-            w_.append( dp.pancake.getTape().getW_Isolation() )
-        return w_
+        return self._column('wtapes_isolation')
 
     def getMandrinPancake(self) -> list:
         """
         returns the width of Mandrin as a list
         """
-        w_ = []
-        for dp in self.dblepancakes:
-            w_.append( dp.getPancake().getMandrin() )
-        return w_
+        return self._column('mandrin')
 
     def getWPancake(self) -> list:
         """
         returns the width of pancake as a list
         """
-        w_ = []
-        for dp in self.dblepancakes:
-            w_.append( dp.getPancake().getW() )
-        return w_
+        return self._column('wpancake')
 
     def getWPancake_Isolation(self) -> list:
         """
         returns the width of isolation between pancake as a list
         """
-        w_ = []
-        for dp in self.dblepancakes:
-            w_.append( dp.isolation.getW() )
-        return w_
+        return self._column('wpancake_isolation')
 
     def getR0Pancake_Isolation(self) -> list:
         """
         returns the height of isolation between pancake as a list
         """
-        w_ = []
-        for dp in self.dblepancakes:
-            w_.append( dp.getIsolation().getR0() )
-        return w_
+        return self._column('r0pancake_isolation')
 
     def getHPancake_Isolation(self) -> list:
         """
         returns the height of isolation between pancake as a list
         """
-        w_ = []
-        for dp in self.dblepancakes:
-            w_.append( dp.getIsolation().getH() )
-        return w_
-
+        return self._column('hpancake_isolation')
 
     def getWDblePancake(self) -> list:
         """
         returns the width of dblepancake as a list
         """
-        w_ = []
-        for dp in self.dblepancakes:
-            w_.append( dp.getW() )
-        return w_
+        return self._column('wdblepancake')
 
     def getHDblePancake(self) -> list:
         """
         returns the height of dblepancake as a list
         """
-        w_ = []
-        for dp in self.dblepancakes:
-            w_.append( dp.getH() )
-        return w_
+        return self._column('hdblepancake')
 
     def getR0_Isolation(self) -> list:
         """
         returns the height of isolation between dble pancake as a list
         """
-        w_ = []
-        for isolant in self.isolations:
-            w_.append( isolant.getR0() )
-        return w_
+        return self._column('r0_isolation')
 
     def getW_Isolation(self) -> list:
         """
         returns the width of isolation between dble pancakes
         """
-        w_ = []
-        for isolant in self.isolations:
-            w_.append( isolant.getW() )
-        return w_
+        return self._column('w_isolation')
 
     def getH_Isolation(self) -> list:
         """
         returns the height of isolation between dble pancakes
         """
-        w_ = []
-        for isolant in self.isolations:
-            w_.append( isolant.getH() )
-        return w_
+        return self._column('h_isolation')
 
     def getFillingFactor(self) -> float:
         S_tapes = 0
-        for dp in self.dblepancakes:
-            S_tapes += dp.pancake.n * 2 * dp.pancake.tape.w * dp.pancake.tape.h
+        for (n, w, h) in zip(self._column('ntapes'), self._column('wtapes_sc'), self._column('htapes')):
+            S_tapes += n * 2 * w * h
         return S_tapes / self.getArea()
 
     def getArea(self) -> float:
         return (self.getR1() - self.getR0()) * self.getH()
 
+    @profiling.timed()
     def loadCfg(self, inputcfg: str):
         """
         Load insert params from json
         """
         import json
 
-        with open(inputcfg) as f:
+        with open(repository.resolve(inputcfg)) as f:
             data = json.load(f)
-            print("HTSinsert data:", data)
+        self.setCfg(data)
 
-            """
-            print("List main keys:")
-            for key in data:
-                print("key:", key)
-            """
+    def setCfg(self, data: dict):
+        """
+        Load insert params from data (as loaded from json by loadCfg)
+        """
+        logger.debug("HTSinsert data: %s", data)
 
-            mytape = None
-            if "tape" in data:
-                mytape = tape(data["tape"])
+        mytape = None
+        if "tape" in data:
+            mytape = tape(data["tape"])
 
-            mypancake = None
-            if "pancake" in data:
-                mypancake = pancake(data["pancake"])
+        mypancake = None
+        if "pancake" in data:
+            mypancake = pancake(data["pancake"])
 
-            myisolation = None
-            if "isolation" in data:
-                myisolation = isolation(data["isolation"])
+        myisolation = None
+        if "isolation" in data:
+            myisolation = isolation(data["isolation"])
 
-            if "dblepancakes" in data:
-                print("DblePancake data:", data["dblepancakes"])
+        if "dblepancakes" in data:
+            logger.debug("DblePancake data: %s", data["dblepancakes"])
 
-                # if n defined use the same pancakes and isolations
-                # else loop to load pancake and isolation structure definitions
-                if "n" in data["dblepancakes"]:
-                    z = 0
-                    if "isolation" in data["dblepancakes"]:
-                        dpisolation = isolation(data["dblepancakes"]["isolation"])
-                    else:
-                        dpisolation = myisolation
+            # if n defined use the same pancakes and isolations
+            # else loop to load pancake and isolation structure definitions
+            if "n" in data["dblepancakes"]:
+                z = 0
+                if "isolation" in data["dblepancakes"]:
+                    dpisolation = isolation(data["dblepancakes"]["isolation"])
+                else:
+                    dpisolation = myisolation
+
+                self.n = data["dblepancakes"]["n"]
+                for i in range(self.n):
+                    # print("dblepancake[%d]" % i, "z0= %g [mm]" % z)
+                    dblepancake = dblpancake()
+                    dblepancake.setZ0(z)
+                    dblepancake.setPancake(mypancake)
+                    dblepancake.setIsolation(myisolation)
+                    self.setDblepancake(dblepancake)
+                    self.setIsolation(dpisolation)
+
+                    z += dblepancake.getH()
+                    z += dpisolation.getH() # isolation between DP
+
+                self.h = z - dpisolation.getH()
+                self.r0 = mypancake.getR0()
+                self.r1 = mypancake.getR1()
+
+                # shift insert by z0-z/2.
+                z = self.z0 - self.h/2.
+                for i in range(self.n):
+                    h = self.dblepancakes[i].getH()
+                    self.dblepancakes[i].setZ0(z + h/2.)
+                    z += h
+                    z += dpisolation.getH()
 
-                    self.n = data["dblepancakes"]["n"]
-                    for i in range(self.n):
-                        # print("dblepancake[%d]" % i, "z0= %g [mm]" % z)
-                        dblepancake = dblpancake()
-                        dblepancake.setZ0(z)
-                        dblepancake.setPancake(mypancake)
-                        dblepancake.setIsolation(myisolation)
-                        self.setDblepancake(dblepancake)
-                        self.setIsolation(dpisolation)
-
-                        z += dblepancake.getH()
-                        z += dpisolation.getH() # isolation between DP
-
-                    self.h = z - dpisolation.getH()
+            else:
+                z = 0
+                logger.debug("Loading different dblepancakes")
+                for dp in data['dblepancakes']:
+                    logger.debug("dp: %s %s", dp, data['dblepancakes'][dp]["pancake"])
+                    mypancake = pancake(data['dblepancakes'][dp]["pancake"])
+                    logger.debug("%s", mypancake)
+
+                    logger.debug("isolant: %s %s", dp, data['isolations'][dp])
+                    myisolation = isolation(data['isolations'][dp])
+                    logger.debug("%s", myisolation)
+                    self.setIsolation(myisolation)
+
+                    dblepancake = dblpancake()
+                    logger.debug("%s", type(dblepancake))
+                    dblepancake.setZ0(z)
+                    dblepancake.setPancake(mypancake)
+                    isolant = isolation(data['dblepancakes'][dp]["isolation"])
+                    dblepancake.setIsolation(isolant)
+                    logger.debug("%s", dblepancake)
+                    self.setDblepancake(dblepancake)
+
+                    z += dblepancake.getH()
+                    z += myisolation.getH() # isolation between DP
+
+                    self.h = z - myisolation.getH()
                     self.r0 = mypancake.getR0()
                     self.r1 = mypancake.getR1()
 
@@ -703,60 +975,28 @@ class HTSinsert:
                         h = self.dblepancakes[i].getH()
                         self.dblepancakes[i].setZ0(z + h/2.)
                         z += h
-                        z += dpisolation.getH()
+                        z += myisolation.getH()
 
-                else:
-                    z = 0
-                    print("Loading different dblepancakes")
-                    for dp in data['dblepancakes']:
-                        print("dp:", dp, data['dblepancakes'][dp]["pancake"])
-                        mypancake = pancake(data['dblepancakes'][dp]["pancake"])
-                        print(mypancake)
-
-                        print("isolant:", dp, data['isolations'][dp])
-                        myisolation = isolation(data['isolations'][dp])
-                        print(myisolation)
-                        self.setIsolation(myisolation)
-
-                        dblepancake = dblpancake()
-                        print(type(dblepancake))
-                        dblepancake.setZ0(z)
-                        dblepancake.setPancake(mypancake)
-                        isolant = isolation(data['dblepancakes'][dp]["isolation"])
-                        dblepancake.setIsolation(isolant)
-                        print(dblepancake)
-                        self.setDblepancake(dblepancake)
-
-                        z += dblepancake.getH()
-                        z += myisolation.getH() # isolation between DP
-
-                        self.h = z - myisolation.getH()
-                        self.r0 = mypancake.getR0()
-                        self.r1 = mypancake.getR1()
-
-                        # shift insert by z0-z/2.
-                        z = self.z0 - self.h/2.
-                        for i in range(self.n):
-                            h = self.dblepancakes[i].getH()
-                            self.dblepancakes[i].setZ0(z + h/2.)
-                            z += h
-                            z += myisolation.getH()
-
-
-            print("=== Load cfg:")
-            print("z0= %g [mm]" % self.z0)
-            print("r0= %g [mm]" % self.r0)
-            print("r1= %g [mm]" % self.r1)
-            print("h= %g [mm]" % self.h)
-            if self.n:
-                print("n= %d" % self.n)
-            else:
-                print("n= %d" % len(self.dblepancakes))
 
-            for i in range(self.n):
-                print("dlbpancake[%d]: " % i, self.dblepancakes[i])
-            print("===")
+        logger.debug("=== Load cfg:")
+        logger.debug("z0= %g [mm]", self.z0)
+        logger.debug("r0= %g [mm]", self.r0)
+        logger.debug("r1= %g [mm]", self.r1)
+        logger.debug("h= %g [mm]", self.h)
+        if self.n:
+            logger.debug("n= %d", self.n)
+        else:
+            logger.debug("n= %d", len(self.dblepancakes))
 
+        for i in range(self.n):
+            logger.debug("dlbpancake[%d]: %s", i, self.dblepancakes[i])
+        logger.debug("===")
+
+        # dblepancakes have been moved
+        self._layout = None
+
+    @profiling.timed()
+    @brepcache.cached()
     def gmsh(self, detail: str, Air: bool =False, debug: bool = False):
         """
         create insert for gmsh
@@ -769,6 +1009,8 @@ class HTSinsert:
         ie. [dp_ids, isolation_ids]
         """
 
+        import gmsh
+
         x0 = self.r0
         y0 = self.z0-self.getH()/2.
         n_dp = len(self.dblepancakes)
@@ -790,6 +1032,33 @@ class HTSinsert:
             return (id, None)
 
         else:
+            Air_box = None
+            if Air:
+                y0 = self.z0-self.getH()/2. # need to force y0 to init value
+                r0_air = 0
+                dr_air = (self.r1-self.r0) * 2
+                z0_air = y0 * 1.2
+                dz_air = (2 * abs(y0) ) * 1.2    
+                Air_box = (r0_air, z0_air, dr_air, dz_air)
+
+            if detail == "tape":
+                # the layout is made of aligned rectangles:
+                # create a conforming geometry directly
+                (ids, rects) = self._tape_rectangles()
+                if Air_box is None or self._inside(rects, Air_box):
+                    logger.debug("Create conforming geometry (detail=%s)", detail)
+                    (surfaces, _id) = gmsh_rectangles(rects, Air_box, debug)
+
+                    def remap(item):
+                        if isinstance(item, list):
+                            return [remap(i) for i in item]
+                        return surfaces[item]
+
+                    if Air:
+                        return (remap(ids), ([_id], dr_air, z0_air, dz_air))
+                    return (remap(ids), None)
+
+            y0 = self.z0-self.getH()/2.
             dp_ids = []
             i_ids = []
                     
@@ -802,91 +1071,107 @@ class HTSinsert:
                     y0 += self.isolations[i].getH()
                     i_ids.append(_id)
 
-            #for i,ids in enumerate(i_ids):
-            #    print("i_ids[%d]=" % i, ids)
-        
-            # Perform BooleanFragment
-            print("Create BooleanFragments (detail=%s)" % detail)
-            for j,dp in enumerate(dp_ids):
-                print("HTSInsert gmsh: dp[%d]" % j)
-                if isinstance(dp, list):
-                    for p in dp:
-                        # print("HTSInsert gmsh: dp[%d] p=" % j, p )
-                        # dp = [ [p0, p1], isolation ]
-                        if isinstance(p, list):
-                            # print("HTSInsert gmsh: dp[%d] len(p)=" % j, len(p), type(p[0]), "dp[-1]=", dp[-1] )
-                            if len(p) == 2 and isinstance(p[0], int):
-                                # detail == pancake 
-                                # print("HTSInsert gmsh: dp[%d] len(p)=" % j, len(p), "p=", p, "i_ids=", len(i_ids) )
-                                
-                                if j >= 1:
-                                    ov, ovv = gmsh.model.occ.fragment([(2, p[0])], [(2, i_ids[j-1])])
-                                if j < n_dp-1:
-                                    ov, ovv = gmsh.model.occ.fragment([(2, p[1])], [(2, i_ids[j])])
-                                ov, ovv = gmsh.model.occ.fragment([(2, dp[-1])], [(2, p[0]), (2, p[1])] )
-                                
-                            else:
-                                # detail == tape
-                                # p = [ mandrin, [SC, duromag], [SC, duromag], ... ]
-                                # print("HTSInsert gmsh: dp[%d] len(p)=" % j, len(p), "p=", p)
-                                for t in p:    
-                                    # print("HTSInsert gmsh: dp[%d]" % j, "tape: t=", t)
-                                    flat_list = []
-                                    for sublist in t[1]:
-                                        for item in sublist:
-                                            flat_list.append(item)
-
-                                    # print("flatten:", flat_list)
-                                    ov, ovv = gmsh.model.occ.fragment([(2, dp[-1])], [(2, l) for l in flat_list])
-                                    if j < n_dp-1:
-                                        ov, ovv = gmsh.model.occ.fragment([(2, i_ids[j])], [(2, l) for l in flat_list] )
-                else:
-                    # detail == dblepancake 
-                    if j < n_dp-1:
-                        ov, ovv = gmsh.model.occ.fragment([(2, dp)], [(2, i_ids[j])])
-
             # Now create air
+            Air_data = None
             if Air:
-                y0 = self.z0-self.getH()/2. # need to force y0 to init value
-                r0_air = 0
-                dr_air = (self.r1-self.r0) * 2
-                z0_air = y0 * 1.2
-                dz_air = (2 * abs(y0) ) * 1.2    
                 _id = gmsh.model.occ.addRectangle(r0_air, z0_air, 0, dr_air, dz_air)
-        
-                # TODO fragment _id with dp_ids, i_ids
-                for j,dp in enumerate(dp_ids):
-                    if isinstance(dp, list):
-                        for p in dp:
-                            if isinstance(p, list):
-                                if len(p) == 2 and isinstance(p[0], int):
-                                    # shall use i_ids[j] and i_ids[j+1] if j != n_dp_1
-                                    ov, ovv = gmsh.model.occ.fragment([(2, _id)], [(2, p[0])] + [(2, p[1])] + [(2, dp[-1])])
-                                    if j < n_dp-1:
-                                        ov, ovv = gmsh.model.occ.fragment([(2, _id)], [(2, i_ids[j])])
-                                    #if j < n_dp-2:
-                                    #    ov, ovv = gmsh.model.occ.fragment([(2, _id)], [(2, i_ids[j+1])])
-                                else:
-                                    for t in p:    
-                                        flat_list = []
-                                        for sublist in t[1]:
-                                            for item in sublist:
-                                                flat_list.append(item)
-
-                                        # print("flatten:", flat_list)
-                                        ov, ovv = gmsh.model.occ.fragment([(2, _id)], [(2, i) for i in i_ids] + [(2, l) for l in flat_list])
-
-                    else:
-                        # detail == dblepancake 
-                        ov, ovv = gmsh.model.occ.fragment([(2, _id)], [(2, dp)])
-                        ov, ovv = gmsh.model.occ.fragment([(2, _id)], [(2, i) for i in i_ids])
-                
-                # print("dp_ids:", dp_ids)
-                # print("i_ids:", i_ids)
-                return ([dp_ids, i_ids], (_id, dr_air, z0_air, dz_air))
-
-            return ([dp_ids, i_ids], None)
+                Air_data = (_id, dr_air, z0_air, dz_air)
+
+            # Perform a single BooleanFragment
+            logger.debug("Create BooleanFragments (detail=%s)", detail)
+            ([dp_ids, i_ids], Air_data) = self._gmsh_fragment([dp_ids, i_ids], Air_data, debug)
+            return ([dp_ids, i_ids], Air_data)
+
+    def _tape_rectangles(self):
+        """
+        returns the rectangles (x0, y0, dx, dy) of the insert for detail == "tape"
+        and their indices arranged like gmsh ids,
+        ie. [dp_ids, i_ids] with dp = [[p0, p1], isolation], p = [mandrin, [[sc, du], ...]]
+        """
+        rects = []
+        def add(x0: float, y0: float, dx: float, dy: float) -> int:
+            rects.append((x0, y0, dx, dy))
+            return len(rects)-1
+
+        (index, coords) = self.getTapeCoords()
+        (z_dp, z_isolation) = self.getZDblePancakes()
+        # tapes as rectangles: [sc, du] for each tape
+        tapes = np.stack((np.column_stack((coords.r0[:,0], coords.z0[:,0], coords.r1[:,0]-coords.r0[:,0], coords.z1[:,0]-coords.z0[:,0])),
+                          np.column_stack((coords.r0[:,1], coords.z0[:,1], coords.r1[:,1]-coords.r0[:,1], coords.z1[:,1]-coords.z0[:,1]))),
+                         axis=1)
+
+        n_dp = len(self.dblepancakes)
+        first = 0
+        dp_ids = []
+        i_ids = []
+        for i,dp in enumerate(self.dblepancakes):
+            p = dp.getPancake()
+            p_ids = []
+            for j in range(2):
+                y = float(z_dp[i] + j * p.getH() + j * dp.isolation.getH())
+                _mandrin = add(p.r0-p.mandrin, y, p.mandrin, p.getH())
+                start = len(rects)
+                rects += [tuple(rect) for rect in tapes[first:first+p.n].reshape(-1, 4).tolist()]
+                tape_ids = [[start+2*l, start+2*l+1] for l in range(p.n)]
+                p_ids.append([_mandrin, tape_ids])
+                first += p.n
+
+                if j == 0:
+                    _isolation_id = add(dp.isolation.r0, float(z_dp[i] + p.getH()), dp.isolation.getW(), dp.isolation.getH())
+            dp_ids.append([p_ids, _isolation_id])
+
+            if i != n_dp-1 :
+                i_ids.append(add(self.isolations[i].r0, float(z_isolation[i]), self.isolations[i].getW(), self.isolations[i].getH()))
+
+        return ([dp_ids, i_ids], rects)
+
+    def _inside(self, rects: list, box: tuple) -> bool:
+        """
+        returns True if all rects are strictly inside box
+        """
+        (x0, y0, dx, dy) = box
+        return all(x0 < r[0] and r[0]+r[2] < x0+dx and y0 < r[1] and r[1]+r[3] < y0+dy for r in rects)
+
+    @profiling.timed()
+    def _gmsh_fragment(self, ids: list, Air_data: tuple = None, debug: bool = False):
+        """
+        fragment all surfaces in ids (nested lists of gmsh ids) and air at once
+
+        returns ids with tags remapped from ovv and Air_data
+        (in Air_data, air tag is replaced by the list of air surfaces)
+        """
+
+        import gmsh
+
+        tags = list(_flatten(ids))
+        tools = []
+        if Air_data:
+            tools.append((2, Air_data[0]))
+        ov, ovv = gmsh.model.occ.fragment([(2, tag) for tag in tags], tools)
+        if debug:
+            logger.debug("HTSInsert/fragment: %s surfaces, fragment produced surfaces: %s", len(tags)+len(tools), len(ov))
+
+        # ovv[n] holds the surfaces coming from the n-th input surface
+        new_tags = {}
+        for tag, out in zip(tags, ovv):
+            if len(out) != 1:
+                raise Exception("HTSInsert/gmsh: surface %d split into %s by fragment" % (tag, [t for (dim, t) in out]))
+            new_tags[tag] = out[0][1]
+
+        def remap(item):
+            if isinstance(item, list):
+                return [remap(i) for i in item]
+            return new_tags[item]
+
+        if Air_data:
+            conductors = set(new_tags.values())
+            Air_ids = [tag for (dim, tag) in ovv[-1] if tag not in conductors]
+            Air_data = (Air_ids,) + Air_data[1:]
+
+        return (remap(ids), Air_data)
 
+    @profiling.timed()
+    @bcindex.indexed()
     def gmsh_bcs(self, detail: str, ids: tuple, debug=False):
         """
         create bcs groups for gmsh
@@ -897,121 +1182,91 @@ class HTSinsert:
         returns
         """
 
+        import gmsh
+
         (gmsh_ids, Air_data) = ids
 
-        print("Set Physical Volumes")
+        logger.debug("Set Physical Volumes")
         if isinstance(gmsh_ids, list):
             dp_ids = gmsh_ids[0]
             i_ids = gmsh_ids[1]
             for i,isol in enumerate(i_ids):
-                ps = gmsh.model.addPhysicalGroup(2, [isol])
+                ps = bcindex.addPhysicalGroup(2, [isol])
                 gmsh.model.setPhysicalName(2, ps, "isolation%d" % i)
             for i,dp in enumerate(dp_ids):
-                print("dp[%d]" % i)
+                logger.debug("dp[%d]", i)
                 if detail == "dblepancake":
-                    ps = gmsh.model.addPhysicalGroup(2, [dp])
+                    ps = bcindex.addPhysicalGroup(2, [dp])
                     gmsh.model.setPhysicalName(2, ps, "dp%d" % i)
                 elif detail == "pancake":
                     # print("dp:", dp)
-                    ps = gmsh.model.addPhysicalGroup(2, [dp[0][0]])
+                    ps = bcindex.addPhysicalGroup(2, [dp[0][0]])
                     gmsh.model.setPhysicalName(2, ps, "p%d_dp%d" % (0,i))
-                    ps = gmsh.model.addPhysicalGroup(2, [dp[0][1]])
+                    ps = bcindex.addPhysicalGroup(2, [dp[0][1]])
                     gmsh.model.setPhysicalName(2, ps, "p%d_dp%d" % (1,i))
-                    ps = gmsh.model.addPhysicalGroup(2, [dp[1]])
+                    ps = bcindex.addPhysicalGroup(2, [dp[1]])
                     gmsh.model.setPhysicalName(2, ps, "i_dp%d" % i)
                 elif detail == "tape":
-                    print("HTSInsert/gsmh_bcs (tape):", dp)
-                    ps = gmsh.model.addPhysicalGroup(2, [dp[1]])
+                    logger.debug("HTSInsert/gsmh_bcs (tape): %s", dp)
+                    ps = bcindex.addPhysicalGroup(2, [dp[1]])
                     gmsh.model.setPhysicalName(2, ps, "i_dp%d" % i)
                     for t in dp[0][0]:
-                        print("p0:", t)
+                        logger.debug("p0: %s", t)
                         if isinstance(t, list):
                             for l,t_id in enumerate(t):
-                                ps = gmsh.model.addPhysicalGroup(2, [t_id[0]])
+                                ps = bcindex.addPhysicalGroup(2, [t_id[0]])
                                 gmsh.model.setPhysicalName(2, ps, "sc%d_p%d_dp%d" % (l,0,i))
-                                ps = gmsh.model.addPhysicalGroup(2, [t_id[1]])
+                                ps = bcindex.addPhysicalGroup(2, [t_id[1]])
                                 gmsh.model.setPhysicalName(2, ps, "du%d_p%d_dp%d" % (l,0,i))
                         else:
-                            ps = gmsh.model.addPhysicalGroup(2, [t])
+                            ps = bcindex.addPhysicalGroup(2, [t])
                             gmsh.model.setPhysicalName(2, ps, "mandrin_p%d_dp%d" % (0,i))
-                            print("HTSInsert/gmsh_bcs: mandrin %d: %d" % t, ps)
+                            logger.debug("HTSInsert/gmsh_bcs: mandrin %d: %d", t, ps)
                     for t in dp[0][1]:
-                        print("p1:", t)
+                        logger.debug("p1: %s", t)
                         if isinstance(t, list):
                             for l,t_id in enumerate(t):
-                                ps = gmsh.model.addPhysicalGroup(2, [t_id[0]])
+                                ps = bcindex.addPhysicalGroup(2, [t_id[0]])
                                 gmsh.model.setPhysicalName(2, ps, "sc%d_p%d_dp%d" % (l,1,i))
-                                ps = gmsh.model.addPhysicalGroup(2, [t_id[1]])
+                                ps = bcindex.addPhysicalGroup(2, [t_id[1]])
                                 gmsh.model.setPhysicalName(2, ps, "du%d_p%d_dp%d" % (l,1,i))
                         else:
-                            ps = gmsh.model.addPhysicalGroup(2, [t])
+                            ps = bcindex.addPhysicalGroup(2, [t])
                             gmsh.model.setPhysicalName(2, ps, "mandrin_p%d_dp%d" % (1,i))
-                            print("HTSInsert/gmsh_bcs: mandrin %d: %d" % t, ps)
+                            logger.debug("HTSInsert/gmsh_bcs: mandrin %d: %d", t, ps)
         else:   
-            ps = gmsh.model.addPhysicalGroup(2, [gmsh_ids])
+            ps = bcindex.addPhysicalGroup(2, [gmsh_ids])
             gmsh.model.setPhysicalName(2, ps, "Supra")
 
         # TODO set lc charact on Domains
-        # TODO retreive BCs group for Rint, Rext, Top, Bottom
-
-        print("TODO: Set Physical Surfaces")
-        # Select the corner point by searching for it geometrically:
-        eps = 1e-3
-        gmsh.option.setNumber("Geometry.OCCBoundsUseStl", 1)
-        ov = gmsh.model.getEntitiesInBoundingBox(self.getR0()* (1-eps), (self.z0-self.getH()/2.)* (1-eps), 0,
-                                                 self.getR1()* (1+eps), (self.z0-self.getH()/2.)* (1+eps), 0, 1)
-        print("BoundingBox Bottom:", ov, type(ov))
-        ps = gmsh.model.addPhysicalGroup(1, [tag for (dim,tag) in ov])
-        gmsh.model.setPhysicalName(1, ps, "Bottom")
-
-        ov = gmsh.model.getEntitiesInBoundingBox(self.getR0()* (1-eps), (self.z0+self.getH()/2.)* (1-eps), 0,
-                                                 self.getR1()* (1+eps), (self.z0+self.getH()/2.)* (1+eps), 0, 1)
-        print("BoundingBox Top:", ov, type(ov))
-        ps = gmsh.model.addPhysicalGroup(1, [tag for (dim,tag) in ov])
-        gmsh.model.setPhysicalName(1, ps, "Top")
-        
-        ov = gmsh.model.getEntitiesInBoundingBox(self.getR0()* (1-eps), (self.z0-self.getH()/2.)* (1-eps), 0,
-                                                 self.getR0()* (1+eps), (self.z0+self.getH()/2.)* (1+eps), 0, 1)
-        print("BoundingBox Rint:", ov, type(ov))
-        ps = gmsh.model.addPhysicalGroup(1, [tag for (dim,tag) in ov])
-        gmsh.model.setPhysicalName(1, ps, "Rint")
-
-        ov = gmsh.model.getEntitiesInBoundingBox(self.getR1()* (1-eps), (self.z0-self.getH()/2.)* (1-eps), 0,
-                                                 self.getR1()* (1+eps), (self.z0+self.getH()/2.)* (1+eps), 0, 1)
-        print("BoundingBox Rext:", ov, type(ov))
-        ps = gmsh.model.addPhysicalGroup(1, [tag for (dim,tag) in ov])
-        gmsh.model.setPhysicalName(1, ps, "Rext")
+
+        logger.debug("Set Physical Surfaces")
+        surfaces = list(_flatten(gmsh_ids))
+
+        for (side, name) in [('z0', "Bottom"), ('z1', "Top"), ('r0', "Rint"), ('r1', "Rext")]:
+            bc_ids = bcindex.getSideCurves(surfaces, side)
+            logger.debug("%s: %s", name, len(bc_ids))
+            ps = bcindex.addPhysicalGroup(1, bc_ids)
+            gmsh.model.setPhysicalName(1, ps, name)
 
         # TODO: Air
         if Air_data:
             (Air_id, dr_air, z0_air, dz_air) = Air_data
 
-            ps = gmsh.model.addPhysicalGroup(2, [Air_id])
+            if not isinstance(Air_id, list):
+                Air_id = [Air_id]
+            ps = bcindex.addPhysicalGroup(2, Air_id)
             gmsh.model.setPhysicalName(2, ps, "Air")
 
-            # TODO: Axis, Inf
-            gmsh.option.setNumber("Geometry.OCCBoundsUseStl", 1)
-            
-            eps = 1.e-6
-            
-            ov = gmsh.model.getEntitiesInBoundingBox(-eps, z0_air-eps, 0, +eps, z0_air+dz_air+eps, 0, 1)
-            print("ov:", len(ov))
-            ps = gmsh.model.addPhysicalGroup(1, [tag for (dim,tag) in ov])
+            (Axis_ids, Inf_ids) = bcindex.getAirCurves(Air_id)
+            logger.debug("Axis: %s, Inf: %s", len(Axis_ids), len(Inf_ids))
+            ps = bcindex.addPhysicalGroup(1, Axis_ids)
             gmsh.model.setPhysicalName(1, ps, "Axis")
             
-            ov = gmsh.model.getEntitiesInBoundingBox(-eps, z0_air-eps, 0, dr_air+eps, z0_air+eps, 0, 1)
-            print("ov:", len(ov))
-            
-            ov += gmsh.model.getEntitiesInBoundingBox(dr_air-eps, z0_air-eps, 0, dr_air+eps, z0_air+dz_air+eps, 0, 1)
-            print("ov:", len(ov))
-            
-            ov += gmsh.model.getEntitiesInBoundingBox(-eps, z0_air+dz_air-eps, 0, dr_air+eps, z0_air+dz_air+eps, 0, 1)
-            print("ov:", len(ov))
-            
-            ps = gmsh.model.addPhysicalGroup(1, [tag for (dim,tag) in ov])
+            ps = bcindex.addPhysicalGroup(1, Inf_ids)
             gmsh.model.setPhysicalName(1, ps, "Inf")            
         
-        print("TODO: set characteristic lengths")
+        logger.debug("TODO: set characteristic lengths")
         """
         lcar = (nougat.getR1() - nougat.R(0) ) / 10.
         lcar_dp = nougat.dblepancakes[0].getW() / 10.
@@ -1040,25 +1295,29 @@ class HTSinsert:
             "None" : 3
         }
         
-        print("ISolations:", len(self.isolations))
-        print("=== Save to geo gmsh: NB use gmsh 4.9 or later")
+        logger.debug("ISolations: %s", len(self.isolations))
+        logger.debug("=== Save to geo gmsh: NB use gmsh 4.9 or later")
         import getpass
         UserName = getpass.getuser()
 
-        max_mandrin = max(self.getMandrinPancake())
-        min_r_ = min(self.getR0Pancake_Isolation())
-        min_r_dp = min(self.getR0_Isolation())
+        n_dp = len(self.dblepancakes)
+        r0_isolation = self._column('r0_isolation')[:n_dp]
+        w_isolation = self._column('w_isolation')[:n_dp]
+        r0pancake_isolation = self._column('r0pancake_isolation')
+        wpancake_isolation = self._column('wpancake_isolation')
+
+        max_mandrin = max(self._column('mandrin'))
+        min_r_ = min(r0pancake_isolation)
+        min_r_dp = min(self._column('r0_isolation'))
         xmin = min(self.getR0()-max_mandrin, min_r_dp, min_r_)
 
 
         rmin = min(self.getR0()-max_mandrin, min_r_dp, min_r_)
         rmax = 0
-        for i, dp in enumerate(self.dblepancakes):
-            r_dp = self.isolations[i].getR0()
-            r_ = dp.getIsolation().getR0()
-            rmax = max(rmax, dp.getPancake().getR0(), r_dp, r_)
+        for (r0, r_dp, r_) in zip(self._column('r0pancake'), r0_isolation, r0pancake_isolation):
+            rmax = max(rmax, r0, r_dp, r_)
         if rmax > self.getR0():
-            print("ATTENTION rmax=%g > r0=%g" % (rmax, self.getRO()))
+            logger.warning("ATTENTION rmax=%g > r0=%g", rmax, self.getR0())
         """
         # To be checked if r_ and/or r_dp > r0
         for r in r_dp:
@@ -1070,10 +1329,8 @@ class HTSinsert:
         """
 
         xmax = 0
-        for i, dp in enumerate(self.dblepancakes):
-            r_dp = self.isolations[i].getR0() + self.isolations[i].getW()
-            r_ = dp.getIsolation().getR0() + dp.getIsolation().getW()
-            xmax = max(xmax, r_dp, r_)
+        for (r_dp, e_dp, r_, e_) in zip(r0_isolation, w_isolation, r0pancake_isolation, wpancake_isolation):
+            xmax = max(xmax, r_dp + e_dp, r_ + e_)
 
         # Some data will be stored as list (str(...)
         data_dict = {
@@ -1097,7 +1354,7 @@ class HTSinsert:
             'n_t':str(self.getNtapes()).replace('[','{').replace(']','}'),
             'e_t':str(self.getWtapes_Isolation()).replace('[','{').replace(']','}'),
             'w_t':str(self.getWtapes_SC()).replace('[','{').replace(']','}'),
-            'emin':min(self.getWtapes_Isolation()),
+            'emin':min(self._column('wtapes_isolation')),
             'xmin':xmin,
             'rmin':rmin,
             'rmax':rmax,
@@ -1110,7 +1367,7 @@ class HTSinsert:
         
         # print("geofile:", geofile)
         geofilename = name + "_hts_axi.geo"
-        with open(geofilename, "x") as f:
+        with open(repository.output(geofilename), "x") as f:
             f.write(geofile)
 
         return
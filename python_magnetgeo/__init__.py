@@ -4,4 +4,10 @@ __author__ = """Christophe Trophime"""
 __email__ = 'christophe.trophime@lncmi.cnrs.fr'
 __version__ = '0.1.0'
 
+import logging
+
+# diagnostics are emitted through the python_magnetgeo.* loggers,
+# applications choose where they go (see cli --verbose/--debug)
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
 from .python_magnetgeo import *
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+#-*- coding:utf-8 -*-
+
+"""
+Provides a batch mode for the cli: many files processed by a pool of workers
+
+    python -m python_magnetgeo.cli batch [options] FILE|GLOB ... [--manifest LIST]
+
+Files are given by name, by glob pattern (matched in wd) or listed in
+manifests (one file per line, # starts a comment). Each file is processed
+as by the cli with the same options (see cli.run).
+
+Workers are started once and process several files: python, the parts
+modules and gmsh are loaded once per worker, the part repository of a
+worker keeps helices and rings shared by several magnets parsed, and
+its gmsh session is cleared (not finalized) from one file to the next.
+A summary table of timings (total and per phase) and outputs is printed
+at the end.
+"""
+
+import os
+import sys
+import copy
+import glob
+import json
+import time
+import logging
+import argparse
+import traceback
+
+from . import cli
+from . import repository
+from . import profiling
+
+logger = logging.getLogger(__name__)
+
+# phases recorded by cli.run, in order
+PHASES = ["load", "geo", "structured", "build", "bcs", "mesh"]
+
+def expand(patterns: list, manifests: list = None, wd: str = None) -> list:
+    """
+    returns the files given by names, glob patterns (matched in wd)
+    and manifests, in order and without duplicates
+    """
+    items = list(patterns)
+    for manifest in manifests or []:
+        with open(manifest, 'r') as f:
+            for line in f:
+                line = line.split('#')[0].strip()
+                if line:
+                    items.append(line)
+
+    files = []
+    for item in items:
+        if glob.has_magic(item):
+            root = wd or os.curdir
+            matches = sorted(os.path.relpath(path, root) for path in glob.glob(os.path.join(root, item)))
+            if not matches:
+                logger.warning("batch: no file matching %s in %s", item, root)
+            files += matches
+        else:
+            files.append(item)
+    return list(dict.fromkeys(files))
+
+# state of a worker (set by _init)
+_args = None
+_dirs = []
+
+def _init(args, dirs: list, level: int):
+    """
+    initialize a worker
+    """
+    global _args, _dirs
+    _args = args
+    _dirs = dirs
+    logging.basicConfig(format="%(levelname)s:%(name)s: %(message)s", level=level)
+
+def job(args, dirs: list = None, collect=None) -> dict:
+    """
+    process args.filename as cli.run does, in a gmsh session kept open,
+    searching parts in dirs
+
+    collect: function called before the gmsh model is cleared,
+    its result (a dict) is added to the summary
+
+    returns the summary of the job
+    """
+    if args.gmsh_api:
+        import gmsh
+        if not gmsh.isInitialized():
+            gmsh.initialize()
+            gmsh.option.setNumber("General.Terminal", int(args.verbose or args.debug))
+
+    profiling.reset()
+    profiling.enable(gmsh_hooks=False)
+    status = "ok"
+    outputs = []
+    results = {}
+    start = time.perf_counter()
+    try:
+        with repository.roots(*(dirs or [])):
+            outputs = cli.run(args)
+            if collect is not None:
+                results = collect()
+    except (Exception, SystemExit) as e:
+        status = "error: %s" % (e or type(e).__name__)
+        logger.debug("batch: %s failed\n%s", args.filename, traceback.format_exc())
+    finally:
+        elapsed = time.perf_counter() - start
+        profiling.phase(None)
+        profiling.disable()
+        if args.gmsh_api:
+            gmsh.clear()
+
+    timers = profiling.report()['timers']
+    summary = {
+        'file': args.filename,
+        'status': status,
+        'time': elapsed,
+        'phases': {key: timers[key]['time'] for key in PHASES if key in timers},
+        'outputs': outputs,
+        'pid': os.getpid()
+    }
+    summary.update(results)
+    return summary
+
+def _process(filename: str) -> dict:
+    """
+    process filename in a worker
+    """
+    args = copy.copy(_args)
+    args.filename = filename
+    return job(args, _dirs)
+
+def process(files: list, args, workers: int = 0) -> list:
+    """
+    process files with args in a pool of workers (0: one per core)
+
+    returns the summary of each job (in files order)
+    """
+    import multiprocessing
+
+    if args.processes:
+        # pool workers cannot start processes of their own
+        logger.warning("batch: --processes is ignored, magnets are built by the batch workers")
+    args = copy.copy(args)
+    args.processes = None
+    args.show = False
+
+    if not workers:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(files)))
+    dirs = [os.path.abspath(d) for d in [args.wd] + args.path if d]
+    initargs = (args, dirs, logging.getLogger().getEffectiveLevel())
+
+    if workers == 1:
+        _init(*initargs)
+        try:
+            return [_process(filename) for filename in files]
+        finally:
+            if args.gmsh_api:
+                import gmsh
+                if gmsh.isInitialized():
+                    gmsh.finalize()
+
+    # spawn: workers shall not inherit the gmsh state of this process
+    with multiprocessing.get_context("spawn").Pool(workers, initializer=_init, initargs=initargs) as pool:
+        return list(pool.imap(_process, files, chunksize=1))
+
+def table(results: list) -> str:
+    """
+    returns the summary table of results
+    """
+    phases = [key for key in PHASES if any(key in result['phases'] for result in results)]
+    header = ["file", "status", "time"] + phases + ["outputs"]
+    rows = []
+    for result in results:
+        rows.append([result['file'], result['status'], "%.3f" % result['time']] +
+                    ["%.3f" % result['phases'][key] if key in result['phases'] else "-" for key in phases] +
+                    [" ".join(os.path.basename(output) for output in result['outputs'])])
+
+    widths = [max(len(row[i]) for row in [header] + rows) for i in range(len(header) - 1)]
+    lines = []
+    for row in [header] + rows:
+        lines.append("  ".join(cell.ljust(width) for cell, width in zip(row, widths)) + "  " + row[-1])
+    return "\n".join(line.rstrip() for line in lines)
+
+def main(argv: list = None):
+    """
+    batch mode of the cli
+    """
+    parser = argparse.ArgumentParser(prog="python_magnetgeo.cli batch")
+    parser.add_argument("files", help="names or glob patterns (matched in wd) of the models to be loaded", type=str, nargs='*')
+    parser.add_argument("--manifest", help="file listing the models to be loaded, one per line", type=str, action='append', default=[])
+    parser.add_argument("--workers", help="number of worker processes (0: one per core)", type=int, default=0)
+    parser.add_argument("--summary", help="save the summary as json", type=str)
+    cli.add_arguments(parser)
+    parser.add_argument("--verbose", help="activate verbose", action='store_true')
+    parser.add_argument("--debug", help="activate debug", action='store_true')
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(format="%(levelname)s:%(name)s: %(message)s",
+                        level=logging.DEBUG if args.debug else logging.INFO if args.verbose else logging.WARNING)
+
+    files = expand(args.files, args.manifest, args.wd)
+    if not files:
+        parser.error("no file to process")
+
+    start = time.perf_counter()
+    results = process(files, args, args.workers)
+    elapsed = time.perf_counter() - start
+
+    print(table(results))
+    failed = [result for result in results if result['status'] != "ok"]
+    print("%d files (%d failed) processed by %d workers in %.3f s (%.3f s of jobs)" %
+          (len(results), len(failed), len(set(result['pid'] for result in results)),
+           elapsed, sum(result['time'] for result in results)))
+
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump({'time': elapsed, 'jobs': results}, f, indent=4)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())  # pragma: no cover
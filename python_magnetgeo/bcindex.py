@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+#-*- coding:utf-8 -*-
+
+"""
+Provides an index for boundary conditions tagging in gmsh
+
+gmsh.model.getEntitiesInBoundingBox scans all the entities of the model
+for each query and gmsh.model.addPhysicalGroup looks for a free tag
+among all the existing groups: both are quadratic for large models.
+
+BCIndex fetches the bounding boxes of all the entities of a dimension
+once (on the first query) and answers the queries with numpy; it also
+allocates the tags of new physical groups.
+
+Builders return the tags of the rectangles they created (remapped
+through fragment maps), so boundary curves are derived from the
+topology rather than searched in boxes: getSideCurves returns the
+curves bounding a set of surfaces that lie on one side (r0, r1, z0 or
+z1) of their bounding rectangle. Curves are classified with a tolerance
+relative to the size of the rectangle, whatever the sign of its
+coordinates.
+
+gmsh_bcs methods run within indexed() and use the functions of this
+module: they use the active index, or query gmsh for the entities at
+hand when there is none (eg. with use_index = False). Nested gmsh_bcs calls share the index of the outermost one. The
+geometry must not be changed while an index is active.
+
+Bounding boxes are always computed from the tessellation
+(Geometry.OCCBoundsUseStl, as gmsh_bcs used to set it), with or
+without index, so both give the same entities; the user setting of the
+option is restored after each query.
+"""
+
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+# set to False to query gmsh for the entities at hand only (no index)
+use_index = True
+
+SIDES = ['r0', 'r1', 'z0', 'z1']
+
+_local = threading.local()
+
+def _sides(curves: list, boxes: np.ndarray, side: str, lo: float = None, hi: float = None,
+           eps: float = 1.e-6) -> list:
+    """
+    returns the curves (with bounding boxes boxes) that lie on side
+    of their bounding rectangle, see BCIndex.getSideCurves
+    """
+    if not curves:
+        return []
+
+    (xmin, ymin) = boxes[:,0:2].min(axis=0)
+    (xmax, ymax) = boxes[:,3:5].max(axis=0)
+    tol = eps * max(xmax-xmin, ymax-ymin, 1.)
+    if side == 'r0':
+        (on, u) = (boxes[:,3] <= xmin + tol, 1)
+    elif side == 'r1':
+        (on, u) = (boxes[:,0] >= xmax - tol, 1)
+    elif side == 'z0':
+        (on, u) = (boxes[:,4] <= ymin + tol, 0)
+    else:
+        (on, u) = (boxes[:,1] >= ymax - tol, 0)
+
+    # range along the side: z for r sides, r for z sides
+    if lo is not None:
+        on &= boxes[:,u] >= lo - tol
+    if hi is not None:
+        on &= boxes[:,u+3] <= hi + tol
+    return [tag for tag, keep in zip(curves, on.tolist()) if keep]
+
+@contextmanager
+def _tight_bounds():
+    """
+    compute bounding boxes from the tessellation in the enclosed block
+    """
+    import gmsh
+
+    stl = gmsh.option.getNumber("Geometry.OCCBoundsUseStl")
+    gmsh.option.setNumber("Geometry.OCCBoundsUseStl", 1)
+    try:
+        yield
+    finally:
+        gmsh.option.setNumber("Geometry.OCCBoundsUseStl", stl)
+
+class BCIndex:
+    """
+    dim : dimension of indexed entities
+    tags :
+    boxes : bounding boxes (xmin, ymin, zmin, xmax, ymax, zmax) of entities
+    """
+
+    def __init__(self, dim: int = 1):
+        """
+        initialize index (entities are fetched on first query)
+        """
+        self.dim = dim
+        self.tags = None
+        self.boxes = None
+        self._xmin = None
+        self._order = None
+        self._rows = None
+        self._boundaries = {}
+        self._next = None
+
+    def __repr__(self):
+        return "%s(dim=%r, entities=%r)" % \
+               (self.__class__.__name__,
+                self.dim,
+                None if self.tags is None else len(self.tags))
+
+    def _fetch(self):
+        """
+        fetch the bounding boxes of all entities of dim
+        """
+        import gmsh
+
+        with _tight_bounds():
+            entities = gmsh.model.getEntities(self.dim)
+            self.tags = np.array([tag for (dim, tag) in entities], dtype=int)
+            self.boxes = np.array([gmsh.model.getBoundingBox(dim, tag) for (dim, tag) in entities],
+                                  dtype=float).reshape(-1, 6)
+
+        # sort by xmin for range queries
+        self._order = np.argsort(self.boxes[:,0], kind='stable')
+        self._xmin = self.boxes[self._order, 0]
+        self._rows = {tag: row for row, tag in enumerate(self.tags.tolist())}
+
+    def getEntitiesInBoundingBox(self, xmin: float, ymin: float, zmin: float,
+                                 xmax: float, ymax: float, zmax: float) -> list:
+        """
+        returns the entities (dim, tag) whose bounding box is inside the box
+        (in the same order as gmsh.model.getEntitiesInBoundingBox)
+        """
+        if self.tags is None:
+            self._fetch()
+
+        lo = np.searchsorted(self._xmin, xmin, side='left')
+        hi = np.searchsorted(self._xmin, xmax, side='right')
+        candidates = self._order[lo:hi]
+        boxes = self.boxes[candidates]
+        inside = (boxes[:,1] >= ymin) & (boxes[:,2] >= zmin) \
+            & (boxes[:,3] <= xmax) & (boxes[:,4] <= ymax) & (boxes[:,5] <= zmax)
+        found = np.sort(candidates[inside])
+        return [(self.dim, tag) for tag in self.tags[found].tolist()]
+
+    def getBoundary(self, surface: int) -> list:
+        """
+        returns the tags of the curves bounding surface
+        """
+        import gmsh
+
+        if surface not in self._boundaries:
+            self._boundaries[surface] = [tag for (dim, tag) in gmsh.model.getBoundary([(2, surface)], combined=False, oriented=False)]
+        return self._boundaries[surface]
+
+    def getSideCurves(self, surfaces: list, side: str, lo: float = None, hi: float = None,
+                      eps: float = 1.e-6) -> list:
+        """
+        returns the tags of the curves bounding surfaces that lie on side
+        (r0, r1, z0 or z1) of their bounding rectangle, optionally
+        restricted to [lo, hi] along the side
+        """
+        if side not in SIDES:
+            raise Exception("bcindex: unexpected side %s (valid values are: %s)" % (side, SIDES))
+        if self.dim != 1:
+            raise Exception("bcindex: getSideCurves requires an index of curves (dim=%d)" % self.dim)
+        if self.tags is None:
+            self._fetch()
+
+        curves = sorted(set(tag for surface in surfaces for tag in self.getBoundary(surface)))
+        return _sides(curves, self.boxes[[self._rows[tag] for tag in curves]], side, lo, hi, eps)
+
+    def addPhysicalGroup(self, dim: int, tags: list, name: str = None) -> int:
+        """
+        create a physical group (named name if given) with a new tag
+
+        returns the tag of the group
+        """
+        import gmsh
+
+        # same numbering as gmsh: after the largest tag of all dimensions
+        if self._next is None:
+            self._next = max([ptag for (pdim, ptag) in gmsh.model.getPhysicalGroups()], default=0) + 1
+        tag = self._next
+        self._next += 1
+
+        gmsh.model.addPhysicalGroup(dim, tags, tag)
+        if name is not None:
+            gmsh.model.setPhysicalName(dim, tag, name)
+        return tag
+
+def active():
+    """
+    returns the active index (or None)
+    """
+    return getattr(_local, 'index', None)
+
+@contextmanager
+def indexed(dim: int = 1):
+    """
+    activate an index of the entities of dim for the enclosed block,
+    reuse the active one if any (can also be used as a decorator)
+    """
+    if not use_index or active() is not None:
+        yield active()
+        return
+
+    _local.index = BCIndex(dim)
+    try:
+        yield _local.index
+    finally:
+        _local.index = None
+
+def getEntitiesInBoundingBox(xmin: float, ymin: float, zmin: float,
+                             xmax: float, ymax: float, zmax: float, dim: int = -1) -> list:
+    """
+    same as gmsh.model.getEntitiesInBoundingBox (with tight bounds),
+    using the active index if any
+    """
+    index = active()
+    if index is not None and index.dim == dim:
+        return index.getEntitiesInBoundingBox(xmin, ymin, zmin, xmax, ymax, zmax)
+
+    import gmsh
+    with _tight_bounds():
+        return gmsh.model.getEntitiesInBoundingBox(xmin, ymin, zmin, xmax, ymax, zmax, dim)
+
+def getSideCurves(surfaces: list, side: str, lo: float = None, hi: float = None) -> list:
+    """
+    returns the tags of the curves bounding surfaces on side (r0, r1, z0 or z1)
+    of their bounding rectangle, see BCIndex.getSideCurves
+    """
+    index = active()
+    if index is not None and index.dim == 1:
+        return index.getSideCurves(surfaces, side, lo, hi)
+
+    # no index: boundaries and boxes of these surfaces only
+    import gmsh
+
+    if side not in SIDES:
+        raise Exception("bcindex: unexpected side %s (valid values are: %s)" % (side, SIDES))
+    curves = sorted(set(tag for surface in surfaces
+                        for (dim, tag) in gmsh.model.getBoundary([(2, surface)], combined=False, oriented=False)))
+    with _tight_bounds():
+        boxes = np.array([gmsh.model.getBoundingBox(1, tag) for tag in curves], dtype=float).reshape(-1, 6)
+    return _sides(curves, boxes, side, lo, hi)
+
+def getAirCurves(surfaces: list) -> tuple:
+    """
+    returns the tags of the curves bounding air surfaces
+    on the axis (r0 side) and at infinity (other sides)
+    """
+    axis = getSideCurves(surfaces, 'r0')
+    inf = []
+    for side in ['z0', 'r1', 'z1']:
+        inf += getSideCurves(surfaces, side)
+    return (axis, inf)
+
+def addPhysicalGroup(dim: int, tags: list, name: str = None) -> int:
+    """
+    same as gmsh.model.addPhysicalGroup (and setPhysicalName if name is given),
+    using the active index to allocate the tag if any
+    """
+    index = active()
+    if index is not None:
+        return index.addPhysicalGroup(dim, tags, name)
+
+    import gmsh
+    tag = gmsh.model.addPhysicalGroup(dim, tags)
+    if name is not None:
+        gmsh.model.setPhysicalName(dim, tag, name)
+    return tag
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+#-*- coding:utf-8 -*-
+
+"""
+Provides a content-addressed BREP cache for gmsh builders
+
+Builders decorated with cached() (Helix, Bitter, Supra, HTSinsert,
+Insert, MSite) are keyed by a fingerprint of their part: public attributes of
+the part, contents of the parts it references (eg. helices and rings of
+an Insert, struct file of a Supra), builder arguments, gmsh version,
+package version and sources (any change of a builder, or of the helpers
+it calls, gives new keys). When the cache is enabled:
+
+* on a miss, the part is built in a temporary gmsh model, saved as
+  key.brep in the cache directory (with key.json holding the returned
+  ids, the tags and bounding boxes of the surfaces) and imported
+* on a hit, key.brep is imported in the current model and the ids are
+  remapped to the imported surfaces
+
+Assemblies compose cached pieces: an Insert missing from the cache is
+built from cached helices, an MSite from cached magnets, so changing a
+helix only rebuilds this helix and the Insert holding it.
+
+Builds with air are not cached (air is fragmented with the whole
+assembly and air data are not tags). Entries are never modified, a
+changed part gets a new key: remove the directory to reclaim space.
+"""
+
+import os
+import json
+import hashlib
+import logging
+import functools
+import inspect
+import tempfile
+
+import numpy as np
+
+from . import profiling
+
+logger = logging.getLogger(__name__)
+
+FORMAT = 1
+
+_directory = None
+
+def enable(directory: str):
+    """
+    cache builds in directory (created if needed)
+    """
+    global _directory
+    os.makedirs(directory, exist_ok=True)
+    _directory = os.path.abspath(directory)
+
+def disable():
+    """
+    stop caching builds
+    """
+    global _directory
+    _directory = None
+
+def enabled() -> str:
+    """
+    returns the cache directory (None if the cache is disabled)
+    """
+    return _directory
+
+def _canonical(obj):
+    """
+    returns obj as plain json data (private attributes hold derived data)
+    """
+    if isinstance(obj, dict):
+        return {str(key): _canonical(value) for key, value in sorted(obj.items())}
+    if isinstance(obj, (list, tuple)):
+        return [_canonical(value) for value in obj]
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if hasattr(obj, '__dict__'):
+        data = {key: value for key, value in vars(obj).items() if not key.startswith('_')}
+        return {'__classname__': type(obj).__name__, 'data': _canonical(data)}
+    return obj
+
+def _digest(filename: str) -> str:
+    with open(filename, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _content(part) -> dict:
+    """
+    returns the data the geometry of part depends on
+    """
+    from . import compiled
+    from . import repository
+
+    content = {'part': _canonical(part)}
+    names = compiled.references(part)
+    if names:
+        content['parts'] = {name: _content(repository.load(name)) for name in names}
+    struct = getattr(part, 'struct', None)
+    if struct:
+        content['struct'] = _digest(repository.resolve(struct))
+    return content
+
+@functools.lru_cache(maxsize=None)
+def _code() -> str:
+    """
+    returns the version and a digest of the sources of the package
+    (builders call helpers of other modules, eg. Insert.gmsh builds rings)
+    """
+    from . import __version__
+
+    package = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+    for filename in sorted(os.listdir(package)):
+        if filename.endswith('.py'):
+            digest.update(filename.encode())
+            with open(os.path.join(package, filename), 'rb') as f:
+                digest.update(f.read())
+    return "%s-%s" % (__version__, digest.hexdigest())
+
+def fingerprint(part, args: dict = None) -> str:
+    """
+    returns the cache key of part built with args
+    """
+    import gmsh
+
+    data = {'format': FORMAT, 'gmsh': gmsh.__version__, 'code': _code(), 'builder': type(part).__name__,
+            'args': _canonical(args or {}), 'content': _content(part)}
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+def _name(part) -> str:
+    return getattr(part, 'name', type(part).__name__)
+
+def _flatten(item):
+    if isinstance(item, (list, tuple)):
+        for i in item:
+            yield from _flatten(i)
+    elif isinstance(item, int):
+        yield item
+
+def remap(item, tags: dict):
+    """
+    returns gmsh ids (nested tuples and lists) with tags replaced
+    """
+    if isinstance(item, list):
+        return [remap(i, tags) for i in item]
+    if isinstance(item, tuple):
+        return tuple(remap(i, tags) for i in item)
+    if isinstance(item, int):
+        return tags[item]
+    return item
+
+def _restore(item):
+    """
+    returns ids as built from their json form (where tuples are lists)
+    """
+    if isinstance(item, dict):
+        if 'tuple' in item:
+            return tuple(_restore(i) for i in item['tuple'])
+        return [_restore(i) for i in item['list']]
+    return item
+
+def _store(item):
+    if isinstance(item, tuple):
+        return {'tuple': [_store(i) for i in item]}
+    if isinstance(item, list):
+        return {'list': [_store(i) for i in item]}
+    return item
+
+def import_shapes(filename: str, ids, surfaces: list, boxes: list, name: str = ""):
+    """
+    import filename in the current model and check that its surfaces
+    match the saved ones (same order, same bounding boxes)
+
+    returns ids remapped to the imported surfaces
+    """
+    import gmsh
+
+    tags = [tag for (dim, tag) in gmsh.model.occ.importShapes(filename) if dim == 2]
+    if len(tags) != len(surfaces):
+        raise Exception("brepcache: %s: %d surfaces imported, expected %d" % (name, len(tags), len(surfaces)))
+    for (tag, box) in zip(tags, boxes):
+        if not np.allclose(gmsh.model.occ.getBoundingBox(2, tag), box, rtol=1.e-9, atol=1.e-6):
+            raise Exception("brepcache: %s: imported surface %d does not match" % (name, tag))
+    return remap(ids, dict(zip(surfaces, tags)))
+
+def _build(key: str, func, part, args, kwargs):
+    """
+    build part in a temporary model and save it in the cache
+    """
+    import gmsh
+
+    current = gmsh.model.getCurrent()
+    gmsh.model.add("brepcache-%s" % key)
+    try:
+        ids = func(part, *args, **kwargs)
+        gmsh.model.occ.synchronize()
+        surfaces = [tag for (dim, tag) in gmsh.model.getEntities(2)]
+        boxes = [gmsh.model.occ.getBoundingBox(2, tag) for tag in surfaces]
+        if not set(_flatten(ids)) <= set(surfaces):
+            raise Exception("brepcache: %s: ids are not surfaces" % _name(part))
+
+        # write then rename: other processes may use the same directory
+        (fd, tmpname) = tempfile.mkstemp(suffix=".brep", dir=_directory)
+        os.close(fd)
+        gmsh.write(tmpname)
+        os.replace(tmpname, os.path.join(_directory, key + ".brep"))
+        (fd, tmpname) = tempfile.mkstemp(suffix=".json", dir=_directory)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'name': _name(part), 'ids': _store(ids), 'surfaces': surfaces, 'boxes': boxes}, f)
+        os.replace(tmpname, os.path.join(_directory, key + ".json"))
+    finally:
+        gmsh.model.remove()
+        gmsh.model.setCurrent(current)
+
+def cached(exclude: tuple = ('debug',)):
+    """
+    decorator caching the gmsh builds of a part (see module doc)
+    (arguments in exclude do not change the geometry)
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(part, *args, **kwargs):
+            if _directory is None:
+                return func(part, *args, **kwargs)
+            bound = signature.bind(part, *args, **kwargs)
+            bound.apply_defaults()
+            if bound.arguments.get('Air'):
+                return func(part, *args, **kwargs)
+
+            key = fingerprint(part, {name: value for (name, value) in list(bound.arguments.items())[1:] if name not in exclude})
+            filename = os.path.join(_directory, key)
+            if not os.path.isfile(filename + ".json"):
+                profiling.count("brepcache.misses")
+                logger.debug("brepcache: build %s (%s)", _name(part), key)
+                _build(key, func, part, args, kwargs)
+            else:
+                profiling.count("brepcache.hits")
+
+            with open(filename + ".json", 'r') as f:
+                entry = json.load(f)
+            return import_shapes(filename + ".brep", _restore(entry['ids']), entry['surfaces'], entry['boxes'], _name(part))
+        return wrapper
+    return decorator
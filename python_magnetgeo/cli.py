@@ -1,101 +1,180 @@
 """Console script for python_magnetgeo."""
+import logging
 import argparse
 import sys
 import os
 import yaml
 
 from . import Insert
+from .MSite import MSite
 from . import SupraStructure
+from . import repository
+from . import compiled
+from . import profiling
+from . import meshing
+from . import brepcache
 
-def main():
-    """Console script for python_magnetgeo."""
-    parser = argparse.ArgumentParser()
-    
-    parser.add_argument("filename", help="name of the model to be loaded", type=str, nargs='?' )
-    parser.add_argument("--tojson", help="convert to json", action='store_true')
-    
-    parser.add_argument("--wd", help="set a working directory", type=str, default="data")
-    parser.add_argument("--air", help="activate air generation", action="store_true")
-    parser.add_argument("--gmsh", help="save to gmsh geofile", action="store_true")
-    parser.add_argument("--gmsh_api", help="use gmsh api to create geofile", action="store_true")
-    parser.add_argument("--mesh", help="create gmsh mesh ", action="store_true")
-    parser.add_argument("--detail", help="select representation mode of HTS", choices=['None', 'dblepancake', 'pancake', 'tape'], default='None')
-    parser.add_argument("--show", help="display gmsh geofile when api is on", action="store_true")
-    
-    args = parser.parse_args()
+logger = logging.getLogger(__name__)
 
-    print("Arguments: " + str(args))
-    
-    cwd = os.getcwd()
-    if args.wd:
-        os.chdir(args.wd)
+def run(args) -> list:
+    """
+    load args.filename and process it as requested by args
 
+    returns the files written
+    """
     # TODO extract extension
     (name, ext) = args.filename.split(".")
-    print(name, ext)
+    logger.info("%s %s", name, ext)
 
     site = None
+    profiling.phase("load")
     if ext == "yaml":
-        with open(args.filename, 'r') as f:
-            site = yaml.load(f, Loader=yaml.FullLoader)
-            print("site=",site)
+        if args.compile:
+            site = compiled.load(args.filename)
+        else:
+            site = repository.load(args.filename)
+        logger.info("site= %s", site)
 
     elif ext == "json":
-        with open(args.filename, 'r') as f:
-            site = SupraStructure.HTSinsert()
-            site.loadCfg(args.filename)
-
-            print("HTS insert: ", "R0=%g m" % site.getR0(), 
-                  "R1=%g m" % site.getR1(), 
-                  "Z0=%g" % (site.getZ0()-site.getH()/2.),
-                  "Z1=%g" % (site.getZ0()+site.getH()/2.))
+        site = SupraStructure.HTSinsert()
+        site.loadCfg(args.filename)
+
+        logger.info("HTS insert:  R0=%g m R1=%g m Z0=%g Z1=%g", site.getR0(), site.getR1(), site.getZ0()-site.getH()/2., site.getZ0()+site.getH()/2.)
     else:
-        print("unsupported extension: %s" % ext)
+        logger.error("unsupported extension: %s", ext)
         sys.exit(1)
 
+    outputs = []
     if args.tojson:
         if not isinstance(site, SupraStructure.HTSinsert):
             site.write_to_json()
+            outputs.append(repository.output(site.name + ".json"))
 
     if args.gmsh:
+        profiling.phase("geo")
         if isinstance(site, Insert):
             site.Create_AxiGeo(args.air)
+            outputs.append(repository.output(site.name + "_axi.geo"))
         if isinstance(site, SupraStructure.HTSinsert):
             site.template_gmsh(name, args.detail)
+            outputs.append(repository.output(name + "_hts_axi.geo"))
     
+    if args.structured:
+        profiling.phase("structured")
+        if isinstance(site, SupraStructure.HTSinsert):
+            from . import htsmesh
+            (nodes, groups) = htsmesh.mesh(site, args.detail, args.air)
+            profiling.count("mesh.nodes", len(nodes))
+            htsmesh.write(repository.output(name + ".msh"), nodes, groups)
+            outputs.append(repository.output(name + ".msh"))
+        else:
+            logger.warning("structured mesh only available for HTS insert")
+
     if args.gmsh_api:
         import gmsh
-        gmsh.initialize()
+        # batch workers keep their gmsh session from one file to the next
+        session = gmsh.isInitialized()
+        if not session:
+            gmsh.initialize()
         gmsh.model.add(name)
         gmsh.logger.start()
+        if args.brep_cache:
+            brepcache.enable(args.brep_cache)
+        else:
+            brepcache.disable()
 
-        if not isinstance(site, SupraStructure.HTSinsert):
+        profiling.phase("build")
+        if isinstance(site, Insert):
+            ids = site.gmsh(args.air, batch=args.batch)
+        elif isinstance(site, MSite):
+            ids = site.gmsh(args.air, processes=args.processes)
+        elif not isinstance(site, SupraStructure.HTSinsert):
             ids = site.gmsh(args.air)
         else:
             ids = site.gmsh(args.detail, args.air)
         gmsh.model.occ.synchronize()
 
         # TODO create Physical here
+        profiling.phase("bcs")
         if not isinstance(site, SupraStructure.HTSinsert):
             site.gmsh_bcs(ids)
         else:
             site.gmsh_bcs(args.detail, ids)
         # TODO set mesh characteristics here
         if args.mesh:
+            profiling.phase("mesh")
+            meshing.set_threads(args.threads, args.threads2d, args.threads3d)
             gmsh.model.mesh.generate(2)
-            gmsh.write(name + ".msh")        
+            if profiling.enabled():
+                profiling.count("mesh.nodes", len(gmsh.model.mesh.getNodes()[0]))
+            gmsh.write(repository.output(name + ".msh"))
+            outputs.append(repository.output(name + ".msh"))
 
+        profiling.phase(None)
         log = gmsh.logger.get()
-        print("Logger has recorded " + str(len(log)) + " lines")
+        logger.info("Logger has recorded %d lines", len(log))
         gmsh.logger.stop()
         # Launch the GUI to see the results:
         if args.show:
             gmsh.fltk.run()
-        gmsh.finalize()
+        if not session:
+            gmsh.finalize()
+
+    return outputs
+
+def add_arguments(parser):
+    """
+    add the processing options (shared with the batch mode) to an argparse parser
+    """
+    parser.add_argument("--tojson", help="convert to json", action='store_true')
+    parser.add_argument("--compile", help="load yaml model from a compiled snapshot (created or updated if needed)", action='store_true')
+    
+    parser.add_argument("--wd", help="set a working directory (parts are searched and outputs written there)", type=str, default="data")
+    parser.add_argument("--path", help="add a directory where parts are searched (after wd)", type=str, action='append', default=[])
+    parser.add_argument("--air", help="activate air generation", action="store_true")
+    parser.add_argument("--gmsh", help="save to gmsh geofile", action="store_true")
+    parser.add_argument("--gmsh_api", help="use gmsh api to create geofile", action="store_true")
+    parser.add_argument("--mesh", help="create gmsh mesh ", action="store_true")
+    parser.add_argument("--structured", help="create a structured mesh for HTS (without gmsh)", action="store_true")
+    parser.add_argument("--detail", help="select representation mode of HTS", choices=['None', 'dblepancake', 'pancake', 'tape'], default='None')
+    parser.add_argument("--batch", help="fragment Insert geometry once (gmsh api)", action="store_true")
+    parser.add_argument("--brep-cache", help="cache the magnets and parts built by gmsh api as BREP in this directory", type=str, metavar='DIR')
+    parser.add_argument("--processes", help="build the magnets of a site in a pool of processes (gmsh api, 0: one per core)", type=int)
+    parser.add_argument("--show", help="display gmsh geofile when api is on", action="store_true")
+    meshing.add_arguments(parser)
 
-    if args.wd:
-        os.chdir(cwd)
+def main(argv: list = None):
+    """Console script for python_magnetgeo."""
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] == "batch":
+        from . import batch
+        return batch.main(argv[1:])
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("filename", help="name of the model to be loaded (or batch to process many files, see batch -h)", type=str, nargs='?' )
+    add_arguments(parser)
+    parser.add_argument("--verbose", help="activate verbose", action='store_true')
+    parser.add_argument("--debug", help="activate debug", action='store_true')
+    parser.add_argument("--profile", help="save timers and counters as json in FILE (- for stdout)", type=str, metavar='FILE')
+    
+    args = parser.parse_args(argv)
+    if not args.filename:
+        parser.error("the following arguments are required: filename")
+    logging.basicConfig(format="%(levelname)s:%(name)s: %(message)s",
+                        level=logging.DEBUG if args.debug else logging.INFO if args.verbose else logging.WARNING)
+
+    logger.info("Arguments: %s", args)
+    if args.profile:
+        profiling.enable(gmsh_hooks=args.gmsh_api)
+    
+    # parts are searched in wd, then in path: the current directory is left unchanged
+    with repository.roots(args.wd, *args.path):
+        run(args)
 
+    if args.profile:
+        profiling.disable()
+        profiling.dump(args.profile)
     return 0
 
 
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+#-*- coding:utf-8 -*-
+
+"""
+Provides compiled snapshots of magnet assemblies
+
+An Insert or MSite references its parts by name, so loading it means
+reading and parsing one yaml file per Helix, Ring, CurrentLead...
+build() resolves the whole tree once and stores it in a single
+binary file (name.mgc, next to name.yaml):
+
+* header: magic, format version, marshal version, sha256 of all inputs
+* payload: marshal data holding the parts as plain dicts and lists
+  together with size, mtime and sha256 of every input file
+
+load() reuses the snapshot as long as every input is unchanged
+(same size and mtime, or same content) and builds it again otherwise.
+When only mtimes changed (eg. after a checkout), the stored mtimes are
+refreshed so that inputs are not hashed again on every load. The
+restored parts are added to the part repository.
+"""
+
+import os
+import marshal
+import hashlib
+import struct
+
+from . import deserialize
+from . import repository
+
+MAGIC = b'MGEO'
+FORMAT = 1
+_header = struct.Struct('<4sHH32s')
+
+def snapshot_path(name: str) -> str:
+    """
+    returns the path of the compiled snapshot for name
+    """
+    path = repository.get_repository().path(name)
+    return path[:-len('.yaml')] + '.mgc'
+
+def references(part) -> list:
+    """
+    returns the names of the parts referenced by part
+    """
+    from .Insert import Insert
+    from .MSite import MSite
+
+    if isinstance(part, Insert):
+        return list(part.Helices or []) + list(part.Rings or []) + list(part.CurrentLeads or [])
+
+    if isinstance(part, MSite):
+        return part.get_magnets()
+    return []
+
+def _digest(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).digest()
+
+def _write(name: str, data: dict):
+    """
+    write the snapshot data of name
+    """
+    checksum = hashlib.sha256(b''.join(digest for (path, size, mtime, digest) in data['inputs'])).digest()
+    payload = marshal.dumps(data)
+    with open(snapshot_path(name), 'wb') as f:
+        f.write(_header.pack(MAGIC, FORMAT, marshal.version, checksum))
+        f.write(payload)
+
+def build(name: str, write: bool = True):
+    """
+    resolve name and all the parts it references,
+    write the snapshot if write is True
+
+    returns the part stored in name.yaml
+    """
+    repo = repository.get_repository()
+
+    parts = {}
+    inputs = []
+    todo = [name]
+    while todo:
+        pname = todo.pop(0)
+        path = repo.path(pname)
+        if path in parts:
+            continue
+
+        part = repo.load(pname)
+        stat = os.stat(path)
+        parts[path] = deserialize.to_builtin(part)
+        inputs.append((path, stat.st_size, stat.st_mtime_ns, _digest(path)))
+        todo += references(part)
+
+    if write:
+        _write(name, {'root': repo.path(name), 'parts': parts, 'inputs': inputs})
+
+    return repo.load(name)
+
+def read(name: str, refresh: bool = False):
+    """
+    read the snapshot of name
+    (and store the new mtimes of unchanged inputs if refresh is True)
+
+    returns the snapshot data, or None if it is missing, invalid or stale
+    """
+    try:
+        with open(snapshot_path(name), 'rb') as f:
+            header = f.read(_header.size)
+            payload = f.read()
+    except OSError:
+        return None
+
+    if len(header) != _header.size:
+        return None
+    (magic, version, marshal_version, checksum) = _header.unpack(header)
+    if magic != MAGIC or version != FORMAT or marshal_version != marshal.version:
+        return None
+
+    try:
+        data = marshal.loads(payload)
+    except (EOFError, ValueError, TypeError):
+        return None
+
+    inputs = data['inputs']
+    if hashlib.sha256(b''.join(input[3] for input in inputs)).digest() != checksum:
+        return None
+    touched = False
+    for (i, (path, size, mtime, digest)) in enumerate(inputs):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if (stat.st_size, stat.st_mtime_ns) == (size, mtime):
+            continue
+        if stat.st_size != size or _digest(path) != digest:
+            return None
+        inputs[i] = (path, size, stat.st_mtime_ns, digest)
+        touched = True
+
+    if touched and refresh:
+        _write(name, data)
+    return data
+
+def load(name: str, write: bool = True):
+    """
+    load name from its compiled snapshot when it is up to date,
+    otherwise compile it (and write the snapshot if write is True)
+
+    returns the part stored in name.yaml
+    """
+    data = read(name, refresh=write)
+    if data is None:
+        return build(name, write)
+
+    repo = repository.get_repository()
+    for path, part in data['parts'].items():
+        repo.add(path, deserialize.from_builtin(part))
+    return repo.load(data['root'])
@@ -3,10 +3,23 @@
 
 """
 Provides tools to un/serialize data from json
+
+to_json/from_json of every class use dumps/loads:
+* default output is pretty printed (sorted keys, indent=4)
+* compact output (no indent, no sort) is meant for machine consumption,
+  it uses orjson when available
+* iterloads decodes a stream of json documents (eg. one per line)
 """
 
 import json
 
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from . import Shape
 from . import ModelAxi
 from . import Model3D
@@ -21,6 +34,7 @@ from . import MSite
 
 # From : http://chimera.labs.oreilly.com/books/1230000000393/ch06.html#_discussion_95
 # Dictionary mapping names to known classes
+# (values are the modules holding the classes to avoid circular imports)
 
 classes = {
     'Shape' : Shape,
@@ -50,11 +64,130 @@ def unserialize_object(d):
     """
     clsname = d.pop('__classname__', None)
     if clsname:
-        cls = classes[clsname]
+        cls = getattr(classes[clsname], clsname)
         obj = cls.__new__(cls)   # Make instance without calling __init__
-        for key, value in d.items():
-            setattr(obj, key, value)
+        obj.__dict__.update(d)
         return obj
     else:
         return d
 
+# Dictionary mapping types to encoders (filled on first use for classes)
+def _identity(obj):
+    return obj
+
+def _encode_list(obj):
+    return [to_builtin(item) for item in obj]
+
+def _encode_dict(obj):
+    return {key: to_builtin(value) for key, value in obj.items()}
+
+_encoders = {
+    str: _identity,
+    int: _identity,
+    float: _identity,
+    bool: _identity,
+    type(None): _identity,
+    list: _encode_list,
+    tuple: _encode_list,
+    dict: _encode_dict
+}
+
+def _encode_numpy(obj):
+    return to_builtin(obj.tolist())
+
+# subclasses of these types are stored as the type itself
+_builtins = {
+    str: str,
+    int: int,
+    float: float,
+    list: _encode_list,
+    tuple: _encode_list,
+    dict: _encode_dict
+}
+
+def _encoder(cls):
+    """
+    create and register the encoder for cls
+    (numpy scalars and arrays are stored as python scalars and lists)
+    """
+    if issubclass(cls, (np.generic, np.ndarray)):
+        _encoders[cls] = _encode_numpy
+        return _encode_numpy
+    for base in cls.__mro__:
+        if base in _builtins:
+            _encoders[cls] = _builtins[base]
+            return _builtins[base]
+
+    clsname = cls.__name__
+    if clsname not in classes:
+        raise TypeError("Object of type %s is not JSON serializable" % clsname)
+
+    def encode(obj):
+        d = {'__classname__' : clsname}
+        for key, value in obj.__dict__.items():
+            d[key] = to_builtin(value)
+        return d
+
+    _encoders[cls] = encode
+    return encode
+
+def to_builtin(obj):
+    """
+    convert obj into a tree of dict, list and scalars
+    (objects are stored as dict with a __classname__ key)
+    """
+    encoder = _encoders.get(type(obj))
+    if encoder is None:
+        encoder = _encoder(type(obj))
+    return encoder(obj)
+
+def from_builtin(data):
+    """
+    rebuild objects from a tree created by to_builtin
+    """
+    if isinstance(data, list):
+        return [from_builtin(item) for item in data]
+    if isinstance(data, dict):
+        return unserialize_object({key: from_builtin(value) for key, value in data.items()})
+    return data
+
+def dumps(obj, compact: bool = False) -> str:
+    """
+    serialize obj to json
+    """
+    data = to_builtin(obj)
+    if not compact:
+        return json.dumps(data, sort_keys=True, indent=4)
+    if orjson is not None:
+        return orjson.dumps(data).decode('utf-8')
+    return json.dumps(data, separators=(',', ':'))
+
+def loads(string: str):
+    """
+    unserialize obj from json
+    """
+    return json.loads(string, object_hook=unserialize_object)
+
+def iterloads(stream, bufsize: int = 65536):
+    """
+    unserialize the json documents read from stream one after the other
+    """
+    decoder = json.JSONDecoder(object_hook=unserialize_object)
+    buffer = ''
+    while True:
+        chunk = stream.read(bufsize)
+        buffer += chunk
+        while True:
+            buffer = buffer.lstrip()
+            if not buffer:
+                break
+            try:
+                (obj, end) = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise
+                break
+            yield obj
+            buffer = buffer[end:]
+        if not chunk:
+            break
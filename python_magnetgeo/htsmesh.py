@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+#-*- coding:utf-8 -*-
+
+"""
+Provides a structured mesh generator for HTS inserts
+
+The layout of an HTSinsert (tapes, pancakes, isolations) is made of
+aligned rectangles in (r,z), so a tensor product grid built on all the
+r and z breaks gives a conforming mesh without any gmsh/OCC operation.
+
+mesh() returns the nodes and elements grouped with the physical names
+used by HTSinsert.gmsh_bcs, write() saves them in gmsh format
+(msh 4.1, ascii).
+"""
+
+import numpy as np
+from . import profiling
+
+# gmsh element types
+LINE = 1
+TRIANGLE = 2
+QUADRANGLE = 3
+
+def rectangles(insert, detail: str) -> tuple:
+    """
+    returns the names and the rectangles (x0, y0, dx, dy)
+    of the domains of insert for detail
+    """
+    y0 = insert.getZ0()-insert.getH()/2.
+
+    if detail == "None":
+        return (["Supra"], [(insert.getR0(), y0, insert.getR1()-insert.getR0(), insert.getH())])
+
+    if detail == "tape":
+        ([dp_ids, i_ids], rects) = insert._tape_rectangles()
+        names = [None] * len(rects)
+        for i, isol in enumerate(i_ids):
+            names[isol] = "isolation%d" % i
+        for i, dp in enumerate(dp_ids):
+            names[dp[1]] = "i_dp%d" % i
+            for j, (mandrin, tapes) in enumerate(dp[0]):
+                names[mandrin] = "mandrin_p%d_dp%d" % (j, i)
+                for l, (sc, du) in enumerate(tapes):
+                    names[sc] = "sc%d_p%d_dp%d" % (l, j, i)
+                    names[du] = "du%d_p%d_dp%d" % (l, j, i)
+        return (names, rects)
+
+    if detail not in ["dblepancake", "pancake"]:
+        raise Exception("htsmesh: unsupported detail %s" % detail)
+
+    names = []
+    rects = []
+    n_dp = len(insert.dblepancakes)
+    for i, dp in enumerate(insert.dblepancakes):
+        if detail == "dblepancake":
+            names.append("dp%d" % i)
+            rects.append((dp.getR0(), y0, dp.getW(), dp.getH()))
+        else:
+            p = dp.getPancake()
+            y = y0
+            names.append("p0_dp%d" % i)
+            rects.append((p.getR0(), y, p.getW(), p.getH()))
+            y += p.getH()
+            names.append("i_dp%d" % i)
+            rects.append((dp.isolation.r0, y, dp.isolation.getW(), dp.isolation.getH()))
+            y += dp.isolation.getH()
+            names.append("p1_dp%d" % i)
+            rects.append((p.getR0(), y, p.getW(), p.getH()))
+
+        y0 += dp.getH()
+        if i != n_dp-1:
+            isol = insert.isolations[i]
+            names.append("isolation%d" % i)
+            rects.append((isol.r0, y0, isol.getW(), isol.getH()))
+            y0 += isol.getH()
+
+    return (names, rects)
+
+def air_box(insert) -> tuple:
+    """
+    returns the air box (x0, y0, dx, dy) as defined in HTSinsert.gmsh
+    """
+    y0 = insert.getZ0()-insert.getH()/2.
+    return (0, y0 * 1.2, (insert.getR1()-insert.getR0()) * 2, (2 * abs(y0)) * 1.2)
+
+def _breaks(values: np.ndarray, tol: float) -> np.ndarray:
+    """
+    returns sorted values, merging values closer than tol
+    """
+    values = np.sort(values)
+    return values[np.concatenate(([True], np.diff(values) > tol))]
+
+def _subdivide(breaks: np.ndarray, lc: float) -> tuple:
+    """
+    split intervals between breaks in elements of size lc at most
+    (one element per interval if lc is None)
+
+    returns nodes coordinates and node index of each break
+    """
+    length = np.diff(breaks)
+    if lc:
+        n = np.maximum(1, np.ceil(length / lc - 1.e-9).astype(int))
+    else:
+        n = np.ones(len(length), dtype=int)
+    index = np.concatenate(([0], np.cumsum(n)))
+
+    k = np.repeat(np.arange(len(n)), n)
+    local = np.arange(index[-1]) - index[k]
+    nodes = np.concatenate((breaks[k] + length[k] * local / n[k], breaks[-1:]))
+    return (nodes, index)
+
+@profiling.timed()
+def mesh(insert, detail: str, Air: bool = False, lc: float = None, elements: str = "quad") -> tuple:
+    """
+    create a structured mesh for insert
+
+    detail: level of precision (see HTSinsert.gmsh)
+    Air: add air box
+    lc: maximum element size (default: one element between two breaks)
+    elements: quad or tri
+
+    returns nodes (N x 3 array) and a list of groups (name, dim, type, connectivity)
+    where connectivity holds node indices starting at 1
+    """
+    if elements not in ["quad", "tri"]:
+        raise Exception("htsmesh: unsupported elements %s" % elements)
+
+    (names, rects) = rectangles(insert, detail)
+    rects = np.array(rects, dtype=float)
+    bounds = np.column_stack((rects[:,0], rects[:,1], rects[:,0]+rects[:,2], rects[:,1]+rects[:,3]))
+    if Air:
+        (x0, y0, dx, dy) = air_box(insert)
+        names = names + ["Air"]
+        bounds = np.vstack((bounds, [x0, y0, x0+dx, y0+dy]))
+
+    tol = 1.e-9 * max(np.ptp(bounds[:,[0,2]]), np.ptp(bounds[:,[1,3]]), 1)
+    X = _breaks(bounds[:,[0,2]].ravel(), tol)
+    Y = _breaks(bounds[:,[1,3]].ravel(), tol)
+    (xn, xi) = _subdivide(X, lc)
+    (yn, yi) = _subdivide(Y, lc)
+    nx = len(xn)
+    ny = len(yn)
+
+    def xindex(x):
+        return xi[np.searchsorted(X, np.asarray(x) - tol)]
+    def yindex(y):
+        return yi[np.searchsorted(Y, np.asarray(y) - tol)]
+
+    # region of each cell (air is painted first, then the other domains)
+    region = np.full((nx-1, ny-1), -1, dtype=int)
+    (ia, ja, ib, jb) = (xindex(bounds[:,0]), yindex(bounds[:,1]), xindex(bounds[:,2]), yindex(bounds[:,3]))
+    for n in np.roll(np.arange(len(names)), 1 if Air else 0):
+        region[ia[n]:ib[n], ja[n]:jb[n]] = n
+
+    # cells sorted by region
+    (ci, cj) = np.nonzero(region >= 0)
+    order = np.argsort(region[ci, cj], kind='stable')
+    (ci, cj) = (ci[order], cj[order])
+    cell_region = region[ci, cj]
+
+    node = lambda i, j: i * ny + j
+    quads = np.column_stack((node(ci, cj), node(ci+1, cj), node(ci+1, cj+1), node(ci, cj+1)))
+
+    # renumber used nodes
+    used = np.unique(quads)
+    tag = np.zeros(nx * ny, dtype=int)
+    tag[used] = np.arange(1, len(used)+1)
+    nodes = np.column_stack((xn[used // ny], yn[used % ny], np.zeros(len(used))))
+
+    groups = []
+    split = np.searchsorted(cell_region, np.arange(len(names)+1))
+    for n, name in enumerate(names):
+        conn = tag[quads[split[n]:split[n+1]]]
+        if elements == "tri":
+            conn = np.column_stack((conn[:,[0,1,2]], conn[:,[0,2,3]])).reshape(-1, 3)
+            groups.append((name, 2, TRIANGLE, conn))
+        else:
+            groups.append((name, 2, QUADRANGLE, conn))
+
+    def covered(i, j):
+        inside = (i >= 0) & (i < nx-1) & (j >= 0) & (j < ny-1)
+        result = np.zeros(len(i), dtype=bool)
+        result[inside] = region[i[inside], j[inside]] >= 0
+        return result
+
+    def hedges(y: float, xa: float, xb: float):
+        j = yindex(y)
+        i = np.arange(xindex(xa), xindex(xb))
+        keep = covered(i, np.full(len(i), j-1)) | covered(i, np.full(len(i), j))
+        return np.column_stack((tag[node(i, j)], tag[node(i+1, j)]))[keep]
+
+    def vedges(x: float, ya: float, yb: float):
+        i = xindex(x)
+        j = np.arange(yindex(ya), yindex(yb))
+        keep = covered(np.full(len(j), i-1), j) | covered(np.full(len(j), i), j)
+        return np.column_stack((tag[node(i, j)], tag[node(i, j+1)]))[keep]
+
+    (r0, r1) = (insert.getR0(), insert.getR1())
+    (z0, z1) = (insert.getZ0()-insert.getH()/2., insert.getZ0()+insert.getH()/2.)
+    groups.append(("Bottom", 1, LINE, hedges(z0, r0, r1)))
+    groups.append(("Top", 1, LINE, hedges(z1, r0, r1)))
+    groups.append(("Rint", 1, LINE, vedges(r0, z0, z1)))
+    groups.append(("Rext", 1, LINE, vedges(r1, z0, z1)))
+    if Air:
+        (x0, y0, dx, dy) = air_box(insert)
+        groups.append(("Axis", 1, LINE, vedges(x0, y0, y0+dy)))
+        groups.append(("Inf", 1, LINE, np.vstack((hedges(y0, x0, x0+dx),
+                                                   vedges(x0+dx, y0, y0+dy),
+                                                   hedges(y0+dy, x0, x0+dx)))))
+
+    return (nodes, groups)
+
+def _write_rows(f, fmt: str, rows: np.ndarray, chunk: int = 65536):
+    """
+    write rows of an array with fmt (one row per line)
+    """
+    for k in range(0, len(rows), chunk):
+        block = rows[k:k+chunk]
+        f.write((fmt * len(block)) % tuple(block.ravel().tolist()))
+
+@profiling.timed()
+def write(filename: str, nodes: np.ndarray, groups: list):
+    """
+    save nodes and groups (as returned by mesh) to filename in msh 4.1 format
+
+    each group is stored as an entity with its own physical group
+    """
+    groups = [group for group in groups if len(group[3])]
+    curves = [group for group in groups if group[1] == 1]
+    surfaces = [group for group in groups if group[1] == 2]
+
+    with open(filename, "w") as f:
+        f.write("$MeshFormat\n4.1 0 8\n$EndMeshFormat\n")
+
+        f.write("$PhysicalNames\n%d\n" % len(groups))
+        for dim, entities in [(1, curves), (2, surfaces)]:
+            for n, (name, _dim, _type, conn) in enumerate(entities):
+                f.write("%d %d \"%s\"\n" % (dim, n+1, name))
+        f.write("$EndPhysicalNames\n")
+
+        f.write("$Entities\n0 %d %d 0\n" % (len(curves), len(surfaces)))
+        for dim, entities in [(1, curves), (2, surfaces)]:
+            for n, (name, _dim, _type, conn) in enumerate(entities):
+                xyz = nodes[conn.ravel()-1]
+                (xmin, ymin, zmin) = xyz.min(axis=0)
+                (xmax, ymax, zmax) = xyz.max(axis=0)
+                f.write("%d %.16g %.16g %.16g %.16g %.16g %.16g 1 %d 0\n" % (n+1, xmin, ymin, zmin, xmax, ymax, zmax, n+1))
+        f.write("$EndEntities\n")
+
+        # all nodes are stored on the first surface
+        f.write("$Nodes\n1 %d 1 %d\n" % (len(nodes), len(nodes)))
+        f.write("2 1 0 %d\n" % len(nodes))
+        _write_rows(f, "%d\n", np.arange(1, len(nodes)+1).reshape(-1, 1))
+        _write_rows(f, "%.16g %.16g %.16g\n", nodes)
+        f.write("$EndNodes\n")
+
+        nelements = sum(len(conn) for (name, dim, type, conn) in groups)
+        f.write("$Elements\n%d %d 1 %d\n" % (len(groups), nelements, nelements))
+        first = 1
+        for dim, entities in [(1, curves), (2, surfaces)]:
+            for n, (name, _dim, type, conn) in enumerate(entities):
+                f.write("%d %d %d %d\n" % (dim, n+1, type, len(conn)))
+                rows = np.column_stack((np.arange(first, first+len(conn)), conn))
+                _write_rows(f, " ".join(["%d"] * rows.shape[1]) + "\n", rows)
+                first += len(conn)
+        f.write("$EndElements\n")
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+#-*- coding:utf-8 -*-
+
+"""
+Provides yaml Loader and Dumper for magnet geometry files
+
+Use libyaml (CSafeLoader/CSafeDumper) when available,
+otherwise fallback to the pure python SafeLoader/SafeDumper.
+
+Geometry classes register themselves with register(), so that both
+verbatim tags (eg. !<Helix> as written by dump) and short tags
+(eg. !Helix) are understood by Loader.
+"""
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as _Loader, CSafeDumper as _Dumper
+    with_libyaml = True
+except ImportError:
+    from yaml import SafeLoader as _Loader, SafeDumper as _Dumper
+    with_libyaml = False
+
+class Loader(_Loader):
+    """
+    yaml loader for magnet geometry files
+    """
+
+class Dumper(_Dumper):
+    """
+    yaml dumper for magnet geometry files
+    """
+
+def register(cls, constructor=None):
+    """
+    register a yaml.YAMLObject class on Loader and Dumper
+
+    constructor: optional function to build cls from a !<cls.yaml_tag> node
+    """
+    Loader.add_constructor(cls.yaml_tag, cls.from_yaml)
+    if constructor:
+        Loader.add_constructor(u'!' + cls.yaml_tag, constructor)
+    Dumper.add_representer(cls, cls.to_yaml)
+
+def load(stream):
+    """
+    load magnet geometry from stream
+    """
+    return yaml.load(stream, Loader=Loader)
+
+def dump(data, stream=None):
+    """
+    dump magnet geometry to stream (or return a string if stream is None)
+    """
+    return yaml.dump(data, stream=stream, Dumper=Dumper)
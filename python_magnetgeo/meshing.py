@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+#-*- coding:utf-8 -*-
+
+"""
+Provides parallel meshing options for gmsh
+
+gmsh meshes with a single thread by default (General.NumThreads = 1).
+With more threads, 1D and 2D meshing run over curves and surfaces in
+parallel (for MeshAdapt, Delaunay and Frontal-Delaunay 2D algorithms)
+and HXT is the parallel 3D algorithm. Mesh.MaxNumThreads1D/2D/3D cap
+the number of threads for each dimension (0: General.NumThreads).
+"""
+
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+def add_arguments(parser):
+    """
+    add threads options to an argparse parser
+    """
+    parser.add_argument("--threads", help="number of threads used by gmsh (0: one per core, default: 1)", type=int)
+    parser.add_argument("--threads2d", help="max number of threads for 2d mesh (default: threads)", type=int)
+    parser.add_argument("--threads3d", help="max number of threads for 3d mesh (default: threads)", type=int)
+
+def get_threads(threads: int = None) -> int:
+    """
+    returns the number of threads (one per core if threads is 0)
+    """
+    if threads is None:
+        return 1
+    if threads <= 0:
+        return os.cpu_count() or 1
+    return threads
+
+def set_threads(threads: int = None, threads2d: int = None, threads3d: int = None, algo3d: str = None) -> int:
+    """
+    set gmsh threads options (gmsh shall be initialized)
+
+    returns the number of threads
+    """
+    import gmsh
+
+    n = get_threads(threads)
+    gmsh.option.setNumber("General.NumThreads", n)
+    gmsh.option.setNumber("Mesh.MaxNumThreads1D", n)
+    gmsh.option.setNumber("Mesh.MaxNumThreads2D", get_threads(threads2d) if threads2d is not None else n)
+    gmsh.option.setNumber("Mesh.MaxNumThreads3D", get_threads(threads3d) if threads3d is not None else n)
+
+    if 'OpenMP' not in gmsh.option.getString("General.BuildOptions").split() and n > 1:
+        logger.warning("gmsh built without OpenMP: meshing will use a single thread")
+    if algo3d not in [None, 'None', 'HXT'] and gmsh.option.getNumber("Mesh.MaxNumThreads3D") > 1:
+        logger.info("3d mesh algorithm %s is sequential, use HXT for parallel 3d mesh", algo3d)
+
+    logger.info("gmsh threads: %d (2d: %d, 3d: %d)", n,
+                gmsh.option.getNumber("Mesh.MaxNumThreads2D"), gmsh.option.getNumber("Mesh.MaxNumThreads3D"))
+    return n
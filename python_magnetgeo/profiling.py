@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+#-*- coding:utf-8 -*-
+
+"""
+Provides timers and counters to profile geometry and mesh generation
+
+Nothing is recorded unless profiling is enabled:
+
+* timer(name) (context manager) and timed() (decorator) record the
+  number of calls and the elapsed time; nested timers are reported with
+  their full path (eg. "build/MSite.gmsh/Insert.gmsh/Helix.gmsh")
+* phase(name) closes the previous phase and opens a new one, which is
+  convenient to split long scripts into steps
+* count(name, n) increments a counter
+* with gmsh_hooks, calls to the gmsh api (entity creation, boolean
+  operations, bounding box queries, physical groups, meshing) are
+  counted and timed as well
+
+report() returns the results as a dict, dump() saves them as json.
+"""
+
+import sys
+import json
+import time
+import functools
+from contextlib import contextmanager
+
+# gmsh functions recorded by the hooks
+# (for gmsh.model.occ every add* function is recorded too)
+GMSH_HOOKS = {
+    'model.occ': ['fragment', 'fuse', 'cut', 'intersect', 'importShapes', 'remove', 'synchronize'],
+    'model': ['getEntitiesInBoundingBox', 'getBoundary', 'getBoundingBox', 'addPhysicalGroup', 'setPhysicalName'],
+    'model.mesh': ['generate']
+}
+
+_enabled = False
+_stack = []
+_phase = None
+_timers = {}
+_counters = {}
+_gmsh = {}
+_hooks = []
+
+def enable(gmsh_hooks: bool = True):
+    """
+    start recording (and install gmsh hooks if gmsh_hooks is True)
+    """
+    global _enabled
+    _enabled = True
+    if gmsh_hooks and not _hooks:
+        _install_hooks()
+
+def disable():
+    """
+    stop recording and remove gmsh hooks
+    """
+    global _enabled
+    phase(None)
+    _enabled = False
+    _remove_hooks()
+
+def enabled() -> bool:
+    return _enabled
+
+def reset():
+    """
+    clear all recorded data
+    """
+    global _phase
+    _stack.clear()
+    _phase = None
+    _timers.clear()
+    _counters.clear()
+    _gmsh.clear()
+
+def _record(table: dict, key: str, elapsed: float):
+    entry = table.get(key)
+    if entry is None:
+        table[key] = [1, elapsed]
+    else:
+        entry[0] += 1
+        entry[1] += elapsed
+
+@contextmanager
+def timer(name: str):
+    """
+    time the enclosed block as name
+    """
+    if not _enabled:
+        yield
+        return
+
+    _stack.append(name)
+    key = "/".join(_stack)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(_timers, key, time.perf_counter() - start)
+        _stack.pop()
+
+def timed(name: str = None):
+    """
+    decorator timing each call of a function
+    (name defaults to the qualified name of the function, eg. Insert.gmsh)
+    """
+    def decorator(func):
+        tname = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with timer(tname):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def phase(name: str):
+    """
+    end the current phase and start phase name (None to end the current phase)
+    """
+    global _phase
+    if _phase is not None:
+        (key, depth, start) = _phase
+        _record(_timers, key, time.perf_counter() - start)
+        del _stack[depth:]
+        _phase = None
+
+    if name is not None and _enabled:
+        depth = len(_stack)
+        _stack.append(name)
+        _phase = ("/".join(_stack), depth, time.perf_counter())
+
+def count(name: str, n: int = 1):
+    """
+    increment counter name by n
+    """
+    if _enabled:
+        _counters[name] = _counters.get(name, 0) + n
+
+def _hook(name: str, func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _record(_gmsh, name, time.perf_counter() - start)
+    return wrapper
+
+def _install_hooks():
+    try:
+        import gmsh
+    except (ImportError, OSError):
+        return
+
+    for path, names in GMSH_HOOKS.items():
+        api = gmsh
+        for attr in path.split('.'):
+            api = getattr(api, attr)
+        if path == 'model.occ':
+            names = names + [attr for attr in vars(api) if attr.startswith('add')]
+        for attr in names:
+            func = vars(api).get(attr)
+            if not isinstance(func, staticmethod):
+                continue
+            _hooks.append((api, attr, func))
+            setattr(api, attr, staticmethod(_hook("%s.%s" % (path, attr), func.__func__)))
+
+def _remove_hooks():
+    while _hooks:
+        (api, attr, func) = _hooks.pop()
+        setattr(api, attr, func)
+
+def report() -> dict:
+    """
+    returns recorded timers, counters and gmsh calls
+    """
+    counters = dict(_counters)
+    entities = sum(calls for (name, (calls, elapsed)) in _gmsh.items() if name.startswith('model.occ.add'))
+    if entities:
+        counters['occ.entities'] = entities
+    if 'model.occ.fragment' in _gmsh:
+        counters['occ.fragments'] = _gmsh['model.occ.fragment'][0]
+
+    return {
+        'timers': {key: {'calls': calls, 'time': elapsed} for key, (calls, elapsed) in _timers.items()},
+        'counters': counters,
+        'gmsh': {key: {'calls': calls, 'time': elapsed} for key, (calls, elapsed) in sorted(_gmsh.items())}
+    }
+
+def dump(filename: str = None):
+    """
+    save the report as json to filename (or stdout if filename is None or "-")
+    """
+    data = json.dumps(report(), indent=4)
+    if filename in (None, "-"):
+        sys.stdout.write(data + "\n")
+    else:
+        with open(filename, "w") as f:
+            f.write(data + "\n")
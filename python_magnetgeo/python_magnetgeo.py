@@ -1,8 +1,10 @@
 """Main module."""
 
 from .Insert import *
+from . import repository
 
 import math
+import numpy as np
 
 def get_main_characteristics(cad: Insert):
     """
@@ -34,9 +36,7 @@ def get_main_characteristics(cad: Insert):
     Dh = []
     Sh = []
     for i,helix in enumerate(cad.Helices):
-        hhelix = None
-        with open(helix+".yaml", 'r') as f:
-            hhelix = yaml.load(f, Loader = yaml.FullLoader)
+        hhelix = repository.load(helix)
         n_sections = len(hhelix.axi.turns)
         Nsections.append(n_sections)
         index_h.append([str(i+1), "1:%s" % str(n_sections+1), "[0,%s]" % str(n_sections+2)])
@@ -71,3 +71,100 @@ def get_main_characteristics(cad: Insert):
     Sh.append(math.pi*(Re-Ri)*(Re+Ri))
 
     return (NHelices, NRings, NChannels, Nsections, index_h, R1, R2, Z1, Z2, Zmin, Zmax, Dh, Sh)
+
+def _helices_characteristics(cad):
+    """
+    return name, NRings, innerbore, outerbore and
+    R1, R2, Z1, Z2, Nsections of the helices for Insert (or Insert name)
+    """
+    if isinstance(cad, str):
+        cad = repository.load(cad)
+
+    helices = [repository.load(helix) for helix in cad.Helices]
+    return (cad.name,
+            len(cad.Rings),
+            cad.innerbore,
+            cad.outerbore,
+            [[h.r[0], h.r[1], h.z[0], h.z[1], len(h.axi.turns)] for h in helices])
+
+def get_main_characteristics_batch(cads: list, processes: int = None) -> dict:
+    """
+    return main characteristics for a list of Insert (or Insert names)
+    as columns (numpy arrays):
+
+    insert: name, NHelices, NRings, NChannels, innerbore, outerbore
+    helix: insert (index in cads), R1, R2, Z1, Z2, Nsections
+    channel: insert (index in cads), Zmin, Zmax, Dh, Sh
+
+    processes: when set, helix files are read in a pool of processes
+    """
+    cads = list(cads)
+    if processes and len(cads) > 1:
+        import multiprocessing
+        with multiprocessing.Pool(processes) as pool:
+            data = pool.map(_helices_characteristics, cads)
+    else:
+        data = [_helices_characteristics(cad) for cad in cads]
+
+    NHelices = np.array([len(d[4]) for d in data], dtype=int)
+    if not NHelices.all():
+        raise Exception("get_main_characteristics_batch: Insert without Helices")
+    NChannels = NHelices+1 # TODO check this value if insert contains HR
+    innerbore = np.array([d[2] for d in data], dtype=float)
+    outerbore = np.array([d[3] for d in data], dtype=float)
+
+    table = np.array([row for d in data for row in d[4]], dtype=float).reshape(-1, 5)
+    (R1, R2, Z1, Z2) = (table[:,0], table[:,1], table[:,2], table[:,3])
+    index_h = np.repeat(np.arange(len(data)), NHelices)
+
+    # first/last helix of each insert
+    first = np.cumsum(NHelices) - NHelices
+    last = first + NHelices - 1
+
+    # helix i sits between channel i (inner) and channel i+1 (outer)
+    offset = np.cumsum(NChannels) - NChannels
+    inner_c = offset[index_h] + np.arange(len(R1)) - first[index_h]
+    outer_c = offset + NHelices
+
+    Ri = np.empty(NChannels.sum())
+    Re = np.empty(NChannels.sum())
+    Ri[offset] = innerbore
+    Ri[inner_c+1] = R1
+    Re[inner_c] = R1
+    Re[outer_c] = outerbore
+
+    # Zmin/Zmax: compare each helix to the previous one in the same insert
+    prev = np.arange(len(R1)) - 1
+    prev[first] = first
+    Zmin = np.empty(NChannels.sum())
+    Zmax = np.empty(NChannels.sum())
+    Zmin[inner_c] = np.minimum(Z1, Z1[prev])
+    Zmax[inner_c] = np.minimum(Z2, Z2[prev])
+    Zmin[outer_c] = Z1[last]
+    Zmax[outer_c] = Z2[last]
+
+    return {
+        'insert': {
+            'name': np.array([d[0] for d in data]),
+            'NHelices': NHelices,
+            'NRings': np.array([d[1] for d in data], dtype=int),
+            'NChannels': NChannels,
+            'innerbore': innerbore,
+            'outerbore': outerbore,
+        },
+        'helix': {
+            'insert': index_h,
+            'R1': R1,
+            'R2': R2,
+            'Z1': Z1,
+            'Z2': Z2,
+            'Nsections': table[:,4].astype(int),
+        },
+        'channel': {
+            'insert': np.repeat(np.arange(len(data)), NChannels),
+            'Zmin': Zmin,
+            'Zmax': Zmax,
+            'Dh': 2*(Re-Ri),
+            'Sh': math.pi*(Re-Ri)*(Re+Ri),
+        },
+    }
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+#-*- coding:utf-8 -*-
+
+"""
+Provides a shared repository for magnet parts stored in yaml files
+
+Parts are referenced by name (eg. Insert.Helices holds "HL-31_H1"
+for "HL-31_H1.yaml"). Each file is parsed once and kept in a bounded
+LRU cache keyed by its resolved path. A cached part is reused as long
+as the mtime and size of the file are unchanged.
+
+Relative names are searched in (first match wins):
+
+* the roots of the enclosing roots() blocks, innermost first
+  (roots are thread-local: each thread may process its own site)
+* the search path of the repository (list of data directories)
+* the current directory
+
+so that loading never depends on os.chdir and several sites may be
+processed concurrently in one process. Outputs are written with
+output(), ie. in the innermost root.
+
+NB: cached parts are shared between callers, do not modify them in place.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from . import loader
+
+_local = threading.local()
+
+def _roots() -> list:
+    return getattr(_local, 'roots', [])
+
+@contextmanager
+def roots(*dirs):
+    """
+    search parts in dirs (and write outputs in the first one)
+    within the block, for the current thread only
+    """
+    dirs = [d for d in dirs if d]
+    previous = _roots()
+    _local.roots = dirs + previous
+    try:
+        yield dirs
+    finally:
+        _local.roots = previous
+
+def output(filename: str) -> str:
+    """
+    returns the path where filename shall be written (in the innermost root)
+    """
+    current = _roots()
+    if current and not os.path.isabs(filename):
+        return os.path.join(current[0], filename)
+    return filename
+
+class PartRepository:
+    """
+    maxsize : maximum number of parts kept in cache
+    searchpath : list of data directories
+    hits :
+    misses :
+    """
+
+    def __init__(self, maxsize: int = 256, searchpath: list = None):
+        """
+        initialize repository
+        """
+        self.maxsize = maxsize
+        self.searchpath = list(searchpath or [])
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __repr__(self):
+        """
+        representation of repository
+        """
+        return "%s(maxsize=%r, size=%r, hits=%r, misses=%r)" % \
+               (self.__class__.__name__,
+                self.maxsize,
+                len(self._cache),
+                self.hits,
+                self.misses
+               )
+
+    def __len__(self):
+        return len(self._cache)
+
+    def searchdirs(self) -> list:
+        """
+        returns the directories searched for relative names, in order
+        """
+        return _roots() + self.searchpath + [os.curdir]
+
+    def resolve(self, filename: str) -> str:
+        """
+        returns the resolved path of filename
+        (the first candidate if filename is found nowhere)
+        """
+        if os.path.isabs(filename):
+            return os.path.realpath(filename)
+
+        candidates = [os.path.join(d, filename) for d in self.searchdirs()]
+        for candidate in candidates:
+            if os.path.isfile(candidate):
+                return os.path.realpath(candidate)
+        return os.path.realpath(candidates[0])
+
+    def path(self, name: str) -> str:
+        """
+        returns the resolved path of the yaml file holding part name
+        """
+        filename = name
+        if not filename.endswith('.yaml'):
+            filename += '.yaml'
+        return self.resolve(filename)
+
+    def load(self, name: str):
+        """
+        returns the part stored in name.yaml
+        """
+        path = self.path(name)
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._cache.get(path)
+            if entry is not None and entry[0] == key:
+                self._cache.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+
+        # parse outside of the lock: other threads keep loading other parts
+        with open(path, 'r') as f:
+            data = loader.load(f)
+
+        with self._lock:
+            self.misses += 1
+            self._store(path, key, data)
+        return data
+
+    def add(self, name: str, data):
+        """
+        store data as the part held by name.yaml
+        (eg. when data has been restored from a compiled snapshot)
+        """
+        path = self.path(name)
+        stat = os.stat(path)
+        self._store(path, (stat.st_mtime_ns, stat.st_size), data)
+
+    def _store(self, path: str, key: tuple, data):
+        with self._lock:
+            self._cache[path] = (key, data)
+            self._cache.move_to_end(path)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+    def invalidate(self, name: str = None):
+        """
+        remove name from cache, or every part if name is None
+        """
+        path = None if name is None else self.path(name)
+        with self._lock:
+            if path is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(path, None)
+
+# default repository used by Insert, MSite, xao...
+_repository = PartRepository()
+
+def get_repository() -> PartRepository:
+    """
+    returns the default part repository
+    """
+    return _repository
+
+def resolve(filename: str) -> str:
+    """
+    returns the resolved path of filename (eg. a json or template file)
+    searched as parts of the default repository
+    """
+    return _repository.resolve(filename)
+
+def load(name: str):
+    """
+    load part name from the default repository
+    """
+    return _repository.load(name)
+
+def invalidate(name: str = None):
+    """
+    invalidate part name (or all parts) in the default repository
+    """
+    _repository.invalidate(name)
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+#-*- coding:utf-8 -*-
+
+"""
+Provides a local geometry/mesh service
+
+    python -m python_magnetgeo.server [--port PORT | --socket FILE] [--wd DIR] [--path DIR]
+
+The server keeps gmsh initialized and the parsed parts in its part
+repository between requests, so that a request only pays for the
+actual work. Requests are POSTed to localhost (or to a Unix socket only
+the user may use) as json, answers are json:
+
+* /run: {"filename": "HL-31.yaml", "gmsh_api": true, "mesh": true, ...}
+  processes filename as the cli does (keys are the cli options, see
+  cli.add_arguments), returns the summary of the job (as in batch mode)
+  with the files written and, with gmsh_api, the physical groups and
+  mesh sizes of the model
+* /characteristics: {"names": ["HL-31", ...]} returns the main
+  characteristics of the inserts as columns (see
+  get_main_characteristics_batch)
+* /invalidate: {"name": "HL-31_H1"} drops name (or every part) from cache
+* /status (GET): pid, uptime, number of requests, cache statistics
+* /shutdown: stops the server
+
+Each request may set "wd" and "path" (as the cli options) to search the
+parts of its own site. Requests are served one at a time (gmsh is not
+thread-safe). call() sends a request to a running server.
+
+There is no authentication and /run reads and writes any directory of
+the user: the server only listens on loopback or on a Unix socket, and
+only answers requests sent to localhost with a json Content-Type (other
+web pages cannot send those without a CORS preflight, which is not
+answered).
+"""
+
+import os
+import sys
+import json
+import time
+import stat
+import socket
+import logging
+import argparse
+import threading
+import traceback
+import http.client
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+from . import cli
+from . import batch
+from . import repository
+
+logger = logging.getLogger(__name__)
+
+HOST = "127.0.0.1"
+PORT = 8642
+
+LOOPBACK = ("127.0.0.1", "localhost", "::1")
+
+class RequestError(Exception):
+    """
+    invalid request (answered with 400)
+    """
+    pass
+
+def _groups() -> dict:
+    """
+    returns the physical groups and the mesh sizes of the current gmsh model
+    """
+    import gmsh
+
+    groups = {}
+    for (dim, tag) in gmsh.model.getPhysicalGroups():
+        name = gmsh.model.getPhysicalName(dim, tag) or str(tag)
+        groups[name] = {'dim': dim, 'tag': tag, 'entities': len(gmsh.model.getEntitiesForPhysicalGroup(dim, tag))}
+
+    (elementTypes, elementTags, nodeTags) = gmsh.model.mesh.getElements()
+    return {
+        'groups': groups,
+        'mesh': {'nodes': len(gmsh.model.mesh.getNodes()[0]),
+                 'elements': sum(len(tags) for tags in elementTags)}
+    }
+
+class MagnetGeoServer(HTTPServer):
+    """
+    wd : default working directory of requests
+    path : default search path of requests
+    requests : number of requests served
+    """
+
+    def __init__(self, address=(HOST, PORT), wd: str = "data", path: list = None, verbose: bool = False):
+        """
+        initialize server
+
+        address: (host, port) or the filename of a Unix socket
+        """
+        if isinstance(address, str):
+            self.address_family = socket.AF_UNIX
+        elif address[0] not in LOOPBACK:
+            logger.warning("server: listening on %s: anyone reaching this address may read and write your files", address[0])
+        super().__init__(address, MagnetGeoHandler)
+        self.wd = wd
+        self.path = list(path or [])
+        self.verbose = verbose
+        self.requests = 0
+        self.start = time.time()
+
+        parser = argparse.ArgumentParser(add_help=False)
+        cli.add_arguments(parser)
+        self.defaults = vars(parser.parse_args([]))
+
+    def server_bind(self):
+        if self.address_family != socket.AF_UNIX:
+            return super().server_bind()
+
+        # replace a socket left by a previous server (not any other file)
+        if os.path.exists(self.server_address) and stat.S_ISSOCK(os.stat(self.server_address).st_mode):
+            os.remove(self.server_address)
+        umask = os.umask(0o177)
+        try:
+            self.socket.bind(self.server_address)
+        finally:
+            os.umask(umask)
+        os.chmod(self.server_address, 0o600)
+        self.server_address = self.socket.getsockname()
+        self.server_name = "localhost"
+        self.server_port = 0
+
+    def _args(self, data: dict):
+        """
+        returns the cli options for request data
+        """
+        unknown = set(data) - set(self.defaults) - {'filename'}
+        if unknown:
+            raise RequestError("unknown options: %s" % ", ".join(sorted(unknown)))
+        if not data.get('filename'):
+            raise RequestError("missing filename")
+
+        options = dict(self.defaults, wd=self.wd, path=self.path)
+        options.update(data)
+        # no gui, no pool of processes started by the server
+        options.update(show=False, processes=None, verbose=self.verbose, debug=False)
+        return argparse.Namespace(**options)
+
+    def _dirs(self, data: dict) -> list:
+        return [os.path.abspath(d) for d in [data.get('wd', self.wd)] + list(data.get('path', self.path)) if d]
+
+    def run(self, data: dict) -> dict:
+        """
+        process a /run request
+        """
+        args = self._args(data)
+        return batch.job(args, self._dirs(data), _groups if args.gmsh_api else None)
+
+    def characteristics(self, data: dict) -> dict:
+        """
+        process a /characteristics request
+        """
+        from .python_magnetgeo import get_main_characteristics_batch
+
+        names = data.get('names')
+        if not names or not isinstance(names, list):
+            raise RequestError("missing names")
+        with repository.roots(*self._dirs(data)):
+            columns = get_main_characteristics_batch(names)
+        return {table: {key: values.tolist() for key, values in columns[table].items()} for table in columns}
+
+    def invalidate(self, data: dict) -> dict:
+        """
+        process an /invalidate request
+        """
+        with repository.roots(*self._dirs(data)):
+            repository.invalidate(data.get('name'))
+        return {'status': "ok"}
+
+    def status(self) -> dict:
+        """
+        returns the state of the server
+        """
+        repo = repository.get_repository()
+        return {
+            'pid': os.getpid(),
+            'uptime': time.time() - self.start,
+            'requests': self.requests,
+            'repository': {'size': len(repo), 'hits': repo.hits, 'misses': repo.misses},
+            'gmsh': 'gmsh' in sys.modules and sys.modules['gmsh'].isInitialized() == 1
+        }
+
+    def server_close(self):
+        super().server_close()
+        if self.address_family == socket.AF_UNIX and os.path.exists(self.server_address):
+            os.remove(self.server_address)
+        if 'gmsh' in sys.modules and sys.modules['gmsh'].isInitialized():
+            sys.modules['gmsh'].finalize()
+
+class MagnetGeoHandler(BaseHTTPRequestHandler):
+    """
+    json requests handler
+    """
+
+    def _answer(self, code: int, data: dict):
+        body = json.dumps(data).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _forbidden(self, post: bool) -> bool:
+        """
+        answers requests not sent to localhost (eg. DNS rebinding),
+        or posted without a json Content-Type (cross-origin forms)
+        """
+        host = self.headers.get("Host", "")
+        host = host[1:host.find("]")] if host.startswith("[") else host.rsplit(":", 1)[0]
+        if host not in LOOPBACK:
+            self._answer(403, {'status': "error: host %s not allowed" % host})
+            return True
+        if post and self.headers.get_content_type() != "application/json":
+            self._answer(415, {'status': "error: Content-Type shall be application/json"})
+            return True
+        return False
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return self.client_address[0] if self.client_address else "local"
+
+    def do_GET(self):
+        self.server.requests += 1
+        if self._forbidden(post=False):
+            return
+        if self.path != "/status":
+            return self._answer(404, {'status': "error: unknown request %s" % self.path})
+        self._answer(200, self.server.status())
+
+    def do_POST(self):
+        self.server.requests += 1
+        if self._forbidden(post=True):
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            data = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(data, dict):
+                raise RequestError("request shall be a json object")
+
+            if self.path == "/run":
+                result = self.server.run(data)
+                return self._answer(200 if result['status'] == "ok" else 500, result)
+            if self.path == "/characteristics":
+                return self._answer(200, self.server.characteristics(data))
+            if self.path == "/invalidate":
+                return self._answer(200, self.server.invalidate(data))
+            if self.path == "/shutdown":
+                self._answer(200, {'status': "ok"})
+                # shutdown waits for serve_forever to return: not from the serving thread
+                threading.Thread(target=self.server.shutdown).start()
+                return
+            return self._answer(404, {'status': "error: unknown request %s" % self.path})
+
+        except (RequestError, ValueError) as e:
+            self._answer(400, {'status': "error: %s" % e})
+        except Exception as e:
+            logger.debug("server: %s failed\n%s", self.path, traceback.format_exc())
+            self._answer(500, {'status': "error: %s" % e})
+
+    def log_message(self, format, *args):
+        logger.info("%s %s", self.address_string(), format % args)
+
+class UnixConnection(http.client.HTTPConnection):
+    """
+    http connection to a server listening on a Unix socket
+    """
+
+    def __init__(self, filename: str, timeout: float = None):
+        super().__init__("localhost", timeout=timeout)
+        self.filename = filename
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.filename)
+
+def call(request: str, data: dict = None, host: str = HOST, port: int = PORT, timeout: float = None, unix: str = None) -> dict:
+    """
+    send request (eg. "run") to a running server
+    (listening on host:port, or on the Unix socket unix)
+
+    returns the answer (also for failed requests, see 'status')
+    """
+    if unix:
+        connection = UnixConnection(unix, timeout=timeout)
+    else:
+        connection = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        if data is None and request == "status":
+            connection.request("GET", "/status")
+        else:
+            connection.request("POST", "/" + request.lstrip("/"), json.dumps(data or {}).encode(),
+                               {"Content-Type": "application/json"})
+        return json.loads(connection.getresponse().read())
+    finally:
+        connection.close()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", help="port to listen on (localhost only)", type=int, default=PORT)
+    parser.add_argument("--socket", help="listen on this Unix socket instead (only usable by the user)", type=str, metavar='FILE')
+    parser.add_argument("--wd", help="default working directory of requests", type=str, default="data")
+    parser.add_argument("--path", help="add a directory where parts are searched (after wd)", type=str, action='append', default=[])
+    parser.add_argument("--verbose", help="activate verbose", action='store_true')
+    parser.add_argument("--debug", help="activate debug", action='store_true')
+    args = parser.parse_args()
+    logging.basicConfig(format="%(levelname)s:%(name)s: %(message)s",
+                        level=logging.DEBUG if args.debug else logging.INFO if args.verbose else logging.WARNING)
+
+    server = MagnetGeoServer(args.socket or (HOST, args.port), args.wd, args.path, args.verbose or args.debug)
+    logger.info("serving on %s", args.socket or "%s:%d" % server.server_address)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())  # pragma: no cover
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+#-*- coding:utf-8 -*-
+
+"""
+Provides generators of synthetic magnets for scaling tests
+
+Each generator builds the whole object tree in memory and returns
+(root, parts) where parts maps the name of every part (root included)
+to the part: Insert, Helix, Ring, Bitter, Supra, MSite objects or HTS
+configurations (dict as stored in json, keyed by their filename).
+write() saves them in a directory so that they can be loaded by name.
+
+Sizes are set by the arguments (eg. number of helices and of axial
+sections, of double pancakes and tapes). Without seed the geometry is
+regular, with a seed dimensions and sections are randomly perturbed
+(reproducibly).
+"""
+
+import os
+import json
+
+import numpy as np
+
+from . import loader
+from .Helix import Helix
+from .ModelAxi import ModelAxi
+from .Model3D import Model3D
+from .Shape import Shape
+from .Ring import Ring
+from .Insert import Insert
+from .Bitter import Bitter
+from .Supra import Supra
+from .MSite import MSite
+from .SupraStructure import HTSinsert
+
+def _rng(seed):
+    return None if seed is None else np.random.default_rng(seed)
+
+def _axi(name: str, h: float, nsections: int, rng=None) -> ModelAxi:
+    """
+    returns a ModelAxi of nsections sections spanning [-h, h]
+    """
+    turns = np.full(nsections, 0.5)
+    weights = np.ones(nsections)
+    if rng is not None:
+        turns = rng.uniform(0.3, 0.7, nsections)
+        weights = rng.uniform(0.5, 1.5, nsections)
+    dz = 2. * h * weights / weights.sum()
+    return ModelAxi(name, float(h), turns.tolist(), (dz / turns).tolist())
+
+def helix(name: str, r: list, z: list, nsections: int = 20, odd: bool = False, rng=None) -> Helix:
+    """
+    returns an Helix with nsections sections
+    """
+    h = min(-z[0], z[1]) - 15.
+    return Helix(name, r=list(r), z=list(z), cutwidth=0.2, odd=odd, dble=True,
+                 axi=_axi(name + ".d", h, nsections, rng), m3d=Model3D(name), shape=Shape("", ""))
+
+def ring(name: str, hin: Helix, hout: Helix, height: float = 20.) -> Ring:
+    """
+    returns the Ring connecting helices hin and hout
+    """
+    return Ring(name, r=[hin.r[0], hin.r[1], hout.r[0], hout.r[1]], z=[0, height], n=6, angle=46)
+
+def insert(name: str, nhelices: int = 14, nsections: int = 20,
+           r0: float = 19.3, width: float = 5.0, gap: float = 0.9,
+           with_rings: bool = True, seed: int = None) -> tuple:
+    """
+    returns an Insert with nhelices helices of nsections sections
+    (connected by rings if with_rings is True) and its parts
+    """
+    rng = _rng(seed)
+    parts = {}
+    helices = []
+    rings = []
+    r = r0
+    z = [-100., 100.]
+    for i in range(nhelices):
+        # helices connected by a ring share their top (i odd) or bottom (i even) end
+        if i % 2:
+            z = [-z[1], z[1]]
+        elif i:
+            z = [z[0], z[1] + 15.]
+        w = width if rng is None else width * rng.uniform(0.8, 1.2)
+
+        hhelix = helix("%s_H%d" % (name, i+1), [r, r+w], z, nsections, odd=(i % 2 == 0), rng=rng)
+        parts[hhelix.name] = hhelix
+        if i and with_rings:
+            hring = ring("%s_R%d" % (name, i), parts[helices[-1]], hhelix)
+            parts[hring.name] = hring
+            rings.append(hring.name)
+        helices.append(hhelix.name)
+        r += w + (gap if rng is None else gap * rng.uniform(0.8, 1.2))
+
+    root = Insert(name, Helices=helices, Rings=rings, CurrentLeads=[], HAngles=[], RAngles=[],
+                  innerbore=r0-0.8, outerbore=parts[helices[-1]].r[1]+5.)
+    parts[name] = root
+    return (root, parts)
+
+def bitter(name: str, r: list, z: list, nsections: int = 20, seed: int = None) -> tuple:
+    """
+    returns a Bitter with nsections sections and its parts
+    """
+    h = min(-z[0], z[1]) - 10.
+    root = Bitter(name, r=list(r), z=list(z), axi=_axi(name + ".d", h, nsections, _rng(seed)))
+    return (root, {name: root})
+
+def hts(ndblepancakes: int = 10, ntapes: int = 40, r0: float = 20., mandrin: float = 2.) -> dict:
+    """
+    returns an HTS insert configuration (as loaded by HTSinsert.loadCfg)
+    with ndblepancakes double pancakes of ntapes tapes
+    """
+    tape = {"w": 4, "h": 6, "e": 1}
+    w = mandrin + ntapes * (tape["w"] + tape["e"]) + 2
+    return {
+        "tape": tape,
+        "pancake": {"r0": r0, "mandrin": mandrin, "ntapes": ntapes, "tape": tape},
+        "isolation": {"r0": r0-2, "w": [w], "h": [0.5]},
+        "dblepancakes": {"n": ndblepancakes, "isolation": {"r0": r0-2, "w": [w], "h": [1]}}
+    }
+
+def supra(name: str, ndblepancakes: int = 10, ntapes: int = 40, r0: float = 20.) -> tuple:
+    """
+    returns a Supra described by an HTS insert configuration (name.json) and its parts
+    """
+    config = hts(ndblepancakes, ntapes, r0)
+    struct = HTSinsert()
+    struct.setCfg(config)
+
+    root = Supra(name, r=[struct.getR0(), struct.getR1()],
+                 z=[struct.getZ0()-struct.getH()/2., struct.getZ0()+struct.getH()/2.],
+                 n=sum(struct.getNtapes()))
+    root.struct = name + ".json"
+    return (root, {name: root, root.struct: config})
+
+def msite(name: str, ninserts: int = 1, nbitters: int = 2, nsupras: int = 1,
+          nhelices: int = 14, nsections: int = 20, seed: int = None) -> tuple:
+    """
+    returns an MSite made of ninserts inserts, nbitters bitters and
+    nsupras supras (nested from inside to outside) and its parts
+    """
+    rng = _rng(seed)
+    parts = {}
+    magnets = {"insert": [], "Bitter": [], "Supra": []}
+
+    r0 = 19.3
+    for i in range(ninserts):
+        (root, iparts) = insert("%s_M%d" % (name, i+1), nhelices, nsections, r0=r0,
+                                seed=None if rng is None else int(rng.integers(2**31)))
+        parts.update(iparts)
+        magnets["insert"].append(root.name)
+        r0 = root.outerbore + 10.
+
+    for i in range(nbitters):
+        w = 100. if rng is None else 100. * rng.uniform(0.8, 1.2)
+        (root, bparts) = bitter("%s_B%d" % (name, i+1), [r0, r0+w], [-300., 300.], nsections,
+                                seed=None if rng is None else int(rng.integers(2**31)))
+        parts.update(bparts)
+        magnets["Bitter"].append(root.name)
+        r0 += w + 10.
+
+    for i in range(nsupras):
+        (root, sparts) = supra("%s_S%d" % (name, i+1), r0=r0)
+        parts.update(sparts)
+        magnets["Supra"].append(root.name)
+        r0 = root.r[1] + 10.
+
+    root = MSite(name, {key: value for key, value in magnets.items() if value})
+    parts[name] = root
+    return (root, parts)
+
+def write(parts: dict, directory: str = ".") -> list:
+    """
+    write parts to directory (yaml, or json for HTS configurations)
+
+    returns the list of files written
+    """
+    os.makedirs(directory, exist_ok=True)
+    files = []
+    for name, part in parts.items():
+        if isinstance(part, dict):
+            filename = os.path.join(directory, name)
+            with open(filename, "w") as f:
+                json.dump(part, f, indent=2)
+        else:
+            filename = os.path.join(directory, name + ".yaml")
+            with open(filename, "w") as f:
+                loader.dump(part, stream=f)
+        files.append(filename)
+    return files
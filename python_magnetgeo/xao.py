@@ -12,27 +12,30 @@ see gmsh/api/python examples for that
 ex also in https://www.pygimli.org/_examples_auto/1_meshing/plot_cad_tutorial.html
 """
 
+import logging
 import sys
 import os
-from lxml import etree
 from io import StringIO, BytesIO
 import re
 
-import gmsh
 import argparse
 import yaml
 
-from .Ring import *
-from .Helix import *
-from .InnerCurrentLead import *
-from .OuterCurrentLead import *
-from .Insert import *
-from .Bitter import *
-from .Supra import *
-from .MSite import *
+from .Helix import Helix
+from .InnerCurrentLead import InnerCurrentLead
+from .Insert import Insert
+from .Bitter import Bitter
+from .Supra import Supra
+from .MSite import MSite
+from . import repository
+from . import profiling
+from . import meshing
+from . import bcindex
 
 import math
 
+logger = logging.getLogger(__name__)
+
 def Supra_Gmsh(cad, gname, is2D, verbose):
     """ Load Supra cad """
     solid_names = []
@@ -65,18 +68,18 @@ def Helix_Gmsh(cad, gname, is2D, verbose):
         htype = "HR"
         angle = cad.shape.angle
         nshapes = nturns * (360 / float(angle))
-        print("shapes: ", nshapes, math.floor(nshapes), math.ceil(nshapes))
+        logger.info("shapes: %s %s %s", nshapes, math.floor(nshapes), math.ceil(nshapes))
                     
         nshapes = (lambda x: math.ceil(x) if math.ceil(x) - x < x - math.floor(x) else math.floor(x))(nshapes)
         nInsulators = int(nshapes)
-        print("nKaptons=", nInsulators)
+        logger.info("nKaptons= %s", nInsulators)
     else:
         htype = "HL"
         nInsulators = 1
         if cad.dble:
             nInsulators = 2 
         if verbose:
-            print("helix:", gname, htype, nturns)
+            logger.info("helix: %s %s %s", gname, htype, nturns)
 
         if is2D:
             nsection = len(cad.axi.turns)
@@ -98,49 +101,44 @@ def Insert_Gmsh(cad, gname, is2D, verbose):
     NHelices = len(cad.Helices)
     NChannels = NHelices + 1
     for i,helix in enumerate(cad.Helices):
-        hHelix = None
         Ninsulators = 0
-        with open(helix+".yaml", 'r') as f:
-            hHelix = yaml.load(f, Loader=yaml.FullLoader)
-            h_solid_names = Helix_Gmsh(hHelix, gname, is2D, args.verbose)
-            for k,sname in enumerate(h_solid_names):
-                h_solid_names[k] =  "H%d_%s" % (i+1, sname)
-            solid_names += h_solid_names
+        hHelix = repository.load(helix)
+        h_solid_names = Helix_Gmsh(hHelix, gname, is2D, verbose)
+        for k,sname in enumerate(h_solid_names):
+            h_solid_names[k] =  "H%d_%s" % (i+1, sname)
+        solid_names += h_solid_names
     
     for i,ring in enumerate(cad.Rings):
         if verbose: 
-            print("ring:" , ring)
+            logger.info("ring: %s", ring)
             solid_names.append("R%d" % (i+1))
     
     if not is2D:
         for i,Lead in enumerate(cad.CurrentLeads):
-            with open(Lead+".yaml", 'r') as f:
-                clLead = yaml.load(f, Loader=yaml.FullLoader)
-                prefix = 'o'
-                outerLead_exist = True
-                if isinstance(clLead, InnerCurrentLead):
-                    prefix = 'i'
-                    innerLead_exist = True                        
-                solid_names.append("%sL%d" % (prefix,(i+1)) )
+            clLead = repository.load(Lead)
+            prefix = 'o'
+            outerLead_exist = True
+            if isinstance(clLead, InnerCurrentLead):
+                prefix = 'i'
+                innerLead_exist = True
+            solid_names.append("%sL%d" % (prefix,(i+1)) )
 
     return solid_names
 
 def Magnet_Gmsh(cad, gname, is2D, verbose):
     """ Load Magnet cad """
     solid_names = []
-    cfgfile = cad.magnets
-    with open(cfgfile, 'r') as cfgdata:
-        pcad = yaml.load(cfgdata, Loader = yaml.FullLoader)
-        pname = pcad.name
-        if isinstance(pcad, Bitter):
-            solid_names += Bitter_Gmsh(pcad, pname, is2D, args.verbose)
-            # TODO prepend name with part name
-        elif isinstance(pcad, Supra):
-            solid_names += Supra_Gmsh(cad, pname, is2D, args.verbose)
-            # TODO prepend name with part name
-        elif isinstance(pcad, Insert):
-            solid_names += Insert_Gmsh(pcad, pname, is2D, args.verbose)
-            # TODO prepend name with part name
+    pcad = repository.load(cad)
+    pname = pcad.name
+    if isinstance(pcad, Bitter):
+        solid_names += Bitter_Gmsh(pcad, pname, is2D, verbose)
+        # TODO prepend name with part name
+    elif isinstance(pcad, Supra):
+        solid_names += Supra_Gmsh(pcad, pname, is2D, verbose)
+        # TODO prepend name with part name
+    elif isinstance(pcad, Insert):
+        solid_names += Insert_Gmsh(pcad, pname, is2D, verbose)
+        # TODO prepend name with part name
     return solid_names
 
 def MSite_Gmsh(cad, gname, is2D, verbose):
@@ -163,12 +161,17 @@ def MSite_Gmsh(cad, gname, is2D, verbose):
 
 
 def main():
+    import gmsh
+    from lxml import etree
+
     tags = {}
 
     parser = argparse.ArgumentParser()
     parser.add_argument("input_file")
     parser.add_argument("--debug", help="activate debug", action='store_true')
     parser.add_argument("--verbose", help="activate verbose", action='store_true')
+    parser.add_argument("--profile", help="save timers and counters as json in FILE (- for stdout)", type=str, metavar='FILE')
+    parser.add_argument("--path", help="add a directory where yaml parts are searched (after the xao directory)", type=str, action='append', default=[])
 
     subparsers = parser.add_subparsers(title="commands", dest="command", help='sub-command help')
 
@@ -186,6 +189,7 @@ def main():
     "--lc", help="specify a characteristic length", type=float, default=5)
     parser_mesh.add_argument("--scaling", help="scale to m (default unit is mm)", action='store_true')
     parser_mesh.add_argument("--dry-run", help="mimic mesh operation without actually meshing", action='store_true')
+    meshing.add_arguments(parser_mesh)
 
     # TODO add similar option to salome HIFIMAGNET plugins 
     parser_mesh.add_argument("--group", help="group selected items in mesh generation (Eg Isolants, Leads, CoolingChannels)", nargs='?', metavar='BC', type=str)
@@ -196,19 +200,21 @@ def main():
     parser_adapt.add_argument(
         "--estimator", help="specify an estimator (pos file)", type=str, default=None)
 
-    """ 
     # to run multiple subcommands: need input_file to be given as an option
-    rest = sys.argv[1:] 
-    argslist = []
-    while rest:
-       args, rest = parser.parse_known_args(rest)
-       argslist.append(args)
-    print("arglist:", argslist)
-    """
+    # rest = sys.argv[1:]
+    # argslist = []
+    # while rest:
+    #     args, rest = parser.parse_known_args(rest)
+    #     argslist.append(args)
+    # logger.debug("arglist: %s", argslist)
 
     args = parser.parse_args()
+    logging.basicConfig(format="%(levelname)s:%(name)s: %(message)s",
+                        level=logging.DEBUG if args.debug else logging.INFO if args.verbose else logging.WARNING)
     if args.debug:
-        print(args)
+        logger.debug("%s", args)
+    if args.profile:
+        profiling.enable()
 
     hideIsolant = False
     groupIsolant = False
@@ -223,7 +229,7 @@ def main():
 
     # check if Axi is in input_file to see wether we are working with a 2D or 3D geometry
     if "Axi" in args.input_file:
-        print("2D geometry detected")
+        logger.info("2D geometry detected")
         is2D = True
         GeomParams['Solid'] = (2,'faces')
         GeomParams['Face'] = (1, 'edge')
@@ -236,10 +242,10 @@ def main():
             groupLeads = ("Leads" in args.group)
             groupCoolingChannels = ("CoolingChannels" in args.group)
 
-    print("hideIsolant:", hideIsolant)
-    print("groupIsolant:", groupIsolant)
-    print("groupLeads:", groupLeads)
-    print("groupCoolingChannels:", groupCoolingChannels)
+    logger.info("hideIsolant: %s", hideIsolant)
+    logger.info("groupIsolant: %s", groupIsolant)
+    logger.info("groupLeads: %s", groupLeads)
+    logger.info("groupCoolingChannels: %s", groupCoolingChannels)
 
     MeshAlgo2D = {
         'MeshAdapt' : 1,
@@ -254,6 +260,7 @@ def main():
         'Delaunay' : 1, 'Initial' : 3, 'Frontal' : 4, 'MMG3D': 7, 'HXT' : 10
     }
     # init gmsh
+    profiling.phase("import")
     gmsh.initialize()
     gmsh.option.setNumber("General.Terminal", 1)
     
@@ -268,18 +275,18 @@ def main():
     with open(file, 'r') as f:
         tree = etree.parse(f)
         if args.debug:
-            print(etree.tostring(tree.getroot()))
+            logger.debug("%s", etree.tostring(tree.getroot()))
 
         # get geometry 'name' and shape 'format', 'file'
         tr_elements = tree.xpath('//geometry')
         for i,group in enumerate(tr_elements):
             gname = group.attrib['name']
-            print("gname=", gname)
+            logger.info("gname= %s", gname)
             gmsh.model.add(gname)
             for child in group:
                 if 'format' in child.attrib:
                     fformat = child.attrib['format']
-                    print("format:" , child.attrib['format'])
+                    logger.info("format: %s", child.attrib['format'])
 
                 # CAD is stored in a separate file
                 if 'file' in child.attrib and child.attrib['file'] != "":
@@ -287,12 +294,12 @@ def main():
                 
             
     if not gfile:
-        print("CAD is embedded into xao file")
+        logger.info("CAD is embedded into xao file")
         cad_elements = tree.xpath('//shape')
         gfile = "tmp." + fformat.lower()
         for item in cad_elements:
             if args.debug:
-                print(item.text)
+                logger.debug("%s", item.text)
             with open(gfile, "x") as f:
                 cadData = StringIO(item.text)
                 f.write(cadData.getvalue())
@@ -303,16 +310,16 @@ def main():
     gmsh.model.occ.synchronize()
 
     if len(gmsh.model.getEntities(GeomParams['Solid'][0])) == 0:
-        print("Pb loaging %s:" % gfile)
-        print("Solids:", len(volumes))
+        logger.error("Pb loading %s", gfile)
+        logger.info("Solids: %s", len(volumes))
         exit(1)
 
-    print("Face:", len(gmsh.model.getEntities(GeomParams['Face'][0])) )
+    logger.info("Face: %s", len(gmsh.model.getEntities(GeomParams['Face'][0])))
     if args.debug:
         # get all model entities
         ent = gmsh.model.getEntities()
         for e in ent:
-            print(e)
+            logger.debug("%s", e)
     if cleanup:
         os.remove(gfile)
 
@@ -332,11 +339,13 @@ def main():
             cfgfile = args.geo
         if args.geo == 'Auto':
             cfgfile = gname+".yaml"
-        print("cfgfile:", cfgfile)
+        logger.info("cfgfile: %s", cfgfile)
 
     if cfgfile :
-        with open(cfgfile, 'r') as cfgdata:
-            cad = yaml.load(cfgdata, Loader = yaml.FullLoader)
+        # parts are searched next to the xao file, then in path
+        with repository.roots(os.path.dirname(os.path.abspath(file)), *args.path):
+            profiling.phase("load")
+            cad = repository.load(cfgfile)
             # print("cad type", type(cad))
             # TODO get solid names (see Salome HiFiMagnet plugin)
             if isinstance(cad, MSite):
@@ -350,13 +359,13 @@ def main():
             elif isinstance(cad, Helix):
                 solid_names += Helix_Gmsh(cad, gname, is2D, args.verbose)
             else:
-                print("unsupported type of cad")
+                logger.warning("unsupported type of cad")
                 sys.exit(1)
 
-            if "Air" in args.input_file:
-                solid_names.append("Air")
-                if hideIsolant:
-                    raise Exception("--hide Isolants cannot be used since cad contains Air region")
+        if "Air" in args.input_file:
+            solid_names.append("Air")
+            if hideIsolant:
+                raise Exception("--hide Isolants cannot be used since cad contains Air region")
 
     nsolids = len(gmsh.model.getEntities(GeomParams['Solid'][0]))
     assert (len(solid_names) == nsolids), "Wrong number of solids: in yaml %d in gmsh %d" % ( len(solid_names) , nsolids )
@@ -364,7 +373,8 @@ def main():
     # use yaml data to identify solids id...
     # Insert solids: H1_Cu, H1_Glue0, H1_Glue1, H2_Cu, ..., H14_Glue1, R1, R2, ..., R13, InnerLead, OuterLead, Air
     # HR: Cu, Kapton0, Kapton1, ... KaptonXX
-    print("Get solids:")
+    profiling.phase("solids")
+    logger.info("Get solids:")
     tr_subelements = tree.xpath('//'+GeomParams['Solid'][1])
     stags = {}
     for i,sgroup in enumerate(tr_subelements):
@@ -381,12 +391,12 @@ def main():
 
             indices = int(child.attrib['index'])+1
             if args.verbose:
-                print(sname, ":", indices)
+                logger.info("%s : %s", sname, indices)
 
             skip = False
             if hideIsolant and ("Isolant" in sname or "Glue" in sname or "Kapton" in sname):
                 if args.verbose:
-                    print("skip isolant: ", sname)
+                    logger.info("skip isolant: %s", sname)
                 skip = True
         
             # TODO if groupIsolant and "glue" in sname:
@@ -401,11 +411,13 @@ def main():
                     stags[sname] = [indices]
 
     # Physical Volumes
-    print("Solidtags:")
+    # (physical tags are allocated by the index, not looked up by gmsh)
+    pindex = bcindex.BCIndex()
+    logger.info("Solidtags:")
     for stag in stags:
-        pgrp = gmsh.model.addPhysicalGroup(GeomParams['Solid'][0], stags[stag])
+        pgrp = pindex.addPhysicalGroup(GeomParams['Solid'][0], stags[stag])
         gmsh.model.setPhysicalName(GeomParams['Solid'][0], pgrp, stag)
-        print(stag, ":", stags[stag], pgrp)
+        logger.info("%s : %s %s", stag, stags[stag], pgrp)
 
     Channel_Submeshes = []
     for i in range(0, NChannels):
@@ -440,10 +452,11 @@ def main():
         # iChannel_Submeshes.append(inames)
 
     if args.debug:
-        print("Channel_Submeshes:", Channel_Submeshes)
+        logger.debug("Channel_Submeshes: %s", Channel_Submeshes)
 
     # get groups
-    print("Get BC groups")
+    profiling.phase("bcs")
+    logger.info("Get BC groups")
     tr_elements = tree.xpath('//group')
 
     bctags = {}
@@ -468,7 +481,7 @@ def main():
                 sname = re.sub('H\d+','', sname)
             sname = sname.replace("Air_","")
             if args.debug:
-                print(sname, indices, insert_id)
+                logger.debug("%s %s %s", sname, indices, insert_id)
         
             skip = False
             # remove unneeded surfaces for Rings: BP for even rings and HP for odd rings
@@ -549,11 +562,11 @@ def main():
                         bctags[sname].append(index)
 
     # Physical Surfaces
-    print("BCtags:")
+    logger.info("BCtags:")
     for bctag in bctags:
-        pgrp = gmsh.model.addPhysicalGroup(GeomParams['Face'][0], bctags[bctag])
+        pgrp = pindex.addPhysicalGroup(GeomParams['Face'][0], bctags[bctag])
         gmsh.model.setPhysicalName(GeomParams['Face'][0], pgrp, bctag)
-        print(bctag, bctags[bctag], pgrp)
+        logger.info("%s %s %s", bctag, bctags[bctag], pgrp)
 
     # Generate the mesh and write the mesh file
     gmsh.model.occ.synchronize()
@@ -561,25 +574,26 @@ def main():
     # TODO write a template geo gmsh file for later use(gname + ".geo")
 
     # TODO: get solid id for glue
+    profiling.phase("endpoints")
     # Get Helical cuts EndPoints  
     EndPoints_tags = []
     VPoints_tags = []
 
-    if isinstance(cad, Insert.Insert) or isinstance(cad, Helix.Helix):
+    if isinstance(cad, Insert) or isinstance(cad, Helix):
         # TODO: loop over tag from Glue or Kaptons (here [2, 3])
         glue_tags = [ i+1  for i,name in enumerate(solid_names) if ("Isolant" in name or ("Glue" in name or "Kapton" in name)) ]
         if args.verbose:
-            print("glue_tags: ", glue_tags)
+            logger.info("glue_tags: %s", glue_tags)
         for tag in glue_tags:
             if args.verbose:
-                print("BC glue[%d]:" % tag, gmsh.model.getBoundary([(GeomParams['Solid'][0], tag)]) )
-            for (dim, tag) in gmsh.model.getBoundary([(GeomParams['Solid'][0],tag)]):
+                logger.info("BC glue[%d]: %s", tag, gmsh.model.getBoundary([(GeomParams['Solid'][0], tag)]))
+            for (dim, tag) in gmsh.model.getBoundary([(GeomParams['Solid'][0],tag)], oriented=False):
                 type = gmsh.model.getType(dim, tag)
                 if type == "Plane":
                     Points = gmsh.model.getBoundary([(GeomParams['Face'][0], tag)], recursive=True)
                     for p in Points:
                         EndPoints_tags.append(p[1])
-            print("EndPoints:", EndPoints_tags)
+            logger.info("EndPoints: %s", EndPoints_tags)
 
         """ 
         # TODO: get solid id for Helix (here [1])
@@ -596,9 +610,10 @@ def main():
                         if not p[1] in EndPoints_tags:
                             VPoints_tags.append(p[1]) 
         """
-        print("VPoints:", VPoints_tags)
+        logger.info("VPoints: %s", VPoints_tags)
 
     if args.command == 'mesh' and not args.dry_run:
+        profiling.phase("mesh")
 
         unit = 1
 
@@ -658,17 +673,21 @@ def main():
             # # They can also be set for individual surfaces, e.g. for using `MeshAdapt' on
             gindex = len(stags) + len(bctags)
             for tag in range(len(stags), gindex):
-                print("Apply BAMG on tag=%d" % tag)
+                logger.info("Apply BAMG on tag=%d", tag)
                 gmsh.model.mesh.setAlgorithm(2, tag, MeshAlgo2D[args.algo2d])
      
 
+        meshing.set_threads(args.threads, args.threads2d, args.threads3d, args.algo3d)
         if args.algo3d != 'None':
             gmsh.option.setNumber("Mesh.Algorithm3D", MeshAlgo3D[args.algo3d])
     
             gmsh.model.mesh.generate(3)  
         else:
             gmsh.model.mesh.generate(2)
+        if profiling.enabled():
+            profiling.count("mesh.nodes", len(gmsh.model.mesh.getNodes()[0]))
 
+        profiling.phase("write")
         meshname = gname
         if is2D:
             meshname += "-Axi"
@@ -677,8 +696,12 @@ def main():
         gmsh.write(meshname + ".msh")
         
     if args.command == 'adapt':
-        print("adapt mesh not implemented yet")
+        logger.warning("adapt mesh not implemented yet")
     gmsh.finalize()
+
+    if args.profile:
+        profiling.disable()
+        profiling.dump(args.profile)
         
 if __name__ == "__main__":
     main() 
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+"""Tests for `python_magnetgeo.batch`."""
+
+import argparse
+import os
+
+import pytest
+
+from python_magnetgeo import batch, cli, repository, synthetic
+
+try:
+    import gmsh
+except (ImportError, OSError):
+    gmsh = None
+
+
+def parse(argv):
+    parser = argparse.ArgumentParser()
+    cli.add_arguments(parser)
+    parser.add_argument("--verbose", action='store_true')
+    parser.add_argument("--debug", action='store_true')
+    return parser.parse_args(argv)
+
+
+@pytest.fixture
+def inserts(tmp_path):
+    for i in range(3):
+        (insert, parts) = synthetic.insert("S%d" % i, 2, 3)
+        synthetic.write(parts, str(tmp_path))
+    repository.invalidate()
+    yield str(tmp_path)
+    repository.invalidate()
+
+
+def test_expand(inserts, tmp_path):
+    """Files are given by names, glob patterns and manifests."""
+    manifest = tmp_path / "jobs.txt"
+    manifest.write_text("S2.yaml\n# comment\n\nHL-31.yaml  # other site\n")
+    files = batch.expand(["S?.yaml", "S0.yaml"], [str(manifest)], inserts)
+    assert files == ["S0.yaml", "S1.yaml", "S2.yaml", "HL-31.yaml"]
+
+
+def test_process(inserts):
+    """Each file is processed, failures are reported."""
+    args = parse(["--wd", inserts, "--tojson"])
+    results = batch.process(["S0.yaml", "S1.yaml", "missing.yaml"], args, workers=1)
+
+    assert [result['status'] for result in results][:2] == ["ok", "ok"]
+    assert results[2]['status'].startswith("error")
+    assert results[0]['outputs'] == [os.path.join(inserts, "S0.json")]
+    assert os.path.isfile(results[0]['outputs'][0])
+    assert "load" in results[0]['phases']
+    assert "missing.yaml" in batch.table(results)
+
+
+@pytest.mark.skipif(gmsh is None, reason="gmsh not available")
+def test_workers(inserts):
+    """Workers keep their gmsh session from one file to the next."""
+    args = parse(["--wd", inserts, "--gmsh_api", "--mesh"])
+    results = batch.process(["S0.yaml", "S1.yaml", "S2.yaml"], args, workers=2)
+
+    assert all(result['status'] == "ok" for result in results)
+    assert len(set(result['pid'] for result in results)) <= 2
+    for result in results:
+        assert result['outputs'] == [os.path.join(inserts, result['file'].replace(".yaml", ".msh"))]
+        assert os.path.getsize(result['outputs'][0]) > 0
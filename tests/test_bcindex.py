@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+
+"""Tests for `python_magnetgeo.bcindex`."""
+
+import pytest
+
+from python_magnetgeo import bcindex, repository, synthetic, SupraStructure
+
+try:
+    import gmsh
+except (ImportError, OSError):
+    gmsh = None
+
+
+def physical_groups():
+    return {(dim, gmsh.model.getPhysicalName(dim, tag)): (tag, sorted(gmsh.model.getEntitiesForPhysicalGroup(dim, tag)))
+            for (dim, tag) in gmsh.model.getPhysicalGroups()}
+
+
+@pytest.mark.skipif(gmsh is None, reason="gmsh not available")
+def test_queries():
+    """Index answers bounding box queries as gmsh does."""
+    gmsh.initialize()
+    gmsh.option.setNumber("General.Terminal", 0)
+    for i in range(10):
+        gmsh.model.occ.addRectangle(10 * i, -5, 0, 5, 10)
+    gmsh.model.occ.synchronize()
+    gmsh.option.setNumber("Geometry.OCCBoundsUseStl", 1)
+
+    eps = 1.e-3
+    boxes = [(-eps, -5-eps, -eps, 5+eps, 5+eps, eps),
+             (20-eps, -5-eps, -eps, 100+eps, -5+eps, eps),
+             (-eps, -5-eps, 0, 100, 5+eps, 0),
+             (50, 0, -1, 40, 1, 1)]
+    with bcindex.indexed() as index:
+        for box in boxes:
+            assert index.getEntitiesInBoundingBox(*box) == gmsh.model.getEntitiesInBoundingBox(*box, 1)
+        assert len(index.getEntitiesInBoundingBox(*boxes[0])) == 4
+
+        # nested blocks share the index
+        with bcindex.indexed() as nested:
+            assert nested is index
+            tag = bcindex.addPhysicalGroup(1, [1, 2], "bc")
+    assert bcindex.active() is None
+    assert gmsh.model.getPhysicalName(1, tag) == "bc"
+
+    # same entities without index, user setting is left unchanged
+    gmsh.option.setNumber("Geometry.OCCBoundsUseStl", 0)
+    with bcindex.indexed() as index:
+        found = [index.getEntitiesInBoundingBox(*box) for box in boxes]
+    assert [bcindex.getEntitiesInBoundingBox(*box, 1) for box in boxes] == found
+    assert gmsh.option.getNumber("Geometry.OCCBoundsUseStl") == 0
+    gmsh.finalize()
+
+
+@pytest.mark.skipif(gmsh is None, reason="gmsh not available")
+@pytest.mark.parametrize("detail", ["None", "dblepancake", "tape"])
+def test_same_groups(tmp_path, monkeypatch, detail):
+    """gmsh_bcs creates the same physical groups with and without index."""
+    synthetic.write({"hts.json": synthetic.hts(4, 12)}, str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    struct = SupraStructure.HTSinsert()
+    struct.loadCfg("hts.json")
+
+    groups = []
+    for use_index in [False, True]:
+        monkeypatch.setattr(bcindex, "use_index", use_index)
+        gmsh.initialize()
+        gmsh.option.setNumber("General.Terminal", 0)
+        ids = struct.gmsh(detail, True)
+        gmsh.model.occ.synchronize()
+        struct.gmsh_bcs(detail, ids)
+        groups.append(physical_groups())
+        gmsh.finalize()
+
+    assert groups[0] and groups[0] == groups[1]
+
+
+@pytest.mark.skipif(gmsh is None, reason="gmsh not available")
+def test_side_curves(monkeypatch):
+    """Sides are found from topology, whatever the sign of z."""
+    gmsh.initialize()
+    gmsh.option.setNumber("General.Terminal", 0)
+    lower = gmsh.model.occ.addRectangle(10, -20, 0, 5, 10)
+    upper = gmsh.model.occ.addRectangle(10, -10, 0, 5, 10)
+    ring = gmsh.model.occ.addRectangle(8, 0, 0, 10, 2)
+    ov, ovv = gmsh.model.occ.fragment([(2, lower), (2, upper)], [(2, ring)])
+    gmsh.model.occ.synchronize()
+
+    def bounds(curves):
+        return [gmsh.model.getBoundingBox(1, tag) for tag in curves]
+
+    # same curves with and without index
+    for use_index in [True, False]:
+        monkeypatch.setattr(bcindex, "use_index", use_index)
+        with bcindex.indexed():
+            # axis: 0 for r, 1 for z
+            for (side, axis, value, n) in [('r0', 0, 10, 2), ('r1', 0, 15, 2), ('z0', 1, -20, 1)]:
+                curves = bcindex.getSideCurves([lower, upper], side)
+                assert len(curves) == n
+                for box in bounds(curves):
+                    assert box[axis] == pytest.approx(value, abs=1.e-6)
+                    assert box[axis+3] == pytest.approx(value, abs=1.e-6)
+
+            # top of upper helix is split by the ring
+            assert len(bcindex.getSideCurves([upper], 'z1')) == 1
+            assert len(bcindex.getSideCurves([ring], 'z0')) == 3
+            assert len(bcindex.getSideCurves([ring], 'z0', 10, 15)) == 1
+            assert bcindex.getSideCurves([], 'r0') == []
+            with pytest.raises(Exception):
+                bcindex.getSideCurves([ring], 'rext')
+    gmsh.finalize()
+
+
+@pytest.mark.skipif(gmsh is None, reason="gmsh not available")
+def test_insert_bcs(tmp_path, monkeypatch):
+    """Insert boundary groups are not empty."""
+    (insert, parts) = synthetic.insert("ins", 4, 5)
+    synthetic.write(parts, str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    repository.invalidate()
+
+    gmsh.initialize()
+    gmsh.option.setNumber("General.Terminal", 0)
+    ids = insert.gmsh(True, batch=True)
+    gmsh.model.occ.synchronize()
+    insert.gmsh_bcs(ids)
+    groups = physical_groups()
+    gmsh.finalize()
+    repository.invalidate()
+
+    for name in ["H1_HP", "R1_BP", "R2_HP", "Axis", "Inf"] + ["Channel%d" % i for i in range(5)]:
+        assert groups[(1, name)][1], name
+    assert len(groups[(1, "Inf")][1]) == 3
@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+
+"""Smoke tests for the benchmark suite."""
+
+import json
+
+from benchmarks import run
+
+
+def test_discover():
+    """Every benchmark has a run method and hashable params."""
+    names = [name for (name, cls) in run.discover()]
+    assert "bench_parts.LoadInsert" in names
+    assert "bench_gmsh.HTSGmsh" in names
+    for (name, cls) in run.discover():
+        assert len(set(run.param_key(param) for param in getattr(cls, "params", [None]))) \
+            == len(getattr(cls, "params", [None]))
+
+
+def test_run(monkeypatch):
+    """Results are stored per benchmark and param."""
+    monkeypatch.setattr(run, "MODULES", ["bench_parts"])
+    results = run.run("MainCharacteristics", repeat=2, verbose=False)
+    assert set(results["bench_parts.MainCharacteristics"]) == {"HL-31", "S14x20", "S50x500"}
+    result = results["bench_parts.MainCharacteristics"]["HL-31"]
+    assert len(result["times"]) == 2 and result["min"] <= result["median"]
+    json.dumps(results)
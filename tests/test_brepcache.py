@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+"""Tests for `python_magnetgeo.brepcache`."""
+
+import pytest
+
+from python_magnetgeo import brepcache, loader, profiling, repository, synthetic
+
+try:
+    import gmsh
+except (ImportError, OSError):
+    gmsh = None
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    (site, parts) = synthetic.msite("site", ninserts=2, nbitters=1, nsupras=1, nhelices=3, nsections=4)
+    synthetic.write(parts, str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    repository.invalidate()
+    yield site
+    brepcache.disable()
+    repository.invalidate()
+
+
+def build(site, cache=None, air=True):
+    """
+    returns the surfaces, the physical groups and the cache counters of site
+    """
+    if cache:
+        brepcache.enable(cache)
+    else:
+        brepcache.disable()
+    profiling.reset()
+    profiling.enable(gmsh_hooks=False)
+
+    gmsh.initialize()
+    gmsh.option.setNumber("General.Terminal", 0)
+    ids = site.gmsh(air)
+    gmsh.model.occ.synchronize()
+    site.gmsh_bcs(ids)
+    boxes = sorted(tuple(round(x, 6) for x in gmsh.model.getBoundingBox(dim, tag))
+                   for (dim, tag) in gmsh.model.getEntities(2))
+    groups = sorted((gmsh.model.getPhysicalName(dim, tag), len(gmsh.model.getEntitiesForPhysicalGroup(dim, tag)))
+                    for (dim, tag) in gmsh.model.getPhysicalGroups())
+    gmsh.finalize()
+
+    profiling.disable()
+    return (boxes, groups, profiling.report()['counters'])
+
+
+@pytest.mark.skipif(gmsh is None, reason="gmsh not available")
+def test_same_geometry(site, tmp_path):
+    """Cached builds give the same geometry and groups."""
+    cache = str(tmp_path / "cache")
+    (boxes, groups, counters) = build(site)
+    assert not counters
+
+    # 6 helices, 2 inserts, 1 bitter, 1 supra and its HTS structure
+    assert build(site, cache) == (boxes, groups, {'brepcache.misses': 11})
+    assert build(site, cache) == (boxes, groups, {'brepcache.hits': 4})
+
+
+@pytest.mark.skipif(gmsh is None, reason="gmsh not available")
+def test_changed_helix(site, tmp_path):
+    """Only the changed helix and the assemblies holding it are rebuilt."""
+    cache = str(tmp_path / "cache")
+    build(site, cache, air=False)
+    assert build(site, cache, air=False)[2] == {'brepcache.hits': 1}
+
+    helix = repository.load("site_M1_H2")
+    helix.r = [helix.r[0], helix.r[1] - 0.5]
+    with open("site_M1_H2.yaml", "w") as f:
+        loader.dump(helix, stream=f)
+    repository.invalidate()
+
+    # site, insert and helix rebuilt: other helices and magnets imported
+    assert build(site, cache, air=False)[2] == {'brepcache.misses': 3, 'brepcache.hits': 5}
+
+
+@pytest.mark.skipif(gmsh is None, reason="gmsh not available")
+def test_code_change(site, tmp_path, monkeypatch):
+    """Entries built by other sources of the builders are not reused."""
+    cache = str(tmp_path / "cache")
+    build(site, cache, air=False)
+    monkeypatch.setattr(brepcache, "_code", lambda: "modified")
+    assert build(site, cache, air=False)[2] == {'brepcache.misses': 12}
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+
+"""Tests for `python_magnetgeo.get_main_characteristics_batch`."""
+
+import os
+import shutil
+
+import pytest
+
+from python_magnetgeo.Insert import Insert
+from python_magnetgeo.python_magnetgeo import get_main_characteristics
+from python_magnetgeo.python_magnetgeo import get_main_characteristics_batch
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "data")
+
+
+def test_batch(tmp_path, monkeypatch):
+    """Batch columns match get_main_characteristics for each insert."""
+    for part in ["HL-31_H1", "HL-31_H2"]:
+        shutil.copy(os.path.join(DATA, part + ".yaml"), str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+
+    cads = [Insert("one", ["HL-31_H1"], [], [], [], [], 18.54, 186.25),
+            Insert("two", ["HL-31_H1", "HL-31_H2"], ["Ring-H1H2"], [], [], [], 18.54, 186.25),
+            Insert("three", ["HL-31_H2", "HL-31_H1"], [], [], [], [], 10., 200.)]
+    data = get_main_characteristics_batch(cads)
+
+    assert data['insert']['name'].tolist() == ["one", "two", "three"]
+    assert data['insert']['NChannels'].tolist() == [2, 3, 3]
+    for i, cad in enumerate(cads):
+        (NHelices, NRings, NChannels, Nsections, index_h, R1, R2, Z1, Z2, Zmin, Zmax, Dh, Sh) = get_main_characteristics(cad)
+        assert data['insert']['NRings'][i] == NRings
+        helix = data['helix']['insert'] == i
+        assert data['helix']['R1'][helix].tolist() == R1
+        assert data['helix']['Z2'][helix].tolist() == Z2
+        assert data['helix']['Nsections'][helix].tolist() == Nsections
+        channel = data['channel']['insert'] == i
+        assert data['channel']['Zmin'][channel].tolist() == Zmin
+        assert data['channel']['Zmax'][channel].tolist() == Zmax
+        assert data['channel']['Dh'][channel].tolist() == pytest.approx(Dh)
+        assert data['channel']['Sh'][channel].tolist() == pytest.approx(Sh)
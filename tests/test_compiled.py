@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+"""Tests for `python_magnetgeo.compiled`."""
+
+import os
+import shutil
+
+from python_magnetgeo import compiled
+from python_magnetgeo import repository
+from python_magnetgeo.Helix import Helix
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "data")
+
+INSERT = """!<Insert>
+name: "small"
+Helices:
+  - HL-31_H1
+  - HL-31_H2
+Rings:
+  - Ring-H1H2
+HAngles:
+RAngles:
+CurrentLeads:
+  - inner
+innerbore: 18.54
+outerbore: 186.25
+"""
+
+
+def test_compiled_snapshot(tmp_path, monkeypatch):
+    """Snapshot is reused until one of its inputs changes."""
+    for part in ["HL-31_H1", "HL-31_H2", "Ring-H1H2", "inner"]:
+        shutil.copy(os.path.join(DATA, part + ".yaml"), str(tmp_path))
+    (tmp_path / "small.yaml").write_text(INSERT)
+    monkeypatch.chdir(tmp_path)
+    name = "small"
+
+    insert = compiled.load(name)
+    assert os.path.isfile(name + ".mgc")
+    assert compiled.read(name) is not None
+
+    repository.invalidate()
+    restored = compiled.load(name)
+    assert restored.Helices == insert.Helices
+    helix = repository.load("HL-31_H2")
+    assert isinstance(helix, Helix)
+    assert helix.axi.pitch
+
+    # touching a file without changing it keeps the snapshot,
+    # the file is hashed once
+    os.utime("HL-31_H2.yaml", ns=(0, 0))
+    assert compiled.read(name) is not None
+    digests = []
+    monkeypatch.setattr(compiled, "_digest", lambda path, digest=compiled._digest: digests.append(path) or digest(path))
+    repository.invalidate()
+    compiled.load(name)
+    compiled.load(name)
+    assert digests == [os.path.abspath("HL-31_H2.yaml")]
+
+    with open("HL-31_H2.yaml", "a") as f:
+        f.write("\n")
+    assert compiled.read(name) is None
+    repository.invalidate()
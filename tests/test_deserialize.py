@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+"""Tests for `python_magnetgeo.deserialize`."""
+
+import io
+import json
+
+import numpy as np
+
+from python_magnetgeo import deserialize
+from python_magnetgeo.Helix import Helix
+from python_magnetgeo.ModelAxi import ModelAxi
+from python_magnetgeo.Ring import Ring
+
+
+def make_helix():
+    axi = ModelAxi("axi", 10.0, [0.5, 1.5], [10.0, 10.0])
+    return Helix("H1", [19.3, 24.2], [-20.0, 20.0], 0.2, True, False, axi)
+
+
+def test_pretty_format():
+    """Default output is unchanged."""
+    helix = make_helix()
+    expected = json.dumps(helix, default=deserialize.serialize_instance,
+                          sort_keys=True, indent=4)
+    assert helix.to_json() == expected
+
+
+def test_compact_roundtrip():
+    """Compact output is loaded back."""
+    helix = make_helix()
+    data = helix.to_json(compact=True)
+    assert "\n" not in data
+
+    helix2 = deserialize.loads(data)
+    assert isinstance(helix2, Helix)
+    assert isinstance(helix2.axi, ModelAxi)
+    assert helix2.axi.turns == helix.axi.turns
+
+
+def test_iterloads():
+    """A stream of json documents is decoded one after the other."""
+    helix = make_helix()
+    stream = io.StringIO("\n".join(helix.to_json(compact=True) for i in range(10)))
+    helices = list(deserialize.iterloads(stream, bufsize=64))
+    assert len(helices) == 10
+    assert all(h.name == "H1" for h in helices)
+
+
+def test_numpy_values():
+    """numpy scalars and arrays are stored as python values."""
+    ring = Ring("R1", [19.3, 24.2, 25.1, 30.7], [0.0, 20.0], 6, 1.0, False)
+    expected = ring.to_json()
+
+    ring.r = [np.float64(19.3)] + list(np.array([24.2, 25.1, 30.7]))
+    ring.z = np.array([0.0, 20.0])
+    ring.n = np.int64(6)
+    assert ring.to_json() == expected
+    assert deserialize.loads(ring.to_json(compact=True)).r == [19.3, 24.2, 25.1, 30.7]
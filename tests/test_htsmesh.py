@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+"""Tests for `python_magnetgeo.htsmesh`."""
+
+import json
+
+import numpy as np
+import pytest
+
+from python_magnetgeo import htsmesh
+
+try:
+    from python_magnetgeo.SupraStructure import HTSinsert
+except (ImportError, OSError):
+    HTSinsert = None
+
+pytestmark = pytest.mark.skipif(HTSinsert is None, reason="SupraStructure not available")
+
+CFG = {
+    "tape": {"w": 4, "h": 6, "e": 1},
+    "pancake": {"r0": 20, "mandrin": 2, "ntapes": 6, "tape": {"w": 4, "h": 6, "e": 1}},
+    "isolation": {"r0": 18, "w": [34], "h": [0.5]},
+    "dblepancakes": {"n": 3, "isolation": {"r0": 18, "w": [34], "h": [1]}},
+}
+
+
+@pytest.fixture
+def insert(tmp_path):
+    cfg = tmp_path / "hts.json"
+    cfg.write_text(json.dumps(CFG))
+    hts = HTSinsert()
+    hts.loadCfg(str(cfg))
+    return hts
+
+
+def area(nodes, conn):
+    """Area of quadrangles or triangles (counterclockwise)."""
+    x = nodes[conn-1, 0]
+    y = nodes[conn-1, 1]
+    return 0.5 * np.sum(x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y)
+
+
+@pytest.mark.parametrize("elements", ["quad", "tri"])
+def test_mesh(insert, elements):
+    """Domains and air fill the air box, names match gmsh_bcs."""
+    (nodes, groups) = htsmesh.mesh(insert, "tape", Air=True, lc=0.5, elements=elements)
+    names = [name for (name, dim, type, conn) in groups]
+    assert "sc5_p1_dp2" in names and "mandrin_p0_dp0" in names and "isolation1" in names
+    assert names[-6:] == ["Bottom", "Top", "Rint", "Rext", "Axis", "Inf"]
+
+    (x0, y0, dx, dy) = htsmesh.air_box(insert)
+    total = sum(area(nodes, conn) for (name, dim, type, conn) in groups if dim == 2)
+    assert total == pytest.approx(dx * dy)
+
+    (name, dim, type, conn) = groups[names.index("sc0_p0_dp0")]
+    assert area(nodes, conn) == pytest.approx(4 * 6)
+    (name, dim, type, conn) = groups[names.index("Bottom")]
+    assert np.allclose(nodes[conn-1, 1], insert.getZ0()-insert.getH()/2.)
+
+
+def test_write(insert, tmp_path):
+    """Mesh is saved in msh 4.1 format."""
+    (nodes, groups) = htsmesh.mesh(insert, "pancake")
+    filename = str(tmp_path / "hts.msh")
+    htsmesh.write(filename, nodes, groups)
+
+    lines = open(filename).read().splitlines()
+    assert lines[:3] == ["$MeshFormat", "4.1 0 8", "$EndMeshFormat"]
+    assert int(lines[4]) == len(groups)
+    assert '2 1 "p0_dp0"' in lines
+    nodes_block = lines.index("$Nodes")
+    assert lines[nodes_block+1] == "1 %d 1 %d" % (len(nodes), len(nodes))
@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+
+"""Tests for `python_magnetgeo` import cost."""
+
+import json
+import subprocess
+import sys
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import python_magnetgeo, python_magnetgeo.cli, python_magnetgeo.xao
+elapsed = time.perf_counter() - start
+print(json.dumps({'elapsed': elapsed, 'modules': sorted(sys.modules)}))
+"""
+
+# seconds, loose enough for a loaded CI runner
+BUDGET = 2.
+
+
+def test_lazy_imports():
+    """Meshing libraries are not loaded by non-meshing commands."""
+    output = subprocess.run([sys.executable, "-c", SCRIPT], capture_output=True, text=True, check=True).stdout
+    result = json.loads(output)
+    for name in ["gmsh", "lxml", "chevron"]:
+        assert name not in result['modules'], name
+    assert result['elapsed'] < BUDGET
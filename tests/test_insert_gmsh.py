@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+"""Tests for `python_magnetgeo.Insert` gmsh geometry."""
+
+import io
+import logging
+import os
+import shutil
+
+import pytest
+
+from python_magnetgeo import repository
+
+try:
+    import gmsh
+except (ImportError, OSError):
+    gmsh = None
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "data")
+
+INSERT = """!<Insert>
+name: "small"
+Helices:
+  - HL-31_H1
+  - HL-31_H2
+Rings:
+  - Ring-H1H2
+HAngles:
+RAngles:
+CurrentLeads:
+innerbore: 18.54
+outerbore: 186.25
+"""
+
+
+@pytest.mark.skipif(gmsh is None, reason="gmsh not available")
+def test_batch_fragment(tmp_path, monkeypatch):
+    """Single fragment gives the same topology as per ring fragments."""
+    for part in ["HL-31_H1", "HL-31_H2", "Ring-H1H2"]:
+        shutil.copy(os.path.join(DATA, part + ".yaml"), str(tmp_path))
+    (tmp_path / "small.yaml").write_text(INSERT)
+    monkeypatch.chdir(tmp_path)
+    repository.invalidate()
+    insert = repository.load("small")
+
+    entities = []
+    for batch in [False, True]:
+        gmsh.initialize()
+        gmsh.option.setNumber("General.Terminal", 0)
+        gmsh.model.add("small")
+        (H_ids, R_ids, Air_data) = insert.gmsh(True, batch=batch)
+        gmsh.model.occ.synchronize()
+
+        surfaces = set(tag for (dim, tag) in gmsh.model.getEntities(2))
+        assert set(tag for ids in H_ids for tag in ids) <= surfaces
+        assert set(R_ids) <= surfaces
+        entities.append((len(gmsh.model.getEntities(2)), len(gmsh.model.getEntities(1))))
+
+        if batch:
+            assert isinstance(Air_data[0], list)
+            insert.gmsh_bcs((H_ids, R_ids, Air_data))
+            names = [gmsh.model.getPhysicalName(dim, tag) for (dim, tag) in gmsh.model.getPhysicalGroups(2)]
+            assert "Air" in names and "R1" in names
+        gmsh.finalize()
+
+    assert entities[0] == entities[1]
+    repository.invalidate()
+
+
+def test_axi_geo(tmp_path, monkeypatch):
+    """Geo model is written to a file or any stream."""
+    for part in ["HL-31_H1", "HL-31_H2", "Ring-H1H2"]:
+        shutil.copy(os.path.join(DATA, part + ".yaml"), str(tmp_path))
+    (tmp_path / "small.yaml").write_text(INSERT)
+    monkeypatch.chdir(tmp_path)
+    repository.invalidate()
+    insert = repository.load("small")
+
+    stream = io.StringIO()
+    (H_ids, R_ids, BC_ids, Air_ids, BC_Air_ids) = insert.Create_AxiGeo(True, stream=stream)
+    geo = stream.getvalue()
+    assert geo.count("Plane Surface(") == sum(len(ids) for ids in H_ids) + len(R_ids) + len(Air_ids)
+    assert geo.endswith("\nCoherence;\n")
+
+    assert insert.Create_AxiGeo(True) == (H_ids, R_ids, BC_ids, Air_ids, BC_Air_ids)
+    with open("small_axi.geo") as f:
+        # skip date
+        assert f.read().splitlines()[4:] == geo.splitlines()[4:]
+
+    helix = repository.load("HL-31_H1")
+    sections = helix.axi.get_sections()
+    assert "Point(5)= {r0_H1,%g, 0.0, lc_H1};\n" % sections.z[0] in geo
+    repository.invalidate()
+
+
+@pytest.mark.skipif(gmsh is None, reason="gmsh not available")
+def test_debug_logging(tmp_path, monkeypatch, capsys, caplog):
+    """Debug messages go to the module logger, not to stdout."""
+    for part in ["HL-31_H1", "HL-31_H2", "Ring-H1H2"]:
+        shutil.copy(os.path.join(DATA, part + ".yaml"), str(tmp_path))
+    (tmp_path / "small.yaml").write_text(INSERT)
+    monkeypatch.chdir(tmp_path)
+    repository.invalidate()
+    insert = repository.load("small")
+
+    gmsh.initialize()
+    gmsh.option.setNumber("General.Terminal", 0)
+    gmsh.model.add("small")
+    with caplog.at_level(logging.DEBUG, logger="python_magnetgeo.Insert"):
+        insert.gmsh(True, debug=True, batch=True)
+    gmsh.finalize()
+
+    assert capsys.readouterr().out == ""
+    assert any(record.name == "python_magnetgeo.Insert" and record.levelno == logging.DEBUG
+               for record in caplog.records)
+    assert "Insert/fragment" in caplog.text
+    repository.invalidate()
@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+
+"""Tests for `python_magnetgeo.loader`."""
+
+import os
+
+from python_magnetgeo import loader
+from python_magnetgeo.Helix import Helix
+from python_magnetgeo.ModelAxi import ModelAxi
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "data")
+
+
+def test_load_dump_roundtrip():
+    """Dumped geometry is loaded back with the package Loader."""
+    with open(os.path.join(DATA, "HL-31_H1.yaml"), "r") as f:
+        helix = loader.load(f)
+    assert isinstance(helix, Helix)
+    assert isinstance(helix.axi, ModelAxi)
+
+    data = loader.dump(helix)
+    assert data.startswith("!<Helix>")
+    helix2 = loader.load(data)
+    assert helix2.r == helix.r
+    assert helix2.axi.pitch == helix.axi.pitch
+
+
+def test_short_tags():
+    """Short !Ring tags go through Ring_constructor."""
+    ring = loader.load("!Ring {name: R, r: [1, 2, 3, 4], z: [0, 1], n: 6, "
+                       "angle: 46, BPside: true, fillets: false, orientation: 0}")
+    assert ring.name == "R"
+    assert ring.r == [1, 2, 3, 4]
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+
+"""Tests for `python_magnetgeo.meshing`."""
+
+import argparse
+import os
+
+import pytest
+
+from python_magnetgeo import meshing
+
+try:
+    import gmsh
+except (ImportError, OSError):
+    gmsh = None
+
+
+def test_arguments():
+    """Threads options are parsed."""
+    parser = argparse.ArgumentParser()
+    meshing.add_arguments(parser)
+    args = parser.parse_args(["--threads", "0", "--threads3d", "2"])
+    assert (args.threads, args.threads2d, args.threads3d) == (0, None, 2)
+
+    assert meshing.get_threads(None) == 1
+    assert meshing.get_threads(0) == os.cpu_count()
+    assert meshing.get_threads(4) == 4
+
+
+@pytest.mark.skipif(gmsh is None, reason="gmsh not available")
+def test_set_threads():
+    """Threads options are set in gmsh."""
+    gmsh.initialize()
+    gmsh.option.setNumber("General.Terminal", 0)
+    assert meshing.set_threads(4, threads3d=2, algo3d='HXT') == 4
+    assert gmsh.option.getNumber("General.NumThreads") == 4
+    assert gmsh.option.getNumber("Mesh.MaxNumThreads2D") == 4
+    assert gmsh.option.getNumber("Mesh.MaxNumThreads3D") == 2
+
+    assert meshing.set_threads() == 1
+    assert gmsh.option.getNumber("Mesh.MaxNumThreads3D") == 1
+    gmsh.finalize()
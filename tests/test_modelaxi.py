@@ -0,0 +1,28 @@
+#!/usr/bin/env python
+
+"""Tests for `python_magnetgeo.ModelAxi` sections."""
+
+import pytest
+
+from python_magnetgeo.ModelAxi import ModelAxi
+
+
+def test_sections():
+    """Sections match the turns/pitch definition."""
+    axi = ModelAxi("axi", 20.0, [1.0, 2.0, 1.0], [10.0, 5.0, 10.0])
+    sections = axi.get_sections()
+
+    assert sections.z.tolist() == [-20.0, -10.0, 0.0, 10.0]
+    assert sections.dz.tolist() == [10.0, 10.0, 10.0]
+    assert sections.turns.tolist() == [1.0, 3.0, 4.0]
+    assert sections.weights.tolist() == pytest.approx([0.75, 1.5, 0.75])
+    assert sections.turns[-1] == axi.get_Nturns()
+
+
+def test_sections_cache():
+    """Identical cuts share the same read-only arrays."""
+    axi = ModelAxi("axi", 20.0, [1.0, 2.0, 1.0], [10.0, 5.0, 10.0])
+    other = ModelAxi("other", 20.0, [1.0, 2.0, 1.0], [10.0, 5.0, 10.0])
+    assert axi.get_sections() is other.get_sections()
+    with pytest.raises(ValueError):
+        axi.get_sections().z[0] = 0
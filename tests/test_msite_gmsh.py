@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+
+"""Tests for `python_magnetgeo.MSite` gmsh geometry."""
+
+import pytest
+
+from python_magnetgeo import repository, synthetic
+
+try:
+    import gmsh
+except (ImportError, OSError):
+    gmsh = None
+
+
+@pytest.mark.skipif(gmsh is None, reason="gmsh not available")
+def test_parallel_build(tmp_path, monkeypatch):
+    """Magnets built by worker processes give the same geometry and groups."""
+    (site, parts) = synthetic.msite("site", ninserts=2, nbitters=1, nsupras=1, nhelices=3, nsections=4)
+    synthetic.write(parts, str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    repository.invalidate()
+
+    results = []
+    for processes in [None, 2]:
+        gmsh.initialize()
+        gmsh.option.setNumber("General.Terminal", 0)
+        ids = site.gmsh(True, processes=processes)
+        gmsh.model.occ.synchronize()
+        site.gmsh_bcs(ids)
+
+        boxes = sorted(tuple(round(x, 6) for x in gmsh.model.getBoundingBox(dim, tag))
+                       for (dim, tag) in gmsh.model.getEntities(2))
+        names = sorted(gmsh.model.getPhysicalName(dim, tag) for (dim, tag) in gmsh.model.getPhysicalGroups())
+        results.append((boxes, names))
+        gmsh.finalize()
+    repository.invalidate()
+
+    assert results[0] == results[1]
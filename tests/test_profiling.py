@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+"""Tests for `python_magnetgeo.profiling`."""
+
+import json
+
+import pytest
+
+from python_magnetgeo import profiling
+from python_magnetgeo import SupraStructure
+
+try:
+    import gmsh
+except (ImportError, OSError):
+    gmsh = None
+
+
+@pytest.fixture
+def profile():
+    profiling.reset()
+    profiling.enable(gmsh_hooks=False)
+    yield profiling
+    profiling.disable()
+    profiling.reset()
+
+
+def test_disabled():
+    """Nothing is recorded unless profiling is enabled."""
+    profiling.reset()
+    with profiling.timer("load"):
+        profiling.count("parts")
+    profiling.phase("build")
+    profiling.phase(None)
+    assert profiling.report() == {'timers': {}, 'counters': {}, 'gmsh': {}}
+
+
+def test_timers(profile):
+    """Nested timers and phases are reported with their path."""
+
+    @profiling.timed()
+    def build():
+        with profiling.timer("fragment"):
+            profiling.count("fragments")
+
+    profiling.phase("load")
+    profiling.count("parts", 3)
+    profiling.phase("build")
+    build()
+    build()
+    profiling.phase(None)
+
+    report = profiling.report()
+    assert set(report['timers']) == {"load", "build", "build/test_timers.<locals>.build",
+                                     "build/test_timers.<locals>.build/fragment"}
+    assert report['timers']["build/test_timers.<locals>.build"]['calls'] == 2
+    assert report['counters'] == {"parts": 3, "fragments": 2}
+    json.dumps(report)
+
+
+@pytest.mark.skipif(gmsh is None, reason="gmsh not available")
+def test_gmsh_hooks(profile):
+    """gmsh calls made by gmsh methods are counted."""
+    profiling.enable()
+    rects = [(1, 0, 1, 1), (1, 1, 1, 1)]
+
+    gmsh.initialize()
+    gmsh.option.setNumber("General.Terminal", 0)
+    gmsh.model.add("rects")
+    SupraStructure.gmsh_rectangles(rects)
+    gmsh.model.occ.synchronize()
+    gmsh.finalize()
+    profiling.disable()
+
+    report = profiling.report()
+    assert report['timers']["gmsh_rectangles"]['calls'] == 1
+    assert report['gmsh']["model.occ.addPlaneSurface"]['calls'] == 2
+    assert report['counters']['occ.entities'] >= 2 + 7 + 6
+    # hooks are removed
+    assert "wrapper" not in gmsh.model.occ.addPoint.__code__.co_name
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+"""Tests for `python_magnetgeo.repository`."""
+
+import os
+import threading
+
+from python_magnetgeo import repository
+from python_magnetgeo.Ring import Ring
+
+
+RING = """!<Ring>
+BPside: true
+angle: 46
+fillets: false
+n: 6
+name: %s
+r: [19.3, 24.2, 25.1, 30.7]
+z: [0, 20]
+orientation: 0
+"""
+
+
+def write_ring(tmp_path, name):
+    path = tmp_path / (name + ".yaml")
+    path.write_text(RING % name)
+    return str(tmp_path / name)
+
+
+def test_load_once(tmp_path):
+    """Each part file is parsed once."""
+    repo = repository.PartRepository()
+    name = write_ring(tmp_path, "R1")
+
+    ring = repo.load(name)
+    assert isinstance(ring, Ring)
+    assert repo.load(name + ".yaml") is ring
+    assert (repo.hits, repo.misses) == (1, 1)
+
+
+def test_reload_on_change(tmp_path):
+    """A modified file is parsed again."""
+    repo = repository.PartRepository()
+    name = write_ring(tmp_path, "R1")
+    ring = repo.load(name)
+
+    (tmp_path / "R1.yaml").write_text(RING % "R1-modified")
+    stat = os.stat(name + ".yaml")
+    os.utime(name + ".yaml", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+    assert repo.load(name).name == "R1-modified"
+
+    repo.invalidate(name)
+    assert repo.load(name) is not ring
+    assert repo.misses == 3
+
+
+def test_lru_bound(tmp_path):
+    """Least recently used parts are dropped."""
+    repo = repository.PartRepository(maxsize=2)
+    names = [write_ring(tmp_path, "R%d" % i) for i in range(3)]
+    for name in names:
+        repo.load(name)
+    assert len(repo) == 2
+
+    repo.load(names[0])
+    assert repo.misses == 4
+
+
+def test_search_path(tmp_path):
+    """Relative names are searched in roots, then in the search path."""
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    write_ring(tmp_path / "a", "R1")
+    write_ring(tmp_path / "b", "R1")
+    write_ring(tmp_path / "b", "R2")
+
+    repo = repository.PartRepository(searchpath=[str(tmp_path / "b")])
+    assert repo.path("R1") == str(tmp_path / "b" / "R1.yaml")
+    with repository.roots(str(tmp_path / "a")):
+        assert repo.path("R1") == str(tmp_path / "a" / "R1.yaml")
+        assert repo.path("R2") == str(tmp_path / "b" / "R2.yaml")
+        assert repository.output("R1.json") == str(tmp_path / "a" / "R1.json")
+    assert repository.output("R1.json") == "R1.json"
+
+
+def test_threads(tmp_path):
+    """Each thread loads parts from its own roots."""
+    for site in ["a", "b"]:
+        (tmp_path / site).mkdir()
+        (tmp_path / site / "R1.yaml").write_text(RING % ("R1-" + site))
+
+    repo = repository.PartRepository()
+    results = {}
+
+    def load(site):
+        with repository.roots(str(tmp_path / site)):
+            for i in range(20):
+                results.setdefault(site, set()).add(repo.load("R1").name)
+
+    threads = [threading.Thread(target=load, args=(site,)) for site in ["a", "b"] * 2]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == {"a": {"R1-a"}, "b": {"R1-b"}}
+    assert len(repo) == 2
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+"""Tests for `python_magnetgeo.server`."""
+
+import os
+import stat
+import threading
+import http.client
+
+import pytest
+
+from python_magnetgeo import repository, server, synthetic
+
+try:
+    import gmsh
+except (ImportError, OSError):
+    gmsh = None
+
+
+def serve(tmp_path, requests, unix=None):
+    """
+    run requests against a server (served by the main thread: gmsh
+    installs signal handlers) and returns the answers
+
+    a request may be a function of the port, returning its own answer
+    """
+    (insert, parts) = synthetic.insert("S0", 2, 3)
+    synthetic.write(parts, str(tmp_path))
+    repository.invalidate()
+
+    magnetgeo = server.MagnetGeoServer(unix or ("127.0.0.1", 0), wd=str(tmp_path))
+    port = None if unix else magnetgeo.server_address[1]
+    answers = []
+
+    def client():
+        try:
+            for request in requests:
+                if callable(request):
+                    answers.append(request(port))
+                else:
+                    answers.append(server.call(*request, port=port, timeout=60, unix=unix))
+        finally:
+            server.call("shutdown", port=port, unix=unix)
+
+    thread = threading.Thread(target=client)
+    thread.start()
+    try:
+        magnetgeo.serve_forever()
+    finally:
+        thread.join()
+        magnetgeo.server_close()
+        repository.invalidate()
+    return answers
+
+
+def test_requests(tmp_path):
+    """Parts stay cached between requests, bad requests are answered."""
+    answers = serve(tmp_path, [("run", {"filename": "S0.yaml", "tojson": True}),
+                               ("characteristics", {"names": ["S0", "S0"]}),
+                               ("status", None),
+                               ("run", {"filename": "S0.yaml", "colour": "red"}),
+                               ("run", {"filename": "missing.yaml"}),
+                               ("nope", {})])
+
+    assert answers[0]['status'] == "ok"
+    assert answers[0]['outputs'] == [str(tmp_path / "S0.json")]
+    assert answers[1]['insert']['NHelices'] == [2, 2]
+    assert answers[2]['repository']['hits'] > 0
+    assert "colour" in answers[3]['status']
+    assert answers[4]['status'].startswith("error")
+    assert answers[5]['status'].startswith("error")
+
+
+def post(path, body, headers):
+    """
+    returns a function posting body to path with headers
+    """
+    def request(port):
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        connection.request("POST", path, body, headers)
+        return connection.getresponse().status
+    return request
+
+
+def test_forbidden(tmp_path):
+    """Cross-origin and rebound requests are rejected."""
+    data = '{"filename": "S0.yaml", "tojson": true, "wd": "%s"}' % (tmp_path / "other")
+    answers = serve(tmp_path, [post("/run", data, {"Content-Type": "text/plain"}),
+                               post("/shutdown", "{}", {"Content-Type": "application/x-www-form-urlencoded"}),
+                               post("/run", data, {"Content-Type": "application/json", "Host": "evil.example:8642"}),
+                               ("status", None)])
+
+    assert answers[:3] == [415, 415, 403]
+    assert answers[3]['requests'] == 4
+    assert not os.path.exists(tmp_path / "other")
+
+
+def test_unix_socket(tmp_path):
+    """Server listens on a Unix socket only the user may use."""
+    unix = str(tmp_path / "magnetgeo.sock")
+
+    def mode(port):
+        return stat.S_IMODE(os.stat(unix).st_mode)
+
+    answers = serve(tmp_path, [mode, ("run", {"filename": "S0.yaml", "tojson": True})], unix=unix)
+    assert answers[0] == 0o600
+    assert answers[1]['status'] == "ok"
+    assert not os.path.exists(unix)
+
+
+@pytest.mark.skipif(gmsh is None, reason="gmsh not available")
+def test_mesh(tmp_path):
+    """gmsh stays initialized, models are cleared between requests."""
+    answers = serve(tmp_path, [("run", {"filename": "S0.yaml", "gmsh_api": True, "mesh": True}),
+                               ("run", {"filename": "S0.yaml", "gmsh_api": True, "air": True}),
+                               ("status", None)])
+
+    assert answers[0]['status'] == "ok" and answers[1]['status'] == "ok"
+    assert answers[0]['mesh']['nodes'] > 0 and answers[1]['mesh']['nodes'] == 0
+    assert "H1_HP" in answers[0]['groups'] and "Air" not in answers[0]['groups']
+    assert "Air" in answers[1]['groups']
+    assert answers[2]['gmsh']
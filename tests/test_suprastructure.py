@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+"""Tests for `python_magnetgeo.SupraStructure` gmsh geometry."""
+
+import json
+
+import pytest
+
+try:
+    import gmsh
+except (ImportError, OSError):
+    gmsh = None
+
+CFG = {
+    "tape": {"w": 4, "h": 6, "e": 1},
+    "pancake": {"r0": 20, "mandrin": 2, "ntapes": 6, "tape": {"w": 4, "h": 6, "e": 1}},
+    "isolation": {"r0": 18, "w": [34], "h": [0.5]},
+    "dblepancakes": {"n": 3, "isolation": {"r0": 18, "w": [34], "h": [1]}},
+}
+
+
+@pytest.fixture
+def insert(tmp_path):
+    from python_magnetgeo.SupraStructure import HTSinsert
+
+    cfg = tmp_path / "hts.json"
+    cfg.write_text(json.dumps(CFG))
+    hts = HTSinsert()
+    hts.loadCfg(str(cfg))
+    return hts
+
+
+@pytest.mark.skipif(gmsh is None, reason="gmsh not available")
+@pytest.mark.parametrize("detail", ["dblepancake", "pancake", "tape"])
+def test_gmsh(insert, detail):
+    """Detailed geometry is conforming, air fills the box."""
+    gmsh.initialize()
+    gmsh.option.setNumber("General.Terminal", 0)
+    gmsh.model.add("hts")
+    (ids, Air_data) = insert.gmsh(detail, True)
+    gmsh.model.occ.synchronize()
+
+    (Air_ids, dr_air, z0_air, dz_air) = Air_data
+    area = sum(gmsh.model.occ.getMass(2, tag) for (dim, tag) in gmsh.model.getEntities(2))
+    assert area == pytest.approx(dr_air * dz_air)
+
+    # each inner curve is shared by two surfaces
+    boundaries = gmsh.model.getBoundary(gmsh.model.getEntities(2), combined=True, oriented=False)
+    assert len(boundaries) == 4
+
+    insert.gmsh_bcs(detail, (ids, Air_data))
+    names = [gmsh.model.getPhysicalName(dim, tag) for (dim, tag) in gmsh.model.getPhysicalGroups()]
+    assert "Air" in names and "isolation1" in names
+    if detail == "tape":
+        assert "sc5_p1_dp2" in names and "mandrin_p0_dp0" in names
+    gmsh.finalize()
+
+
+def test_layout(insert):
+    """Layout table is computed once and invalidated on changes."""
+    layout = insert.getLayout()
+    assert insert.getLayout() is layout
+    assert insert.getNtapes() == [6, 6, 6]
+    assert insert.getWPancake() == [30.0, 30.0, 30.0]
+    assert insert.getH_Isolation() == [1.0, 1.0, 1.0]
+    assert insert.getFillingFactor() == pytest.approx(3 * 2 * 6 * 4 * 6 / insert.getArea())
+    with pytest.raises(ValueError):
+        layout.ntapes[0] = 0
+
+    insert.setZ0(10)
+    assert insert.getZ0() == 10
+    assert insert.getLayout() is not layout
+
+
+def test_layout_values(insert):
+    """Getters return the values of the config, empty inserts have empty layouts."""
+    from python_magnetgeo.SupraStructure import HTSinsert
+
+    assert [type(h) for h in insert.getHtapes()] == [int, int, int]
+    assert [type(w) for w in insert.getWPancake()] == [int, int, int]
+    assert type(insert.getFillingFactor()) is float
+
+    empty = HTSinsert()
+    assert empty.getNtapes() == [] and empty.getR0_Isolation() == []
+    assert empty.getLayout().ntapes.shape == (0,)
+
+
+def test_tape_coords(insert):
+    """Tape coordinates of the insert match pancake and dble pancake ones."""
+    (index, coords) = insert.getTapeCoords()
+    assert coords.r0.shape == (3 * 2 * 6, 2)
+    assert index[-1].tolist() == [2, 1, 5]
+
+    dp = insert.dblepancakes[1]
+    assert dp.getPancake().getR() == coords.r0[:6, 0].tolist()
+    assert coords.r1[:6, 1].tolist() == pytest.approx([25 + 5 * i for i in range(6)])
+
+    (z_dp, z_isolation) = insert.getZDblePancakes()
+    assert z_dp[0] == insert.getZ0() - insert.getH() / 2.
+    dp_coords = dp.getTapeCoords(z_dp[1])
+    for (a, b) in zip(dp_coords, coords):
+        assert (a.reshape(-1, 2) == b[index[:, 0] == 1]).all()
+    assert (coords.z1 - coords.z0 == 6).all()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+"""Tests for `python_magnetgeo.synthetic`."""
+
+import pytest
+
+from python_magnetgeo import repository
+from python_magnetgeo import synthetic
+from python_magnetgeo import SupraStructure
+
+try:
+    import gmsh
+except (ImportError, OSError):
+    gmsh = None
+
+
+def test_insert():
+    """Helices are nested, rings connect them, sections span the helical cut."""
+    (cad, parts) = synthetic.insert("S", 5, 50)
+    assert len(cad.Helices) == 5 and len(cad.Rings) == 4
+    assert set(parts) == set(cad.Helices + cad.Rings + ["S"])
+
+    helices = [parts[name] for name in cad.Helices]
+    for (hin, hout) in zip(helices[:-1], helices[1:]):
+        assert hin.r[1] < hout.r[0]
+    for hhelix in helices:
+        sections = hhelix.axi.get_sections()
+        assert len(sections.dz) == 50
+        assert sections.z[-1] == pytest.approx(hhelix.axi.h)
+    assert parts["S_R1"].r == helices[0].r + helices[1].r
+
+
+def test_seed():
+    """A seed gives reproducible random geometries."""
+    (cad, a) = synthetic.insert("S", 3, 10, seed=1)
+    (cad, b) = synthetic.insert("S", 3, 10, seed=1)
+    (cad, c) = synthetic.insert("S", 3, 10, seed=2)
+    assert a["S_H2"].axi.pitch == b["S_H2"].axi.pitch
+    assert a["S_H2"].axi.pitch != c["S_H2"].axi.pitch
+    assert a["S_H2"].r == b["S_H2"].r
+
+
+def test_hts():
+    """HTS configurations are valid HTSinsert inputs."""
+    insert = SupraStructure.HTSinsert()
+    insert.setCfg(synthetic.hts(4, 25))
+    assert insert.getNtapes() == [25] * 4
+
+
+def test_write(tmp_path, monkeypatch):
+    """Written parts are loaded back by name."""
+    (site, parts) = synthetic.msite("site", nbitters=2, nhelices=3, nsections=5, seed=0)
+    assert site.magnets == {"insert": ["site_M1"], "Bitter": ["site_B1", "site_B2"], "Supra": ["site_S1"]}
+
+    files = synthetic.write(parts, str(tmp_path))
+    assert len(files) == len(parts)
+    monkeypatch.chdir(tmp_path)
+    repository.invalidate()
+    assert repository.load("site").magnets == site.magnets
+    assert repository.load("site_S1").r == parts["site_S1"].r
+    assert repository.load("site_M1_H2").axi.pitch == parts["site_M1_H2"].axi.pitch
+    repository.invalidate()
+
+
+@pytest.mark.skipif(gmsh is None, reason="gmsh not available")
+def test_msite_gmsh(tmp_path, monkeypatch):
+    """Synthetic sites can be meshed."""
+    (site, parts) = synthetic.msite("site", nbitters=1, nhelices=3, nsections=5)
+    synthetic.write(parts, str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    repository.invalidate()
+
+    gmsh.initialize()
+    gmsh.option.setNumber("General.Terminal", 0)
+    ids = site.gmsh(False)
+    gmsh.model.occ.synchronize()
+    site.gmsh_bcs(ids)
+    names = [gmsh.model.getPhysicalName(dim, tag) for (dim, tag) in gmsh.model.getPhysicalGroups(2)]
+    gmsh.finalize()
+    assert "site_B1_Cu0" in names and "Supra" in names
+    repository.invalidate()